@@ -0,0 +1,95 @@
+"""Measures the round trip cost of small, high rate requests for each codec.
+
+Every request goes to an echo process (through a multiprocessing queue, or the
+CodecPipe the IPC uses when given a codec) that decodes it and sends back a small AUTOCOMPLETE sized response, like the
+server would. Each codec is timed with requests carrying every IPC.request()
+argument (how requests were sent before REQUEST_FIELDS) and with only the
+fields of the command.
+
+Run ``python3 benchmarks/codec_benchmark.py --help`` to see the options.
+"""
+
+from argparse import ArgumentParser, Namespace
+from multiprocessing import Process, Queue
+from pathlib import Path
+from time import perf_counter
+
+from salve import AUTOCOMPLETE, REQUEST_FIELDS, MarshalCodec, PickleCodec
+from salve.codec import CodecPipe, MessageCodec
+
+FULL_REQUEST: dict = {
+    "id": 1,
+    "type": "request",
+    "command": AUTOCOMPLETE,
+    "expected_keywords": [""],
+    "current_word": "conf",
+    "language": "Text",
+    "text_range": (1, -1),
+    "file_path": Path(__file__),
+    "definition_starters": [("", "before")],
+    "file": "test",
+}
+SCHEMA_REQUEST: dict = {
+    field: FULL_REQUEST[field]
+    for field in ["id", "type", "command"] + REQUEST_FIELDS[AUTOCOMPLETE]
+}
+RESULT: list[str] = ["config", "configure", "confidence", "conflict"]
+CODECS: dict[str, MessageCodec | None] = {
+    "queue pickling": None,
+    "PickleCodec": PickleCodec(),
+    "MarshalCodec": MarshalCodec(),
+}
+
+
+def new_queue(codec: MessageCodec | None) -> Queue:
+    return Queue() if codec is None else CodecPipe(codec)
+
+
+def echo(requests: Queue, responses: Queue) -> None:
+    while (request := requests.get()) is not None:
+        responses.put(
+            {
+                "id": request["id"],
+                "type": "response",
+                "cancelled": False,
+                "command": request["command"],
+                "result": RESULT,
+            }
+        )
+
+
+def round_trip(request: dict, codec: MessageCodec | None, count: int) -> float:
+    """Returns the mean microseconds from sending a request to getting its response"""
+    requests: Queue = new_queue(codec)
+    responses: Queue = new_queue(codec)
+    process = Process(target=echo, args=(requests, responses))
+    process.start()
+
+    for _ in range(100):  # Warm up
+        requests.put(request)
+        responses.get()
+    start: float = perf_counter()
+    for _ in range(count):
+        requests.put(request)
+        responses.get()
+    elapsed: float = perf_counter() - start
+
+    requests.put(None)
+    process.join()
+    return elapsed / count * 1_000_000
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=5000)
+    args: Namespace = parser.parse_args()
+
+    print(f"{'codec':<16}{'all fields us':>15}{'schema us':>12}")
+    for name, codec in CODECS.items():
+        full: float = round_trip(FULL_REQUEST, codec, args.count)
+        schema: float = round_trip(SCHEMA_REQUEST, codec, args.count)
+        print(f"{name:<16}{full:>15.1f}{schema:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Measures fuzzy AUTOCOMPLETE on a large vocabulary with and without the character bitmask prefilter.
+
+A vocabulary of random snake_case and camelCase identifiers is generated, every prefix of each query is
+matched against it (as if it was typed one keystroke at a time) and the mean time per keystroke is printed.
+
+Run ``python3 benchmarks/fuzzy_autocomplete.py --help`` to see the options.
+"""
+
+from argparse import ArgumentParser, Namespace
+from collections import Counter
+from random import Random
+from time import perf_counter
+
+from salve.server_functions.autocompletions import (
+    FUZZY_LIMIT,
+    FuzzyIndex,
+    find_fuzzy_autocompletions,
+    fuzzy_index,
+    fuzzy_score,
+)
+
+PARTS: list[str] = [
+    "get", "set", "config", "file", "path", "read", "write", "token", "line",
+    "range", "cache", "server", "client", "request", "response", "word",
+    "index", "count", "highlight", "update", "remove", "find", "parse", "value",
+]  # fmt: skip
+QUERIES: list[str] = ["gcf", "hlr", "reqresp", "xyzzy", "tokenline"]
+
+
+def make_vocabulary(size: int, seed: int) -> Counter[str]:
+    random = Random(seed)
+    words: Counter[str] = Counter()
+    while len(words) < size:
+        parts: list[str] = random.sample(PARTS, random.randint(1, 4))
+        suffix: str = "".join(
+            random.choices("abcdefghijklmnopqrstuvwxyz", k=3)
+        )
+        word: str = (
+            "_".join(parts) + "_" + suffix
+            if random.random() < 0.5
+            else parts[0]
+            + "".join(part.title() for part in parts[1:])
+            + suffix
+        )
+        words[word] = random.randint(1, 20)
+    return words
+
+
+def naive_fuzzy_autocompletions(
+    word_counts: Counter[str], current_word: str
+) -> list[str]:
+    """Scores every word without rejecting any up front and sorts all of the matches"""
+    matches: list[tuple[int, int, str]] = []
+    for word, count in word_counts.items():
+        score: int | None = fuzzy_score(word, current_word)
+        if score is not None and word != current_word:
+            matches.append((score, count, word))
+    matches.sort(
+        key=lambda match: (-match[0], -match[1], len(match[2]), match[2])
+    )
+    return [match[2] for match in matches[:FUZZY_LIMIT]]
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args: Namespace = parser.parse_args()
+
+    word_counts: Counter[str] = make_vocabulary(args.words, args.seed)
+    start: float = perf_counter()
+    index: FuzzyIndex = fuzzy_index(word_counts)
+    print(
+        f"{len(word_counts)} words, index built in "
+        f"{(perf_counter() - start) * 1000:.1f} ms\n"
+    )
+
+    print(f"{'query':<12}{'naive ms':>12}{'masked ms':>12}{'speedup':>10}")
+    for query in QUERIES:
+        keystrokes: list[str] = [
+            query[:length] for length in range(1, len(query) + 1)
+        ]
+
+        start = perf_counter()
+        naive: list[list[str]] = [
+            naive_fuzzy_autocompletions(word_counts, typed)
+            for typed in keystrokes
+        ]
+        naive_time: float = (perf_counter() - start) / len(keystrokes)
+
+        start = perf_counter()
+        masked: list[list[str]] = [
+            find_fuzzy_autocompletions(word_counts, index, [], typed)
+            for typed in keystrokes
+        ]
+        masked_time: float = (perf_counter() - start) / len(keystrokes)
+
+        assert naive == masked
+        print(
+            f"{query:<12}{naive_time * 1000:>12.2f}{masked_time * 1000:>12.2f}"
+            f"{naive_time / masked_time:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Load-test harness simulating several editor panes typing against salve.
+
+Every simulated typist owns one file and, per keystroke, sends the edit with
+IPC.update_file() followed by AUTOCOMPLETE, HIGHLIGHT and LINKS_AND_CHARS
+requests just like a code editor would. Typists are spread over one or more
+IPC instances and the harness reports per command latency distributions,
+cancelled and dropped counts and the CPU time used by each server.
+
+Run ``python3 benchmarks/load_test.py --help`` to see the options.
+"""
+
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter, process_time, sleep
+
+from collegamento import FileClient, FileServer, Request
+
+from salve import AUTOCOMPLETE, HIGHLIGHT, IPC, LINKS_AND_CHARS, Response
+from salve.server_functions import is_unicode_letter
+
+SERVER_CPU: str = "server_cpu_time"
+MEASURED_COMMANDS: list[str] = [AUTOCOMPLETE, HIGHLIGHT, LINKS_AND_CHARS]
+DEFAULT_FILES: list[Path] = sorted(
+    (Path(__file__).parent.parent / "salve").rglob("*.py")
+)
+TYPING_SCRIPT: str = (
+    "\n\ndef configure_server(configuration: dict[str, int]) -> None:\n"
+    '    """See https://salve.readthedocs.io for details"""\n'
+    "    for key, value in configuration.items():\n"
+    "        print(key, value)\n"
+)
+
+
+def server_cpu_time(server: FileServer, request: Request) -> float:
+    """Runs inside the server and reports how much CPU time it has used so far"""
+    return process_time()
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """Nearest rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank: int = round(percent / 100 * (len(sorted_values) - 1))
+    return sorted_values[rank]
+
+
+@dataclass
+class CommandStats:
+    """Everything measured for one command on one IPC"""
+
+    sent: int = 0
+    cancelled: int = 0
+    dropped: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+
+class LoadIPC(IPC):
+    """IPC that timestamps every request and classifies every response before the usual parsing"""
+
+    def __init__(self, id_max: int = 15_000) -> None:
+        self.sent: dict[int, tuple[str, float]] = {}
+        self.stats: dict[str, CommandStats] = {
+            command: CommandStats() for command in MEASURED_COMMANDS
+        }
+        super().__init__(id_max)
+        self.add_command(SERVER_CPU, server_cpu_time)
+
+    def timed_request(self, command: str, **kwargs) -> None:
+        self.request(command, **kwargs)
+        self.sent[self.current_ids[command]] = (command, perf_counter())
+        self.stats[command].sent += 1
+
+    def parse_response(self, res: Response) -> None:
+        if res["id"] in self.sent:
+            command, start = self.sent.pop(res["id"])
+            stats: CommandStats = self.stats[command]
+            if res["cancelled"]:
+                # The server skipped the request because a newer one came in
+                stats.cancelled += 1
+            elif res["id"] != self.current_ids[command]:
+                # The result was computed but is already stale for the client
+                stats.dropped += 1
+            else:
+                stats.latencies.append(perf_counter() - start)
+
+        super().parse_response(res)
+
+    def server_cpu_time(self) -> float:
+        """Asks the server for its current CPU time, waiting for the answer"""
+        FileClient.request(self, {"command": SERVER_CPU})
+        while (
+            response := self.newest_responses.pop(SERVER_CPU, None)
+        ) is None:
+            self.check_responses()
+            sleep(0.001)
+        return response["result"]  # type: ignore
+
+
+@dataclass
+class TypingSession:
+    """One editor pane typing TYPING_SCRIPT into its own file over and over"""
+
+    ipc: LoadIPC
+    file: str
+    original_text: str
+    language: str
+    viewport_lines: int
+    text: str = ""
+    cursor: int = 0
+    typed: int = 0
+
+    def __post_init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.text = self.original_text
+        self.cursor = len(self.original_text)
+        self.typed = 0
+        self.ipc.update_file(self.file, self.text)
+
+    def keystroke(self) -> None:
+        if self.typed == len(TYPING_SCRIPT):
+            self.reset()
+
+        char: str = TYPING_SCRIPT[self.typed]
+        self.text = self.text[: self.cursor] + char + self.text[self.cursor :]
+        self.cursor += 1
+        self.typed += 1
+        self.ipc.update_file(self.file, self.text)
+
+        word_start: int = self.cursor
+        while word_start and is_unicode_letter(self.text[word_start - 1]):
+            word_start -= 1
+        cursor_line: int = self.text.count("\n", 0, self.cursor) + 1
+        line_count: int = len(self.text.splitlines())
+        top_line: int = max(1, cursor_line - self.viewport_lines // 2)
+        text_range = (
+            top_line,
+            min(line_count, top_line + self.viewport_lines),
+        )
+
+        self.ipc.timed_request(
+            AUTOCOMPLETE,
+            file=self.file,
+            expected_keywords=[],
+            current_word=self.text[word_start : self.cursor],
+        )
+        self.ipc.timed_request(
+            HIGHLIGHT,
+            file=self.file,
+            language=self.language,
+            text_range=text_range,
+        )
+        self.ipc.timed_request(
+            LINKS_AND_CHARS, file=self.file, text_range=text_range
+        )
+
+
+def run(args: Namespace) -> None:
+    contexts: list[LoadIPC] = [LoadIPC() for _ in range(args.ipcs)]
+    files: list[Path] = args.files or DEFAULT_FILES
+    sessions: list[TypingSession] = [
+        TypingSession(
+            contexts[i % args.ipcs],
+            f"pane-{i}",
+            files[i % len(files)].read_text(),
+            args.language,
+            args.viewport,
+        )
+        for i in range(args.typists)
+    ]
+    sleep(0.5)  # Let every server start up before measuring anything
+
+    cpu_start: list[float] = [
+        context.server_cpu_time() for context in contexts
+    ]
+    interval: float = 1 / args.rate
+    start: float = perf_counter()
+    next_keystrokes: list[float] = [
+        start + interval * i / len(sessions) for i in range(len(sessions))
+    ]
+
+    while (now := perf_counter()) - start < args.duration:
+        for i, session in enumerate(sessions):
+            if now >= next_keystrokes[i]:
+                session.keystroke()
+                next_keystrokes[i] += interval
+        for context in contexts:
+            context.check_responses()
+        sleep(0.0005)
+
+    drain_end: float = perf_counter() + args.drain
+    while perf_counter() < drain_end and any(c.sent for c in contexts):
+        for context in contexts:
+            context.check_responses()
+        sleep(0.0005)
+    wall_time: float = perf_counter() - start
+
+    cpu_used: list[float] = [
+        context.server_cpu_time() - cpu_start[i]
+        for i, context in enumerate(contexts)
+    ]
+    for context in contexts:
+        context.kill_IPC()
+
+    print(
+        f"{args.typists} typists at {args.rate} keystrokes/s on"
+        f" {args.ipcs} IPC(s) for {args.duration}s\n"
+    )
+    print(
+        f"{'command':<16}{'sent':>7}{'ok':>7}{'cancel':>8}{'drop':>7}"
+        f"{'lost':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    )
+    for command in MEASURED_COMMANDS:
+        total = CommandStats()
+        for context in contexts:
+            stats: CommandStats = context.stats[command]
+            total.sent += stats.sent
+            total.cancelled += stats.cancelled
+            total.dropped += stats.dropped
+            total.latencies.extend(stats.latencies)
+        lost: int = sum(
+            1
+            for context in contexts
+            for sent_command, _ in context.sent.values()
+            if sent_command == command
+        )
+        latencies: list[float] = sorted(ms * 1000 for ms in total.latencies)
+        print(
+            f"{command:<16}{total.sent:>7}{len(latencies):>7}"
+            f"{total.cancelled:>8}{total.dropped:>7}{lost:>7}"
+            f"{percentile(latencies, 50):>9.2f}"
+            f"{percentile(latencies, 90):>9.2f}"
+            f"{percentile(latencies, 99):>9.2f}"
+            f"{percentile(latencies, 100):>9.2f}"
+        )
+
+    print()
+    for i, cpu in enumerate(cpu_used):
+        print(
+            f"Server {i}: {cpu:.2f}s CPU over {wall_time:.2f}s"
+            f" ({cpu / wall_time:.0%} of one core)"
+        )
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--typists", type=int, default=4)
+    parser.add_argument("--ipcs", type=int, default=1)
+    parser.add_argument(
+        "--rate", type=float, default=10, help="keystrokes/s per typist"
+    )
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument(
+        "--drain",
+        type=float,
+        default=5,
+        help="seconds to wait for outstanding responses",
+    )
+    parser.add_argument("--viewport", type=int, default=50)
+    parser.add_argument("--language", default="python")
+    parser.add_argument("--files", type=Path, nargs="*")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
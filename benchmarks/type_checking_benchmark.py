@@ -0,0 +1,116 @@
+"""Measures how much beartype's runtime type checking costs per command.
+
+The benchmark runs itself twice in fresh interpreters, once with
+SALVE_TYPE_CHECKING=1 and once with SALVE_TYPE_CHECKING=0, times the server
+function behind every command on the same file and prints the difference.
+
+Run ``python3 benchmarks/type_checking_benchmark.py --help`` to see the options.
+"""
+
+from argparse import ArgumentParser, Namespace
+from json import dumps, loads
+from os import environ
+from pathlib import Path
+from subprocess import run
+from sys import executable
+from time import perf_counter
+
+BENCHMARK_FILE: Path = (
+    Path(__file__).parent.parent / "salve" / "server_functions" / "highlight"
+)
+PYTHON_REGEXES: list[tuple[str, str]] = [
+    (r"def ", "after"),
+    (r"import .*,? ", "after"),
+    (r"from ", "after"),
+    (r"class ", "after"),
+    (r":?.*=.*", "before"),
+]
+
+
+def time_commands(text: str, runs: int) -> dict[str, float]:
+    """Returns the mean time in milliseconds each command's server function takes on text"""
+    # Imported here so that the environment variable is read by the child process only
+    from salve import (
+        AUTOCOMPLETE,
+        DEFINITION,
+        HIGHLIGHT,
+        LINKS_AND_CHARS,
+        REPLACEMENTS,
+    )
+    from salve.server_functions import (
+        find_autocompletions,
+        get_definition,
+        get_highlights,
+        get_replacements,
+        get_special_tokens,
+    )
+
+    line_count: int = len(text.splitlines())
+    commands = {
+        AUTOCOMPLETE: lambda: find_autocompletions(text, ["def", "for"], "t"),
+        REPLACEMENTS: lambda: get_replacements(text, ["def", "for"], "toekn"),
+        HIGHLIGHT: lambda: get_highlights(text, "python"),
+        DEFINITION: lambda: get_definition(text, PYTHON_REGEXES, "token"),
+        LINKS_AND_CHARS: lambda: get_special_tokens(text, (1, line_count)),
+    }
+
+    timings: dict[str, float] = {}
+    for command, function in commands.items():
+        function()  # Warm up any caches
+        start: float = perf_counter()
+        for _ in range(runs):
+            function()
+        timings[command] = (perf_counter() - start) / runs * 1000
+    return timings
+
+
+def run_child(type_checking: bool, args: Namespace) -> dict[str, float]:
+    env: dict[str, str] = environ | {
+        "SALVE_TYPE_CHECKING": str(int(type_checking))
+    }
+    output = run(
+        [executable, __file__, "--child", "--runs", str(args.runs)]
+        + [str(file) for file in args.files],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return loads(output.stdout)
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--child", action="store_true", help="internal")
+    parser.add_argument(
+        "files",
+        type=Path,
+        nargs="*",
+        default=sorted(BENCHMARK_FILE.glob("*.py")),
+    )
+    args: Namespace = parser.parse_args()
+
+    if args.child:
+        text: str = "\n".join(file.read_text() for file in args.files)
+        print(dumps(time_commands(text, args.runs)))
+        return
+
+    checked: dict[str, float] = run_child(True, args)
+    unchecked: dict[str, float] = run_child(False, args)
+
+    print(
+        f"{'command':<16}{'checked ms':>12}{'unchecked ms':>14}"
+        f"{'saved ms':>10}{'saved':>8}"
+    )
+    for command, checked_time in checked.items():
+        unchecked_time: float = unchecked[command]
+        saved: float = checked_time - unchecked_time
+        print(
+            f"{command:<16}{checked_time:>12.3f}{unchecked_time:>14.3f}"
+            f"{saved:>10.3f}{saved / checked_time:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
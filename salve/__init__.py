@@ -1,17 +1,37 @@
-from beartype.claw import beartype_this_package
+from .misc import RUNTIME_TYPE_CHECKING  # Needed before the claw hooks
 
-beartype_this_package()
+if RUNTIME_TYPE_CHECKING:
+    from beartype.claw import beartype_this_package
+
+    beartype_this_package()
 
 from collegamento import Response  # noqa: F401, E402
 
+from .codec import MarshalCodec, MessageCodec, PickleCodec  # noqa: F401
+from .daemon import SalveDaemon  # noqa: F401
 from .ipc import IPC  # noqa: F401, E402
 from .misc import (  # noqa: F401, E402
+    ADD_DIRECTORY,
     AUTOCOMPLETE,
+    CANCEL,
     COMMANDS,
     DEFINITION,
     EDITORCONFIG,
     HIGHLIGHT,
     LINKS_AND_CHARS,
+    MEMORY_USAGE,
+    REFERENCES,
+    REGISTER_LANGUAGE,
     REPLACEMENTS,
+    REQUEST_FIELDS,
+    TYPE_CHECKING_ENV_VAR,
+    WORK_BUDGETS,
+)
+from .queue_limits import (  # noqa: F401
+    BLOCK,
+    DROP_OLDEST,
+    REJECT_NEWEST,
+    QueueLimit,
 )
 from .server_functions import is_unicode_letter  # noqa: F401, E402
+from .work_budgets import WorkBudgets  # noqa: F401
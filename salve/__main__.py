@@ -0,0 +1,28 @@
+from argparse import ArgumentParser
+
+from . import SalveDaemon
+
+parser = ArgumentParser(
+    prog="python3 -m salve",
+    description="Runs a salve daemon that IPC(daemon_address=...) can attach to",
+)
+parser.add_argument("address", help="path of the Unix domain socket")
+parser.add_argument("--cache", help="path of the persistent index cache")
+parser.add_argument(
+    "--memory-budget",
+    type=int,
+    help="bytes of file text and derived data to keep in memory",
+)
+parser.add_argument(
+    "--highlight-workers",
+    type=int,
+    default=0,
+    help="processes that highlight big ranges in parallel",
+)
+args = parser.parse_args()
+SalveDaemon(
+    args.address,
+    cache_path=args.cache,
+    memory_budget=args.memory_budget,
+    highlight_workers=args.highlight_workers,
+).serve_forever()
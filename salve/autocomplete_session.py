@@ -0,0 +1,61 @@
+from collections import Counter
+from dataclasses import dataclass
+
+from .server_functions.autocompletions import WordPositions
+from .server_functions.misc import first_difference, word_candidate_regex
+
+
+@dataclass
+class AutocompleteSession:
+    """The relevant words of the last AUTOCOMPLETE request. Words completing a longer current word are a subset
+    of them so the next keystroke only has to filter these instead of the whole file - internal API"""
+
+    file: str
+    full_text: str
+    current_word: str
+    relevant_words: Counter[str]
+    # Still right for every other word as typing a word doesn't move any lines
+    positions: WordPositions | None = None
+
+    def only_word_extended(self, full_text: str, current_word: str) -> bool:
+        """Whether full_text is the session's text with the current word typed further and nothing else changed"""
+        typed: str = current_word[len(self.current_word) :]
+        if (
+            not typed
+            or not current_word.startswith(self.current_word)
+            or word_candidate_regex.fullmatch(current_word) is None
+            or len(full_text) != len(self.full_text) + len(typed)
+        ):
+            return False
+
+        end: int = first_difference(self.full_text, full_text)
+        start: int = end - len(self.current_word)
+        if (
+            full_text[start : end + len(typed)] != current_word
+            or full_text[end + len(typed) :] != self.full_text[end:]
+        ):
+            return False
+
+        # The word at the cursor must stay a whole word or other words' counts change
+        return not any(
+            0 <= index < len(full_text)
+            and word_candidate_regex.match(full_text[index])
+            for index in (start - 1, end + len(typed))
+        )
+
+    def narrow(
+        self, file: str, full_text: str, current_word: str
+    ) -> Counter[str] | None:
+        """The relevant words of current_word if they can be found from the session's, otherwise None"""
+        if file != self.file or not self.only_word_extended(
+            full_text, current_word
+        ):
+            return None
+
+        return Counter(
+            {
+                word: count
+                for word, count in self.relevant_words.items()
+                if word != current_word and word.startswith(current_word)
+            }
+        )
@@ -0,0 +1,127 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from marshal import dumps as marshal_dumps
+from marshal import loads as marshal_loads
+from multiprocessing import Pipe
+from multiprocessing.queues import Queue as GenericQueueClass
+from os import getpid
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+from select import PIPE_BUF, select
+from threading import Condition, Thread
+from typing import Any
+
+MARSHALLED: bytes = b"m"
+PICKLED: bytes = b"p"
+
+
+class MessageCodec(ABC):
+    """Turns the messages sent between an IPC and its server into bytes and back. Subclass it and give an instance
+    to IPC(codec=...) to plug in another format - external API"""
+
+    @abstractmethod
+    def encode(self, message: Any) -> bytes: ...
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any: ...
+
+
+class PickleCodec(MessageCodec):
+    """pickle with the newest protocol instead of the older default multiprocessing uses - external API"""
+
+    def encode(self, message: Any) -> bytes:
+        return dumps(message, HIGHEST_PROTOCOL)
+
+    def decode(self, data: bytes) -> Any:
+        return loads(data)
+
+
+class MarshalCodec(MessageCodec):
+    """marshal, which is faster than pickle for the plain dicts, lists, tuples, strs and ints almost every message is
+    made of. Messages with anything else (like a Path or WorkBudgets) fall back to pickle - external API"""
+
+    def encode(self, message: Any) -> bytes:
+        try:
+            return MARSHALLED + marshal_dumps(message)
+        except ValueError:
+            return PICKLED + dumps(message, HIGHEST_PROTOCOL)
+
+    def decode(self, data: bytes) -> Any:
+        # Slicing a memoryview doesn't copy the (possibly huge) rest of the message
+        if data[:1] == MARSHALLED:
+            return marshal_loads(memoryview(data)[1:])
+        return loads(memoryview(data)[1:])
+
+
+class CodecPipe(GenericQueueClass):
+    """A one way pipe standing in for a multiprocessing queue. Messages are encoded once by the codec and sent as
+    bytes, where a queue would pickle the encoded bytes a second time. Like a queue, put() never blocks on a full
+    pipe: small messages are written right away when the pipe has room for them and a feeder thread sends the
+    rest in the background - internal API"""
+
+    # NOTE: collegamento type checks for multiprocessing queues so we subclass one without ever initializing it
+    def __init__(self, codec: MessageCodec) -> None:
+        self.codec: MessageCodec = codec
+        self.reader, self.writer = Pipe(duplex=False)
+        self.start_buffer()
+
+    def start_buffer(self) -> None:
+        self.buffer: deque[bytes] = deque()
+        # Messages given to the feeder that it hasn't finished sending
+        self.unsent: int = 0
+        self.buffer_changed = Condition()
+        # Threads don't survive a fork so the feeder is started by the first put() of each process
+        self.feeder_pid: int = 0
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {
+            "codec": self.codec,
+            "reader": self.reader,
+            "writer": self.writer,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.start_buffer()
+
+    def put(self, obj: Any) -> None:  # type: ignore
+        data: bytes = self.codec.encode(obj)
+        with self.buffer_changed:
+            if self.feeder_pid != getpid():
+                self.buffer.clear()
+                self.unsent = 0
+                self.feeder_pid = getpid()
+                Thread(target=self.feed, daemon=True).start()
+            if not self.unsent and self.fits_in_pipe(data):
+                self.writer.send_bytes(data)
+                return
+            self.unsent += 1
+            self.buffer.append(data)
+            self.buffer_changed.notify()
+
+    def feed(self) -> None:
+        while True:
+            with self.buffer_changed:
+                while not self.buffer:
+                    self.buffer_changed.wait()
+                data: bytes = self.buffer.popleft()
+            try:
+                self.writer.send_bytes(data)
+            except OSError:
+                # The other end is gone (the server was killed or restarted)
+                return
+            with self.buffer_changed:
+                self.unsent -= 1
+
+    def fits_in_pipe(self, data: bytes) -> bool:
+        """Whether sending the data can't block: writes of up to PIPE_BUF bytes are atomic and a writable pipe
+        has room for at least that many"""
+        # send_bytes() writes a 4 byte length header with the data
+        if len(data) + 4 > PIPE_BUF:
+            return False
+        return bool(select([], [self.writer], [], 0)[1])
+
+    def get(self) -> Any:  # type: ignore
+        return self.codec.decode(self.reader.recv_bytes())
+
+    def empty(self) -> bool:
+        return not self.reader.poll()
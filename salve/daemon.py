@@ -0,0 +1,157 @@
+from logging import Logger, getLogger
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.queues import Queue as GenericQueueClass
+from os import chmod, remove, urandom
+from pathlib import Path
+from threading import Thread
+from typing import Any
+
+from collegamento import USER_FUNCTION
+
+from .highlight_pool import HighlightPool
+from .server import SalveServer
+from .workspace import Workspace
+from .wrappers import COMMAND_WRAPPERS
+
+
+class DaemonConnection(GenericQueueClass):
+    """A Connection to (or from) the daemon dressed up as the queues and server process collegamento expects - internal API"""
+
+    # NOTE: collegamento type checks for multiprocessing queues so we subclass one without ever initializing it
+    def __init__(self, connection: Connection) -> None:
+        self.connection: Connection = connection
+
+    def put(self, obj: Any) -> None:  # type: ignore
+        self.connection.send(obj)
+
+    def get(self) -> Any:  # type: ignore
+        return self.connection.recv()
+
+    def empty(self) -> bool:
+        return not self.connection.poll()
+
+    def is_alive(self) -> bool:
+        if self.connection.closed:
+            return False
+
+        try:
+            self.connection.poll()
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def kill(self) -> None:
+        self.connection.close()
+
+
+def authkey_path(address: str) -> Path:
+    """The file next to the socket holding the key clients authenticate with (only readable by its owner)"""
+    return Path(f"{address}.key")
+
+
+def write_authkey(address: str) -> bytes:
+    authkey: bytes = urandom(32)
+    path: Path = authkey_path(address)
+    path.unlink(missing_ok=True)
+    # Created with 0600 permissions before the key is written so no one else can ever read it
+    path.touch(0o600, exist_ok=False)
+    path.write_bytes(authkey)
+    return authkey
+
+
+def connect_to_daemon(address: str) -> DaemonConnection:
+    return DaemonConnection(
+        Client(
+            address,
+            family="AF_UNIX",
+            authkey=authkey_path(address).read_bytes(),
+        )
+    )
+
+
+class SalveDaemon:
+    """A long lived server that many IPC's can share through a Unix domain socket. Files are shared between clients
+    and only removed once every client that updated them removed them (or disconnected). The public API includes:
+    - SalveDaemon.serve_forever()
+    - SalveDaemon.close()
+    """
+
+    def __init__(
+        self,
+        address: str,
+        commands: dict[str, USER_FUNCTION] = COMMAND_WRAPPERS,
+        cache_path: str | None = None,
+        memory_budget: int | None = None,
+        highlight_workers: int = 0,
+    ) -> None:
+        self.logger: Logger = getLogger("Daemon")
+        self.address: str = address
+        self.commands: dict[str, USER_FUNCTION] = commands
+        self.workspace = Workspace(cache_path, memory_budget)
+        self.client_count: int = 0
+        self.highlight_pool: HighlightPool | None = (
+            HighlightPool(highlight_workers) if highlight_workers else None
+        )
+
+        if Path(address).exists():
+            try:
+                connect_to_daemon(address).kill()
+            except (ConnectionError, OSError):
+                self.logger.info(f"Removing stale socket {address}")
+                remove(address)
+            else:
+                raise OSError(f"A daemon is already listening on {address}")
+
+        self.listener = Listener(
+            address, family="AF_UNIX", authkey=write_authkey(address)
+        )
+        # Only its owner may connect (and clients need the key as well)
+        chmod(address, 0o600)
+        self.logger.info(f"Daemon listening on {address}")
+
+    def serve_forever(self) -> None:
+        """Accepts clients until SalveDaemon.close() is called - external API"""
+        while True:
+            try:
+                connection: Connection = self.listener.accept()
+            except (AuthenticationError, EOFError):
+                self.logger.warning("Refused a client without the key")
+                continue
+            except OSError:
+                self.logger.info(
+                    "Listener closed, no longer accepting clients"
+                )
+                return
+
+            self.client_count += 1
+            Thread(
+                target=self.serve_client,
+                args=(connection, self.client_count),
+                daemon=True,
+            ).start()
+
+    def serve_client(self, connection: Connection, client_id: int) -> None:
+        """Runs a SalveServer for one client on the shared Workspace until it disconnects - internal API"""
+        self.logger.info(f"Client {client_id} connected")
+        queue = DaemonConnection(connection)
+        try:
+            SalveServer(
+                self.commands.copy(),
+                queue,
+                queue,
+                getLogger(f"Server {client_id}"),
+                self.workspace,
+                client_id,
+                highlight_pool=self.highlight_pool,
+            )
+        except (EOFError, OSError):
+            self.logger.info(f"Client {client_id} disconnected")
+        finally:
+            self.workspace.release_owner(client_id)
+            connection.close()
+
+    def close(self) -> None:
+        """Stops accepting new clients and removes the socket and its key - external API"""
+        self.listener.close()
+        authkey_path(self.address).unlink(missing_ok=True)
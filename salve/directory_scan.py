@@ -0,0 +1,129 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+
+from collegamento import Request
+
+from .highlight_pool import CallToken, HighlightPool
+from .server_functions import read_text_file
+from .workspace import Workspace, count_words
+
+PROGRESS_INTERVAL: float = 0.1  # Seconds between progress notifications
+SCAN_STEP_SECONDS: float = (
+    0.01  # Time a scan step may take before the server looks at requests again
+)
+FILES_PER_WORKER: int = 16  # Files handed to each worker ahead of time (and read for nothing if the scan is cancelled)
+
+
+def read_file_words(
+    path: Path, max_file_size: int
+) -> tuple[str, Counter[str]] | None:
+    """Reads the file and counts its words (on a worker), None if it is skipped - internal API"""
+    contents: str | None = read_text_file(path, max_file_size)
+    if contents is None:
+        return None
+    return contents, count_words(contents)
+
+
+@dataclass
+class DirectoryScan:
+    """An ADD_DIRECTORY request whose files are read and indexed a few at a time between other requests. With a
+    HighlightPool the workers read the files and count their words ahead of the steps, which only add the results
+    to the Workspace - internal API"""
+
+    request: Request
+    paths: list[Path]
+    next_path: int = 0
+    added_files: list[str] = field(default_factory=list)
+    skipped_files: list[str] = field(default_factory=list)
+    last_progress: float = 0.0
+    pool: HighlightPool | None = None
+    token: CallToken | None = None
+    # Index of the first path not handed to a worker yet
+    next_submitted: int = 0
+    # Index of the path -> what the worker read, until its turn comes
+    read_files: dict[int, tuple[str, Counter[str]] | None] = field(
+        default_factory=dict
+    )
+
+    def step(self, workspace: Workspace, owner: int, step_end: float) -> None:
+        """Adds files until the scan is finished or it is step_end"""
+        while not self.finished() and perf_counter() < step_end:
+            if self.pool is not None and not self.pool.stalled:
+                if self.token is None:
+                    self.token = self.pool.start_call()
+                self.submit_files()
+                # Waits for the next file if the workers haven't read it yet
+                self.read_files.update(
+                    self.pool.take_results(
+                        self.token,
+                        0 if self.next_path in self.read_files else 1,
+                    )
+                )
+            # Without a pool (or once its workers stalled) files are read here
+            self.add_next_file(
+                workspace,
+                owner,
+                self.read_files.pop(self.next_path)
+                if self.next_path in self.read_files
+                else read_file_words(
+                    self.paths[self.next_path],
+                    self.request["max_file_size"],  # type: ignore
+                ),
+            )
+        if self.finished():
+            self.cancel()
+
+    def submit_files(self) -> None:
+        """Keeps FILES_PER_WORKER files per worker handed out ahead of the next one to add"""
+        last: int = min(
+            self.next_path + self.pool.workers * FILES_PER_WORKER,  # type: ignore
+            len(self.paths),
+        )
+        while self.next_submitted < last:
+            self.pool.submit(  # type: ignore
+                self.token,  # type: ignore
+                self.next_submitted,
+                read_file_words,
+                (
+                    self.paths[self.next_submitted],
+                    self.request["max_file_size"],
+                ),
+            )
+            self.next_submitted += 1
+
+    def add_next_file(
+        self,
+        workspace: Workspace,
+        owner: int,
+        read_file: tuple[str, Counter[str]] | None,
+    ) -> None:
+        file: str = str(self.paths[self.next_path])
+        self.next_path += 1
+        if read_file is None:
+            self.skipped_files.append(file)
+            return
+
+        contents, words = read_file
+        workspace.update_file(file, contents, owner)
+        # The budget is enforced once per step instead of for every file
+        workspace.set_derived(
+            file, "words", words, persist=False, enforce_budget=False
+        )
+        self.added_files.append(file)
+
+    def cancel(self) -> None:
+        """Drops the files the workers are still reading"""
+        if self.pool is not None and self.token is not None:
+            self.pool.end_call(self.token)
+            self.token = None
+
+    def finished(self) -> bool:
+        return self.next_path == len(self.paths)
+
+    def progress(self) -> dict[str, int]:
+        return {"done": self.next_path, "total": len(self.paths)}
+
+    def result(self) -> dict[str, list[str]]:
+        return {"files": self.added_files, "skipped": self.skipped_files}
@@ -0,0 +1,60 @@
+from hashlib import blake2b
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+from sqlite3 import Connection, connect
+from threading import Lock
+from typing import Any
+
+try:
+    SALVE_VERSION: str = version("salve")
+except PackageNotFoundError:
+    SALVE_VERSION = "unknown"
+
+
+def hash_contents(contents: str) -> str:
+    return blake2b(
+        contents.encode("utf-8", "surrogatepass"), digest_size=16
+    ).hexdigest()
+
+
+class DiskCache:
+    """sqlite backed store of data derived from file contents, keyed by content hash and salve version, that survives restarts - internal API"""
+
+    def __init__(self, path: Path | str) -> None:
+        self.lock = Lock()
+        self.connection: Connection = connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        # It's only a cache so losing the last writes in a crash is fine
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS derived (hash TEXT, version TEXT,"
+            " name TEXT, data BLOB, PRIMARY KEY (hash, version, name))"
+        )
+
+    def get(self, content_hash: str, name: str) -> Any | None:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data FROM derived WHERE hash = ? AND version = ?"
+                " AND name = ?",
+                (content_hash, SALVE_VERSION, name),
+            ).fetchone()
+        return None if row is None else loads(row[0])
+
+    def put(self, content_hash: str, name: str, data: Any) -> None:
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO derived VALUES (?, ?, ?, ?)",
+                (
+                    content_hash,
+                    SALVE_VERSION,
+                    name,
+                    dumps(data, HIGHEST_PROTOCOL),
+                ),
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,87 @@
+from io import SEEK_END
+from sys import getsizeof
+from tempfile import TemporaryFile
+from threading import Lock
+from typing import IO, Any
+
+
+def estimate_size(data: Any) -> int:
+    """Roughly how many bytes data and everything it contains use, counting shared objects once"""
+    seen: set[int] = set()
+    size: int = 0
+    stack: list[Any] = [data]
+    while stack:
+        obj: Any = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return size
+
+
+class DocumentStore(dict[str, str]):
+    """The text of every file where cold files can be spilled to an anonymous temporary file and are
+    transparently read back the next time they are looked up. Iterating only sees files in memory - internal API
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # File -> (offset, length) of its encoded text in the spill file
+        self.spilled: dict[str, tuple[int, int]] = {}
+        # Unlinked on creation so the OS frees it even if the server is killed
+        self.spill_file: IO[bytes] | None = None
+        self.spill_lock = Lock()
+
+    def __missing__(self, file: str) -> str:
+        with self.spill_lock:
+            if dict.__contains__(self, file):
+                # Another thread read it back while we waited
+                return dict.__getitem__(self, file)
+
+            offset, length = self.spilled.pop(file)  # Raises the KeyError
+            self.spill_file.seek(offset)  # type: ignore
+            contents: str = self.spill_file.read(length).decode(  # type: ignore
+                "utf-8", "surrogatepass"
+            )
+            if not self.spilled:
+                self.spill_file.truncate(0)  # type: ignore
+            dict.__setitem__(self, file, contents)
+            return contents
+
+    def __contains__(self, file: object) -> bool:
+        return dict.__contains__(self, file) or file in self.spilled
+
+    def __setitem__(self, file: str, contents: str) -> None:
+        self.spilled.pop(file, None)
+        super().__setitem__(file, contents)
+
+    def get(self, file: str, default: Any = None) -> Any:  # type: ignore
+        try:
+            return self[file]
+        except KeyError:
+            return default
+
+    def pop(self, file: str, *default: Any) -> Any:  # type: ignore
+        self.spilled.pop(file, None)
+        return super().pop(file, *default)
+
+    def is_spilled(self, file: str) -> bool:
+        return file in self.spilled
+
+    def spill(self, file: str) -> None:
+        """Moves the file's text out of memory"""
+        with self.spill_lock:
+            encoded_contents: bytes = dict.pop(self, file).encode(
+                "utf-8", "surrogatepass"
+            )
+            if self.spill_file is None:
+                # Lives as long as the store so it can't be opened in a with block
+                self.spill_file = TemporaryFile()  # noqa: SIM115
+            offset: int = self.spill_file.seek(0, SEEK_END)
+            self.spill_file.write(encoded_contents)
+            self.spilled[file] = (offset, len(encoded_contents))
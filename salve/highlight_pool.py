@@ -0,0 +1,254 @@
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import count
+from multiprocessing import get_context
+from multiprocessing.context import BaseContext
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue as GenericQueueClass
+from os import getpid
+from queue import Empty
+from threading import Lock
+from typing import Any
+
+from beartype.typing import Callable
+from token_tools import Token
+
+from .server_functions import get_highlights
+from .server_functions.highlight.highlight import (
+    HighlightChunk,
+    highlight_chunks,
+    highlight_lines,
+)
+from .server_functions.misc import never_stop
+
+PARALLEL_MIN_LINES: int = (
+    2000  # Smaller ranges aren't worth sending to other processes
+)
+CHUNKS_PER_WORKER: int = 2  # Evens out chunks that take longer than others
+RESULT_TIMEOUT: float = 5.0  # Seconds without any result after which the workers are taken to be dead
+DEFAULT_CONTEXT: BaseContext = get_context()
+
+
+# (pid of the server, number of the call) so calls of a restarted server never get results meant for the old one
+CallToken = tuple[int, int]
+
+
+def highlight_worker(
+    tasks: GenericQueueClass, results: GenericQueueClass
+) -> None:
+    """Runs tasks (highlighting chunks or reading files) until it gets None - internal API"""
+    while (task := tasks.get()) is not None:
+        token, index, function, arguments = task
+        results.put((token, index, function(*arguments)))
+
+
+class HighlightPool:
+    """Worker processes that highlight chunks of big ranges and read the files of added directories in parallel.
+    The pool is started by the client (or daemon) because the server runs in a daemonic process, which isn't
+    allowed to have children, and only its queues are handed to the server. The same pool is handed to every
+    server the client (re)starts, so results are tagged with the call they belong to. If the workers stop answering
+    (one was killed) the pool is marked as stalled and callers do the missing work themselves - internal API"""
+
+    def __init__(
+        self, workers: int, context: BaseContext = DEFAULT_CONTEXT
+    ) -> None:
+        self.workers: int = workers
+        # The queues have to come from the same context as the server they are handed to
+        self.tasks: GenericQueueClass = context.Queue()
+        self.results: GenericQueueClass = context.Queue()
+        self.lock = Lock()
+        self.start_calls()
+        self.stalled: bool = False
+        self.processes: list[BaseProcess] = [
+            context.Process(  # type: ignore
+                target=highlight_worker,
+                args=(self.tasks, self.results),
+                daemon=True,
+            )
+            for _ in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Processes and locks can't be pickled when the server is spawned
+        return {
+            "workers": self.workers,
+            "tasks": self.tasks,
+            "results": self.results,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.lock = Lock()
+        self.start_calls()
+        self.stalled = False
+        self.processes = []
+
+    def start_calls(self) -> None:
+        self.call_numbers = count()
+        # Call -> results that arrived but weren't taken yet (index of the task -> result)
+        self.calls: dict[CallToken, dict[int, Any]] = {}
+
+    def start_call(self) -> CallToken:
+        """Returns the token that tags the tasks of a new call and their results"""
+        with self.lock:
+            token: CallToken = (getpid(), next(self.call_numbers))
+            self.calls[token] = {}
+        return token
+
+    def submit(
+        self,
+        token: CallToken,
+        index: int,
+        function: Callable[..., Any],
+        arguments: tuple,
+    ) -> None:
+        """Has a worker run function(*arguments), a module level function as it is pickled by name"""
+        self.tasks.put((token, index, function, arguments))
+
+    def take_results(
+        self, token: CallToken, wait_for: int = 0
+    ) -> dict[int, Any]:
+        """Removes and returns the results of the call that arrived so far, waiting until there are at least wait_for
+        unless the pool stalls (there may be fewer then)"""
+        # Daemon clients share the pool so only one of them reads the results at a time and hands the others theirs
+        with self.lock:
+            results: dict[int, Any] = self.calls[token]
+            while len(results) < wait_for or not self.results.empty():
+                try:
+                    result_token, index, result = self.results.get(
+                        timeout=RESULT_TIMEOUT
+                    )
+                except Empty:
+                    self.stalled = True
+                    # Tasks nobody will take would otherwise keep this process from exiting
+                    self.tasks.cancel_join_thread()
+                    break
+                # Results of ended calls are dropped
+                if result_token in self.calls:
+                    self.calls[result_token][index] = result
+            self.calls[token] = {}
+        return results
+
+    def end_call(self, token: CallToken) -> None:
+        """Drops the results of the call, including any that arrive later"""
+        with self.lock:
+            self.calls.pop(token, None)
+
+    def highlight(
+        self,
+        full_text: str,
+        language: str = "text",
+        text_range: tuple[int, int] = (1, -1),
+        should_stop: Callable[[], bool] = never_stop,
+    ) -> list[Token]:
+        """Same output as get_highlights() but large ranges are split between the workers. Once chunks are
+        handed out should_stop() is no longer checked so the queues never hold stale results"""
+        chunks: list[HighlightChunk] = highlight_chunks(
+            full_text,
+            language,
+            text_range,
+            self.workers * CHUNKS_PER_WORKER,
+            should_stop,
+        )
+        if (
+            self.stalled
+            or sum(len(chunk[0]) for chunk in chunks) < PARALLEL_MIN_LINES
+        ):
+            return get_highlights(full_text, language, text_range, should_stop)
+
+        # Chunks end on line boundaries and tokens never span lines so they just need to be put back in order
+        return [
+            token
+            for chunk_tokens in self.highlight_in_parallel(chunks)
+            for token in chunk_tokens
+        ]
+
+    def highlight_in_parallel(
+        self, chunks: list[HighlightChunk]
+    ) -> list[list[Token]]:
+        """The tokens of each chunk in the order of the chunks"""
+        token: CallToken = self.start_call()
+        for index, chunk in enumerate(chunks):
+            self.submit(token, index, highlight_lines, chunk)
+        results: dict[int, list[Token]] = self.take_results(token, len(chunks))
+        self.end_call(token)
+        # Chunks lost with a dead worker are highlighted here
+        return [
+            results[index] if index in results else highlight_lines(*chunk)
+            for index, chunk in enumerate(chunks)
+        ]
+
+    def close(self) -> None:
+        for process in self.processes:
+            process.kill()
+        # The tasks left for the killed workers are never sent
+        self.tasks.cancel_join_thread()
+
+
+class ThreadHighlightPool(HighlightPool):
+    """A HighlightPool of threads for servers running in the client's process. Chunks share the text instead of
+    it being pickled for each worker and on free-threaded builds of Python they are highlighted in parallel - internal API
+    """
+
+    # NOTE: it is a subclass so it can be given wherever a HighlightPool is expected but it has no processes or queues
+    def __init__(self, workers: int) -> None:  # type: ignore
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(workers)
+        # Threads can't be killed
+        self.stalled = False
+        self.lock = Lock()
+        self.call_numbers = count()
+        # Call -> futures of the tasks whose results weren't taken yet
+        self.futures: dict[CallToken, dict[int, Future]] = {}
+
+    def start_call(self) -> CallToken:
+        with self.lock:
+            token: CallToken = (getpid(), next(self.call_numbers))
+            self.futures[token] = {}
+        return token
+
+    def submit(
+        self,
+        token: CallToken,
+        index: int,
+        function: Callable[..., Any],
+        arguments: tuple,
+    ) -> None:
+        self.futures[token][index] = self.executor.submit(function, *arguments)
+
+    def take_results(
+        self, token: CallToken, wait_for: int = 0
+    ) -> dict[int, Any]:
+        futures: dict[int, Future] = self.futures[token]
+        while sum(future.done() for future in futures.values()) < min(
+            wait_for, len(futures)
+        ):
+            wait(
+                [future for future in futures.values() if not future.done()],
+                return_when=FIRST_COMPLETED,
+            )
+        done: list[int] = [
+            index for index, future in futures.items() if future.done()
+        ]
+        return {index: futures.pop(index).result() for index in done}
+
+    def end_call(self, token: CallToken) -> None:
+        with self.lock:
+            for future in self.futures.pop(token, {}).values():
+                future.cancel()
+
+    def highlight_in_parallel(
+        self, chunks: list[HighlightChunk]
+    ) -> list[list[Token]]:
+        return list(
+            self.executor.map(lambda chunk: highlight_lines(*chunk), chunks)
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
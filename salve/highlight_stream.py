@@ -0,0 +1,88 @@
+from dataclasses import dataclass, field
+
+from collegamento import Request
+from token_tools import Token, normal_text_range
+
+from .server_functions import get_highlights
+
+STREAM_CHUNK_LINES: int = 250  # Lines highlighted per background step
+
+
+@dataclass
+class HighlightStream:
+    """A progressive HIGHLIGHT request: the viewport is highlighted right away and the rest of
+    the file is filled in chunk by chunk, nearest to the viewport first - internal API"""
+
+    request: Request
+    file: str
+    full_text: str
+    language: str
+    viewport: tuple[int, int]
+    # Start line of each chunk -> its tokens, kept so a reprioritized stream can reuse them
+    computed_chunks: dict[int, list[Token]] = field(default_factory=dict)
+    remaining_chunks: list[int] = field(default_factory=list)
+    line_count: int = 0
+
+    def __post_init__(self) -> None:
+        self.viewport = normal_text_range(self.full_text, self.viewport)[1]
+        self.line_count = len(self.full_text.splitlines())
+        viewport_middle: int = (self.viewport[0] + self.viewport[1]) // 2
+        self.remaining_chunks = sorted(
+            range(1, self.line_count + 1, STREAM_CHUNK_LINES),
+            key=lambda start: abs(
+                start + STREAM_CHUNK_LINES // 2 - viewport_middle
+            ),
+        )
+
+    def adopt_chunks(self, other: "HighlightStream") -> None:
+        """Takes over the chunks an earlier stream of the same text (before the viewport moved) computed"""
+        if (other.file, other.full_text, other.language) != (
+            self.file,
+            self.full_text,
+            self.language,
+        ):
+            return
+
+        self.computed_chunks = other.computed_chunks
+        self.remaining_chunks = [
+            start
+            for start in self.remaining_chunks
+            if start not in self.computed_chunks
+        ]
+
+    def outside_viewport(self, tokens: list[Token]) -> list[Token]:
+        """The viewport is sent first so chunks leave those lines out"""
+        return [
+            token
+            for token in tokens
+            if not self.viewport[0] <= token[0][0] <= self.viewport[1]
+        ]
+
+    def viewport_tokens(self) -> list[Token]:
+        return get_highlights(self.full_text, self.language, self.viewport)
+
+    def reused_tokens(self) -> list[Token]:
+        """Tokens of chunks a previous stream of the same text already computed"""
+        return [
+            token
+            for chunk in self.computed_chunks.values()
+            for token in self.outside_viewport(chunk)
+        ]
+
+    def next_chunk(self) -> list[Token]:
+        start: int = self.remaining_chunks.pop(0)
+        chunk: list[Token] = get_highlights(
+            self.full_text,
+            self.language,
+            (start, min(start + STREAM_CHUNK_LINES - 1, self.line_count)),
+        )
+        self.computed_chunks[start] = chunk
+        return self.outside_viewport(chunk)
+
+    def finished(self) -> bool:
+        return not self.remaining_chunks
+
+    def file_highlights(self) -> list[Token]:
+        return sorted(
+            token for chunk in self.computed_chunks.values() for token in chunk
+        )
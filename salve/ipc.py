@@ -1,47 +1,299 @@
+from collections import Counter, deque
+from functools import partial
+from logging import getLogger
+from multiprocessing import freeze_support, get_context
+from os import environ
 from pathlib import Path
+from time import monotonic, sleep, time
 
-from collegamento import FileClient
+from collegamento import (
+    CollegamentoError,
+    FileClient,
+    Response,
+    SimpleClient,
+)
 
+from .codec import CodecPipe, MessageCodec
+from .daemon import DaemonConnection, connect_to_daemon
+from .highlight_pool import HighlightPool, ThreadHighlightPool
 from .misc import (
-    AUTOCOMPLETE,
+    ADD_DIRECTORY,
+    CANCEL,
     COMMAND,
     COMMANDS,
-    DEFINITION,
     EDITORCONFIG,
     HIGHLIGHT,
-    LINKS_AND_CHARS,
-    REPLACEMENTS,
-)
-from .wrappers import (
-    editorconfig_request_wrapper,
-    find_autocompletions_request_wrapper,
-    get_definition_request_wrapper,
-    get_highlights_request_wrapper,
-    get_replacements_request_wrapper,
-    get_special_tokens_request_wrapper,
+    MEMORY_USAGE,
+    REGISTER_LANGUAGE,
+    REQUEST_FIELDS,
+    RUNTIME_TYPE_CHECKING,
+    TYPE_CHECKING_ENV_VAR,
+    WORK_BUDGETS,
 )
+from .queue_limits import BLOCK, DROP_OLDEST, QueueLimit
+from .server import SalveServer
+from .thread_backend import ServerThread, ThreadQueue
+from .work_budgets import WorkBudgets
+from .wrappers import COMMAND_WRAPPERS
+
+PROCESS_BACKEND: str = "process"
+THREAD_BACKEND: str = "thread"
+BACKENDS: list[str] = [PROCESS_BACKEND, THREAD_BACKEND]
+
+# Notifications of these commands carry part of the result so ones that weren't picked up yet are combined
+STREAMED_COMMANDS: list[str] = [HIGHLIGHT]
 
 
 class IPC(FileClient):
     """The IPC class is used to talk to the server and run commands. The public API includes the following methods:
     - IPC.request()
+    - IPC.cancel_request()
     - IPC.update_file()
+    - IPC.track_file()
     - IPC.remove_file()
+    - IPC.add_directory()
+    - IPC.register_language()
+    - IPC.request_memory_usage()
     - IPC.kill_IPC()
+
+    Giving a daemon_address attaches to a running SalveDaemon instead of starting a server of its own and
+    giving a cache_path lets the server keep data derived from files in an sqlite database between runs.
+    A memory_budget (in bytes) makes the server evict derived data and then spill the text of the least
+    recently used files to disk to stay under it (a daemon uses its own budget instead). With highlight_workers
+    the client starts that many processes which the server uses to highlight big ranges in parallel.
+    drop_stale_responses makes the client drop responses computed from an older version of the file than
+    the one last given to update_file(). work_budgets switches huge files to cheaper strategies (see WorkBudgets).
+    A codec (see MessageCodec) encodes the messages to and from the server instead of the queues pickling them
+    (daemons always use pickle). queue_limits bounds the unanswered and waiting requests of each command given
+    (see QueueLimit) and dropped_requests counts the requests each command dropped because of them.
+    backend="thread" runs the server in a thread of this process instead of a process of its own so messages
+    (and the text of files) are handed over without being copied and highlight_workers are threads too. The
+    server then uses this process's type checking and the codec is ignored.
     """
 
-    def __init__(self, id_max: int = 15000) -> None:
-        super().__init__(
-            id_max=id_max,
-            commands={
-                AUTOCOMPLETE: find_autocompletions_request_wrapper,
-                REPLACEMENTS: get_replacements_request_wrapper,
-                HIGHLIGHT: get_highlights_request_wrapper,
-                EDITORCONFIG: editorconfig_request_wrapper,
-                DEFINITION: get_definition_request_wrapper,
-                LINKS_AND_CHARS: get_special_tokens_request_wrapper,
-            },
+    def __init__(
+        self,
+        id_max: int = 15000,
+        type_checking: bool = RUNTIME_TYPE_CHECKING,
+        daemon_address: str | None = None,
+        cache_path: Path | str | None = None,
+        memory_budget: int | None = None,
+        highlight_workers: int = 0,
+        drop_stale_responses: bool = False,
+        work_budgets: WorkBudgets | None = None,
+        codec: MessageCodec | None = None,
+        queue_limits: dict[str, QueueLimit] | None = None,
+        backend: str = PROCESS_BACKEND,
+    ) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend {backend} is not one of {BACKENDS}")
+        if backend == THREAD_BACKEND and daemon_address is not None:
+            raise ValueError("A daemon can't be used with the thread backend")
+        self.backend: str = backend
+        self.type_checking: bool = type_checking
+        self.daemon_address: str | None = daemon_address
+        self.cache_path: str | None = (
+            None if cache_path is None else str(cache_path)
+        )
+        self.memory_budget: int | None = memory_budget
+        self.highlight_workers: int = highlight_workers
+        self.highlight_pool: HighlightPool | None = None
+        self.directories: list[dict] = []
+        # Files the server read from disk itself so the client never had their contents
+        self.directory_files: set[str] = set()
+        # Files the server keeps in sync with the disk itself until the editor's buffer diverges
+        self.tracked_files: dict[str, dict] = {}
+        self.languages: dict[str, dict] = {}
+        # Bumped by every update_file() and echoed by responses computed from that version
+        self.file_versions: dict[str, int] = {}
+        self.drop_stale_responses: bool = drop_stale_responses
+        self.work_budgets: WorkBudgets | None = work_budgets
+        self.codec: MessageCodec | None = codec
+        self.queue_limits: dict[str, QueueLimit] = (
+            {} if queue_limits is None else queue_limits
         )
+        # Id -> command of the requests of limited commands the server hasn't answered yet
+        self.in_flight: dict[int, str] = {}
+        # Requests of limited commands waiting for one in flight to be answered, oldest first
+        self.pending_requests: dict[str, deque[dict]] = {
+            command: deque() for command in self.queue_limits
+        }
+        self.dropped_requests: Counter[str] = Counter()
+        # File of the newest request of each command, used to tell whether its response is stale
+        self.request_files: dict[str, str] = {}
+        super().__init__(id_max=id_max, commands=COMMAND_WRAPPERS.copy())
+
+    def create_server(self) -> None:
+        """Creates the main_server (in a fresh interpreter if its type checking differs from this one, or in a thread
+        with the thread backend) or connects to the daemon - internal API"""
+        if (
+            self.highlight_workers
+            and self.highlight_pool is None
+            and self.backend == THREAD_BACKEND
+        ):
+            self.highlight_pool = ThreadHighlightPool(self.highlight_workers)
+        if (
+            self.highlight_workers
+            and self.highlight_pool is None
+            and self.daemon_address is None
+        ):
+            # The server is daemonic and can't start processes itself
+            self.highlight_pool = HighlightPool(
+                self.highlight_workers,
+                get_context(
+                    None
+                    if self.type_checking == RUNTIME_TYPE_CHECKING
+                    else "spawn"
+                ),
+            )
+
+        # A new server never answers the requests the old one had
+        self.in_flight.clear()
+        self.server_type = partial(  # type: ignore
+            SalveServer,
+            cache_path=self.cache_path,
+            memory_budget=self.memory_budget,
+            highlight_pool=self.highlight_pool,
+        )
+
+        if self.backend == THREAD_BACKEND:
+            self.response_queue = ThreadQueue()
+            self.requests_queue = ThreadQueue()
+            self.main_server = ServerThread(  # type: ignore
+                self.server_type,
+                self.commands,
+                self.response_queue,
+                self.requests_queue,
+                getLogger("Server"),
+            )
+            self.main_server.start()
+            self.logger.info("Server thread started")
+            self.copy_files_to_server()
+            return
+
+        if self.daemon_address is not None:
+            self.logger.info(f"Connecting to daemon at {self.daemon_address}")
+            daemon: DaemonConnection = connect_to_daemon(self.daemon_address)
+            self.requests_queue = daemon
+            self.response_queue = daemon
+            self.main_server = daemon  # type: ignore
+            self.copy_files_to_server()
+            return
+
+        if self.codec is not None:
+            # A new server gets new pipes so nothing the old one left unread reaches it
+            self.requests_queue = CodecPipe(self.codec)
+            self.response_queue = CodecPipe(self.codec)
+        if self.type_checking == RUNTIME_TYPE_CHECKING:
+            SimpleClient.create_server(self)
+            self.copy_files_to_server()
+            return
+
+        # A forked server would inherit the modules this process already imported with(out) the claw hooks
+        freeze_support()
+        context = get_context("spawn")
+        if self.codec is None:
+            self.response_queue = context.Queue()
+            self.requests_queue = context.Queue()
+        self.main_server = context.Process(
+            target=self.server_type,
+            args=(
+                self.commands,
+                self.response_queue,
+                self.requests_queue,
+                getLogger("Server"),
+            ),
+            daemon=True,
+        )
+
+        old_setting: str | None = environ.get(TYPE_CHECKING_ENV_VAR)
+        environ[TYPE_CHECKING_ENV_VAR] = str(int(self.type_checking))
+        try:
+            self.main_server.start()
+        finally:
+            if old_setting is None:
+                environ.pop(TYPE_CHECKING_ENV_VAR)
+            else:
+                environ[TYPE_CHECKING_ENV_VAR] = old_setting
+        self.logger.info(
+            f"Server created with type checking set to {self.type_checking}"
+        )
+        self.copy_files_to_server()
+
+    def copy_files_to_server(self) -> None:
+        """Resends every file and directory to a new server - internal API"""
+        self.logger.info("Copying files to server")
+        if self.work_budgets is not None:
+            SimpleClient.request(
+                self, {"command": WORK_BUDGETS, "budgets": self.work_budgets}
+            )
+        for directory_request in self.directories:
+            SimpleClient.request(self, directory_request)
+        for track_request in self.tracked_files.values():
+            SimpleClient.request(self, track_request)
+        for language_request in self.languages.values():
+            SimpleClient.request(self, language_request)
+        files_copy = self.files.copy()
+        self.files = {}
+        for file, data in files_copy.items():
+            self.update_file(file, data)
+        self.logger.debug("Finished copying files to server")
+
+    def parse_response(self, res: Response) -> None:
+        """Keeps track of notifications and the files added by add_directory() before the usual parsing - internal API"""
+        if self.is_stale(res):
+            self.logger.info(f"Dropping stale response {res['id']}")
+            if res["type"] == "response":
+                # The request is over so the client can ask again
+                if res["id"] in self.in_flight:
+                    self.send_pending_requests(self.in_flight.pop(res["id"]))
+                self.all_ids.remove(res["id"])
+                if res["id"] == self.current_ids[res["command"]]:  # type: ignore
+                    self.current_ids[res["command"]] = 0  # type: ignore
+            return
+
+        if res["type"] == "response" and res["id"] in self.in_flight:
+            self.send_pending_requests(self.in_flight.pop(res["id"]))
+
+        if res.get("command") in STREAMED_COMMANDS:
+            self.combine_streamed_results(res)
+
+        if res["type"] == "notification":
+            # The request is still running so its id stays in use
+            command: str = res["command"]  # type: ignore
+            if res["id"] == self.current_ids[command]:
+                self.newest_responses[command] = res
+            return
+
+        if res.get("command") == ADD_DIRECTORY and not res["cancelled"]:
+            self.directory_files.update(res["result"]["files"])  # type: ignore
+
+        super().parse_response(res)
+
+    def is_stale(self, res: Response) -> bool:
+        """Whether res was computed from an older version of its file than the client has (only when drop_stale_responses is set) - internal API"""
+        if not self.drop_stale_responses or "version" not in res:
+            return False
+
+        file: str | None = self.request_files.get(res["command"])  # type: ignore
+        return (
+            file in self.file_versions
+            and res["version"] < self.file_versions[file]  # type: ignore
+        )
+
+    def combine_streamed_results(self, res: Response) -> None:
+        """Prepends the results of streamed notifications that haven't been picked up yet to res - internal API"""
+        command: str = res["command"]  # type: ignore
+        pending: Response | None = self.newest_responses[command]
+        if (
+            res["cancelled"]
+            or res["id"] != self.current_ids[command]
+            or pending is None
+            or pending["id"] != res["id"]
+        ):
+            return
+
+        res["result"] = pending["result"] + res["result"]  # type: ignore
 
     # Pyright likes to complain and say this won't work but it actually does
     # TODO: Use plum or custom multiple dispatch (make it a new project for salve organization)
@@ -55,6 +307,12 @@ class IPC(FileClient):
         text_range: tuple[int, int] = (1, -1),
         file_path: Path | str = Path(__file__),
         definition_starters: list[tuple[str, str]] = [("", "before")],
+        file_paths: list[Path | str] | None = None,
+        progressive: bool = False,
+        deadline_ms: int | None = None,
+        fuzzy: bool = False,
+        cursor: tuple[int, int] | None = None,
+        scope: str = "file",
     ) -> None:
         """Sends the main_server a request of type command with given kwargs - external API"""
         self.logger.debug("Beginning request")
@@ -66,13 +324,17 @@ class IPC(FileClient):
                 f"Command {command} not in builtin commands. Those are {COMMANDS}!"
             )
 
-        if file not in self.files and command != EDITORCONFIG:
+        if (
+            file not in self.files
+            and file not in self.directory_files
+            and file not in self.tracked_files
+            and command != EDITORCONFIG
+        ):
             self.logger.exception(f"File {file} does not exist in system!")
             raise Exception(f"File {file} does not exist in system!")
 
         self.logger.debug("Sending info to create_message()")
-        request: dict = {
-            "command": command,
+        arguments: dict = {
             "expected_keywords": expected_keywords,
             "current_word": current_word,
             "language": language,
@@ -80,6 +342,227 @@ class IPC(FileClient):
             "file_path": file_path,
             "definition_starters": definition_starters,
         }
+        if language in self.languages:
+            # The server already has the registered profile unless the defaults were overridden
+            if expected_keywords == [""]:
+                arguments.pop("expected_keywords")
+            if definition_starters == [("", "before")]:
+                arguments.pop("definition_starters")
         if file:
-            request.update({"file": file})
-        super().request(request)
+            arguments.update({"file": file})
+            self.request_files[command] = file
+        # Smaller requests are faster to send and the default file_path is a Path, which is slow to pickle
+        request: dict = {"command": command} | {
+            field: arguments[field]
+            for field in REQUEST_FIELDS[command]
+            if field in arguments
+        }
+        if file_paths:
+            # Batch EDITORCONFIG request, the result is keyed by each path as a str
+            request.update({"file_paths": file_paths})
+        if progressive:
+            # HIGHLIGHT text_range is the viewport, the rest of the file is streamed afterwards
+            request.update({"progressive": True})
+        if fuzzy:
+            # AUTOCOMPLETE matches current_word as a subsequence (gcf finds get_config)
+            request.update({"fuzzy": True})
+        if cursor is not None:
+            # AUTOCOMPLETE ranks words used near the cursor's (line, column) first
+            request.update({"cursor": cursor})
+        if scope != "file":
+            # REFERENCES and AUTOCOMPLETE look through every file the client has given the server
+            request.update({"scope": scope})
+        if deadline_ms is not None:
+            # Wall clock time so it means the same thing to a server in another process
+            request.update({"deadline": time() + deadline_ms / 1000})
+        self.send_limited_request(request)
+
+    def send_limited_request(self, request: dict) -> None:
+        """Sends the request unless its command already has the most requests in flight its QueueLimit allows,
+        in which case it waits in the client (or the call blocks) according to the limit's policy - internal API"""
+        command: str = request["command"]
+        limit: QueueLimit | None = self.queue_limits.get(command)
+        if limit is None:
+            # FileClient.request() doesn't know about files added by add_directory()
+            SimpleClient.request(self, request)
+            return
+
+        # Answers that already arrived free up their slots
+        self.check_responses()
+        pending: deque[dict] = self.pending_requests[command]
+        if limit.policy == BLOCK:
+            give_up: float | None = (
+                None
+                if limit.block_timeout is None
+                else monotonic() + limit.block_timeout
+            )
+            while pending or self.requests_in_flight(command) >= (
+                limit.max_in_flight
+            ):
+                if give_up is not None and monotonic() >= give_up:
+                    self.logger.info(f"Timed out waiting to send {command}")
+                    self.dropped_requests[command] += 1
+                    return
+                sleep(0.001)
+                self.check_responses()
+
+        if not pending and self.requests_in_flight(command) < (
+            limit.max_in_flight
+        ):
+            self.send_tracked_request(request)
+            return
+
+        if len(pending) >= limit.max_pending:
+            self.dropped_requests[command] += 1
+            if limit.policy != DROP_OLDEST or not pending:
+                self.logger.info(f"Dropping new {command} request")
+                return
+            self.logger.info(f"Dropping oldest waiting {command} request")
+            pending.popleft()
+        pending.append(request)
+
+    def requests_in_flight(self, command: str) -> int:
+        return sum(
+            in_flight == command for in_flight in self.in_flight.values()
+        )
+
+    def send_tracked_request(self, request: dict) -> None:
+        SimpleClient.request(self, request)
+        self.in_flight[self.current_ids[request["command"]]] = request[
+            "command"
+        ]
+
+    def send_pending_requests(self, command: str) -> None:
+        """Sends the requests that were waiting for a slot of command to free up - internal API"""
+        pending: deque[dict] | None = self.pending_requests.get(command)
+        while pending and self.requests_in_flight(command) < (
+            self.queue_limits[command].max_in_flight
+        ):
+            self.send_tracked_request(pending.popleft())
+
+    def cancel_request(self, command: str) -> None:
+        """Cancels the newest request of command whether it is still waiting, already running (it stops at its next
+        checkpoint) or streaming. Any response to it is discarded - external API"""
+        self.logger.info(f"Cancelling request of command {command}")
+        self.current_ids[command] = 0
+        self.newest_responses[command] = None
+        if command in self.pending_requests:
+            self.pending_requests[command].clear()
+        SimpleClient.request(
+            self, {"command": CANCEL, "cancelled_command": command}
+        )
+
+    def update_file(self, file: str, current_state: str) -> None:
+        """Updates files in the system (a tracked file stops being read from disk). Every update gets the next version
+        of the file, which responses computed from it carry as "version" - external API"""
+        self.logger.info(f"Updating file: {file}")
+        self.tracked_files.pop(file, None)
+        self.files[file] = current_state
+        self.file_versions[file] = self.file_versions.get(file, 0) + 1
+        SimpleClient.request(
+            self,
+            {
+                "command": "FileNotification",
+                "file": file,
+                "remove": False,
+                "contents": current_state,
+                "version": self.file_versions[file],
+            },
+        )
+
+    def track_file(
+        self, file: str, path: Path | str, poll_interval: float = 1.0
+    ) -> None:
+        """Has the server read the file from path itself and check its mtime and size every poll_interval seconds
+        to pick up changes made on disk. Use IPC.update_file() once the editor's buffer diverges from disk - external API"""
+        self.logger.info(f"Tracking file {file} at {path}")
+        self.files.pop(file, None)
+        track_request: dict = {
+            "command": "FileNotification",
+            "file": file,
+            "remove": False,
+            "path": str(Path(path).resolve()),
+            "poll_interval": poll_interval,
+        }
+        self.tracked_files[file] = track_request
+        SimpleClient.request(self, track_request)
+
+    def add_directory(
+        self,
+        path: Path | str,
+        globs: list[str] | None = None,
+        exclude: list[str] | None = None,
+        max_file_size: int = 1_000_000,
+    ) -> None:
+        """Has the server read and index every file in the directory whose relative path matches one of the globs (fnmatch patterns)
+        and none of the exclude patterns, skipping binary files and those bigger than max_file_size bytes. IPC.get_response(ADD_DIRECTORY)
+        gives notifications with {"done": int, "total": int} progress and finally a response with {"files": [...], "skipped": [...]}
+        where the added files are named by their absolute path - external API"""
+        self.logger.info(f"Adding directory {path}")
+        directory_request: dict = {
+            "command": ADD_DIRECTORY,
+            "directory": str(Path(path).resolve()),
+            "globs": ["*"] if globs is None else globs,
+            "exclude": [] if exclude is None else exclude,
+            "max_file_size": max_file_size,
+        }
+        self.directories.append(directory_request)
+        SimpleClient.request(self, directory_request)
+
+    def register_language(
+        self,
+        name: str,
+        keywords: list[str] | None = None,
+        definition_starters: list[tuple[str, str]] | None = None,
+    ) -> None:
+        """Stores the language's keywords and definition starters in the server once so that requests with
+        language=name can leave out expected_keywords and definition_starters. Registering a name again replaces it - external API
+        """
+        self.logger.info(f"Registering language {name}")
+        language_request: dict = {
+            "command": REGISTER_LANGUAGE,
+            "name": name,
+            "keywords": [] if keywords is None else keywords,
+            "definition_starters": []
+            if definition_starters is None
+            else definition_starters,
+        }
+        self.languages[name] = language_request
+        SimpleClient.request(self, language_request)
+
+    def request_memory_usage(self) -> None:
+        """Asks the server how much memory each file's text and derived data use. IPC.get_response(MEMORY_USAGE) then gives
+        {"budget": int | None, "total": int, "shared_index": int, "files": {file: {"text": int, "derived": int, "index": int, "spilled": bool}}}
+        in bytes (the index being the word index of REFERENCES and workspace AUTOCOMPLETE) along with
+        "line_caches", the hits, misses, size and hit rate of the per line highlight, link and hidden char caches, and "dropped_file_updates",
+        how many file updates were replaced by a newer one before the server got to them - external API"""
+        SimpleClient.request(self, {"command": MEMORY_USAGE})
+
+    def remove_file(self, file: str) -> None:
+        """Removes a file from the main_server - external API"""
+        if file in self.files:
+            super().remove_file(file)
+            self.files.pop(file)
+            self.directory_files.discard(file)
+            return
+
+        if file in self.tracked_files:
+            self.tracked_files.pop(file)
+        elif file not in self.directory_files:
+            self.logger.exception(
+                f"Cannot remove file {file} as file is not in file database!"
+            )
+            raise CollegamentoError(
+                f"Cannot remove file {file} as file is not in file database!"
+            )
+
+        self.directory_files.discard(file)
+        SimpleClient.request(
+            self, {"command": "FileNotification", "file": file, "remove": True}
+        )
+
+    def kill_IPC(self) -> None:
+        """Kills the main_server (and highlight workers) when salve's services are no longer required - external API"""
+        super().kill_IPC()
+        if self.highlight_pool is not None:
+            self.highlight_pool.close()
@@ -0,0 +1,43 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from functools import lru_cache
+from re import Pattern
+
+from beartype.typing import Callable
+
+from .server_functions.definitions import definition_regexes
+
+DEFINITION_REGEXES_CACHE_SIZE: int = (
+    128  # Words whose definition regexes a profile keeps compiled
+)
+
+
+@dataclass
+class LanguageProfile:
+    """Keywords and definition starters registered once with IPC.register_language() so that requests
+    only send the language's name. The keywords are kept sorted for prefix lookups - internal API"""
+
+    name: str
+    keywords: list[str]
+    definition_starters: list[tuple[str, str]]
+    # Part of the key for cached definitions so a reregistered profile doesn't reuse stale ones
+    starters_key: str = ""
+    definition_regexes: Callable[[str], list[tuple[Pattern, str]]] = field(
+        init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        self.keywords = sorted(set(self.keywords))
+        self.starters_key = repr(self.definition_starters)
+        self.definition_regexes = lru_cache(DEFINITION_REGEXES_CACHE_SIZE)(
+            lambda word: definition_regexes(self.definition_starters, word)
+        )
+
+    def keywords_starting_with(self, prefix: str) -> list[str]:
+        """Every keyword with the prefix without looking at the others"""
+        matches: list[str] = []
+        for keyword in self.keywords[bisect_left(self.keywords, prefix) :]:
+            if not keyword.startswith(prefix):
+                break
+            matches.append(keyword)
+        return matches
@@ -1,3 +1,5 @@
+from os import environ
+
 COMMANDS: list[str] = [
     "autocomplete",
     "replacements",
@@ -5,6 +7,7 @@ COMMANDS: list[str] = [
     "editorconfig",
     "definition",
     "links_and_chars",
+    "references",
 ]
 
 COMMAND = str
@@ -14,3 +17,26 @@ HIGHLIGHT: COMMAND = COMMANDS[2]
 EDITORCONFIG: COMMAND = COMMANDS[3]
 DEFINITION: COMMAND = COMMANDS[4]
 LINKS_AND_CHARS: COMMAND = COMMANDS[5]
+REFERENCES: COMMAND = COMMANDS[6]
+
+# The IPC.request() arguments each command uses, the rest are left out of its requests
+REQUEST_FIELDS: dict[COMMAND, list[str]] = {
+    AUTOCOMPLETE: ["file", "expected_keywords", "current_word", "language"],
+    REPLACEMENTS: ["file", "expected_keywords", "current_word", "language"],
+    HIGHLIGHT: ["file", "language", "text_range"],
+    EDITORCONFIG: ["file_path"],
+    DEFINITION: ["file", "current_word", "language", "definition_starters"],
+    LINKS_AND_CHARS: ["file", "text_range"],
+    REFERENCES: ["file", "current_word"],
+}
+
+# Used by IPC methods rather than IPC.request()
+ADD_DIRECTORY: COMMAND = "add_directory"
+MEMORY_USAGE: COMMAND = "memory_usage"
+CANCEL: COMMAND = "cancel"
+REGISTER_LANGUAGE: COMMAND = "register_language"
+WORK_BUDGETS: COMMAND = "work_budgets"
+
+# Setting this to "0" imports salve without beartype's runtime type checking
+TYPE_CHECKING_ENV_VAR: str = "SALVE_TYPE_CHECKING"
+RUNTIME_TYPE_CHECKING: bool = environ.get(TYPE_CHECKING_ENV_VAR, "1") != "0"
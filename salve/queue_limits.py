@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+
+# What happens to a request of a command that already has max_pending requests waiting
+DROP_OLDEST: str = "drop_oldest"  # The oldest waiting request is dropped
+REJECT_NEWEST: str = "reject_newest"  # The new request is dropped
+BLOCK: str = "block"  # IPC.request() waits for the server to answer one
+OVERFLOW_POLICIES: list[str] = [DROP_OLDEST, REJECT_NEWEST, BLOCK]
+
+
+@dataclass(frozen=True)
+class QueueLimit:
+    """Bounds the requests of a command the client has sent but the server hasn't answered (max_in_flight) and
+    the ones waiting in the client for those to finish (max_pending). A stalled server then only gets the newest
+    requests once it is free instead of working through a backlog of stale ones. With the BLOCK policy
+    IPC.request() waits up to block_timeout seconds (None means forever) before dropping the request - external API
+    """
+
+    max_in_flight: int = 1
+    max_pending: int = 1
+    policy: str = DROP_OLDEST
+    block_timeout: float | None = None
+
+    def __post_init__(self) -> None:
+        if self.policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Policy {self.policy} is not one of {OVERFLOW_POLICIES}"
+            )
+        if self.max_in_flight < 1:
+            raise ValueError("QueueLimit max_in_flight must be at least 1")
@@ -0,0 +1,436 @@
+from collections import deque
+from logging import Logger
+from multiprocessing.queues import Queue as GenericQueueClass
+from pathlib import Path
+from threading import Event
+from time import perf_counter, time
+from typing import Any
+
+from collegamento import (
+    USER_FUNCTION,
+    FileServer,
+    Request,
+    Response,
+    SimpleServer,
+)
+from token_tools import Token, only_tokens_in_text_range
+
+from .autocomplete_session import AutocompleteSession
+from .directory_scan import PROGRESS_INTERVAL, SCAN_STEP_SECONDS, DirectoryScan
+from .highlight_pool import HighlightPool
+from .highlight_stream import HighlightStream
+from .language_profile import LanguageProfile
+from .misc import (
+    ADD_DIRECTORY,
+    CANCEL,
+    HIGHLIGHT,
+    REGISTER_LANGUAGE,
+    WORK_BUDGETS,
+)
+from .work_budgets import WorkBudgets
+from .workspace import Workspace
+
+# These are run in the order they arrive instead of only keeping the newest like other commands
+IN_ORDER_COMMANDS: list[str] = [
+    "FileNotification",
+    ADD_DIRECTORY,
+    CANCEL,
+    REGISTER_LANGUAGE,
+    WORK_BUDGETS,
+]
+STOP_CHECK_INTERVAL: float = (
+    0.002  # Seconds between looks at the requests queue from checkpoints
+)
+
+
+class RequestCancelled(Exception):
+    """Raised at a checkpoint of a request that was cancelled or superseded while it was running - internal API"""
+
+
+class ServerStopped(Exception):
+    """Raised by a server running in a thread once its client kills it - internal API"""
+
+
+class BufferedQueue(GenericQueueClass):
+    """Lets checkpoints look at requests that arrived while another request is running without taking them
+    away from run_tasks() - internal API"""
+
+    # NOTE: collegamento type checks for multiprocessing queues so we subclass one without ever initializing it
+    def __init__(self, queue: GenericQueueClass) -> None:
+        self.queue: GenericQueueClass = queue
+        self.buffer: deque[Request] = deque()
+
+    def put(self, obj: Any) -> None:  # type: ignore
+        self.queue.put(obj)
+
+    def get(self) -> Any:  # type: ignore
+        if self.buffer:
+            return self.buffer.popleft()
+        return self.queue.get()
+
+    def empty(self) -> bool:
+        return not self.buffer and self.queue.empty()
+
+    def peek_all(self) -> deque[Request]:
+        """Every message waiting to be parsed, oldest first"""
+        while not self.queue.empty():
+            self.buffer.append(self.queue.get())
+        return self.buffer
+
+
+class ResponseQueue(GenericQueueClass):
+    """Adds the extra fields (such as "partial" or "version") the server recorded for a request to its notifications
+    and final response - internal API"""
+
+    def __init__(
+        self, queue: GenericQueueClass, extra_fields: dict[int, dict[str, Any]]
+    ) -> None:
+        self.queue: GenericQueueClass = queue
+        self.extra_fields: dict[int, dict[str, Any]] = extra_fields
+
+    def put(self, obj: Any) -> None:  # type: ignore
+        if obj["type"] == "response":
+            obj.update(self.extra_fields.pop(obj["id"], {}))
+        elif obj["type"] == "notification":
+            obj.update(self.extra_fields.get(obj["id"], {}))
+        self.queue.put(obj)
+
+
+def update_files(server: "SalveServer", request: Request) -> None:
+    file: str = request["file"]  # type: ignore
+
+    if request["remove"]:  # type: ignore
+        server.logger.info(f"File {file} was requested for removal")
+        server.workspace.remove_file(file, server.client_id)
+        server.file_versions.pop(file, None)
+        server.logger.info(f"File {file} has been removed")
+    elif "path" in request:
+        path: str = request["path"]  # type: ignore
+        server.workspace.track_file(
+            file,
+            Path(path),
+            request["poll_interval"],  # type: ignore
+            server.client_id,
+        )
+        server.file_versions.pop(file, None)
+        server.logger.info(f"File {file} is now read from {path}")
+    else:
+        contents: str = request["contents"]  # type: ignore
+        server.workspace.update_file(file, contents, server.client_id)
+        if "version" in request:
+            server.file_versions[file] = request["version"]  # type: ignore
+        server.logger.info(f"File {file} has been updated with new contents")
+
+
+class SalveServer(FileServer):
+    """FileServer variant that keeps its files in a (possibly shared) Workspace - internal API"""
+
+    def __init__(
+        self,
+        commands: dict[str, USER_FUNCTION],
+        response_queue: GenericQueueClass,
+        requests_queue: GenericQueueClass,
+        logger: Logger,
+        workspace: Workspace | None = None,
+        client_id: int = 0,
+        cache_path: str | None = None,
+        memory_budget: int | None = None,
+        highlight_pool: HighlightPool | None = None,
+        stop_event: Event | None = None,
+    ) -> None:
+        # Only set for servers running in a thread, which can't be killed like a process
+        self.stop_event: Event | None = stop_event
+        self.workspace: Workspace = (
+            workspace
+            if workspace is not None
+            else Workspace(cache_path, memory_budget)
+        )
+        self.client_id: int = client_id
+        self.highlight_pool: HighlightPool | None = highlight_pool
+        self.files: dict[str, str] = self.workspace.files
+        self.language_profiles: dict[str, LanguageProfile] = {}
+        self.autocomplete_session: AutocompleteSession | None = None
+        # Set by clients that want cheaper strategies for huge files
+        self.work_budgets: WorkBudgets | None = None
+        self.highlight_stream: HighlightStream | None = None
+        # Kept so that a stream restarted for a moved viewport can reuse its chunks
+        self.cancelled_highlight_stream: HighlightStream | None = None
+        # ADD_DIRECTORY requests being worked through, oldest first
+        self.directory_scans: deque[DirectoryScan] = deque()
+        self.stopped_ids: set[int] = set()
+        self.last_stop_check: float = 0.0
+        # Request id -> fields added to its response
+        self.response_fields: dict[int, dict[str, Any]] = {}
+        # Version of each file the client last sent, echoed in responses computed from it
+        self.file_versions: dict[str, int] = {}
+        # Updates replaced by a newer update of the same file before they were applied
+        self.dropped_file_updates: int = 0
+        commands["FileNotification"] = update_files
+
+        # FileServer.__init__ would replace our files dict so we skip it
+        SimpleServer.__init__(
+            self,
+            commands,
+            ResponseQueue(response_queue, self.response_fields),
+            BufferedQueue(requests_queue),
+            logger,
+            ["FileNotification"],
+        )
+
+    def run_tasks(self) -> None:
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise ServerStopped
+        self.workspace.poll_tracked_files()
+        self.coalesce_file_updates()
+        super().run_tasks()
+
+        # Background work only happens while there are no new requests
+        if self.highlight_stream is not None and self.requests_queue.empty():
+            self.continue_highlight_stream()
+        if self.directory_scans and self.requests_queue.empty():
+            self.continue_directory_scan()
+
+    def coalesce_file_updates(self) -> None:
+        """Each update carries the file's whole text so after a stall only the newest update of a file waiting in
+        the queue is applied (requests are run after every waiting message is parsed so none of them see the others).
+        Dropped updates get a cancelled response like superseded requests"""
+        waiting: deque[Request] = self.requests_queue.peek_all()  # type: ignore
+        newest_updates: dict[str, int] = {}
+        for index, message in enumerate(waiting):
+            if message["command"] == "FileNotification":
+                newest_updates[message["file"]] = index  # type: ignore
+        if len(newest_updates) == len(waiting):
+            return
+
+        kept: list[Request] = []
+        for index, message in enumerate(waiting):
+            if (
+                message["command"] == "FileNotification"
+                and "contents" in message
+                and newest_updates[message["file"]] != index  # type: ignore
+                # The first contents of a file decide whether its derived data is persisted
+                and message["file"] in self.files
+            ):
+                self.dropped_file_updates += 1
+                self.simple_id_response(message["id"])
+                continue
+            kept.append(message)
+        waiting.clear()
+        waiting.extend(kept)
+
+    def parse_line(self, message: Request) -> None:
+        if message["type"] == "request" and (
+            message["command"] in IN_ORDER_COMMANDS
+        ):
+            self.newest_ids[message["command"]] = message["id"]
+            self.handle_request(message)
+            return
+
+        super().parse_line(message)
+
+    def handle_request(self, request: Request) -> None:
+        if "file" in request and request["command"] != "FileNotification":
+            # FileServer replaces the name with the contents but wrappers may want derived data from the Workspace
+            request["file_name"] = request["file"]  # type: ignore
+            self.workspace.touch(request["file"])  # type: ignore
+            if request["file"] in self.file_versions:
+                self.response_fields[request["id"]] = {
+                    "version": self.file_versions[request["file"]]  # type: ignore
+                }
+
+        if "deadline" in request:
+            if time() >= request["deadline"]:  # type: ignore
+                self.logger.info(
+                    f"Request {request['id']} expired before it started"
+                )
+                self.newest_ids[request["command"]] = 0
+                self.simple_id_response(request["id"])
+                return
+            self.response_fields.setdefault(request["id"], {})["partial"] = (
+                False
+            )
+
+        if request["command"] == ADD_DIRECTORY:
+            # Only starts a scan that run_tasks() works through, responding once it is done
+            self.commands[ADD_DIRECTORY](self, request)
+            return
+
+        if request["command"] == HIGHLIGHT:
+            # Newer HIGHLIGHT requests supersede a stream just like any other request
+            self.cancel_highlight_stream()
+            if request.get("progressive"):
+                self.start_highlight_stream(request)
+                return
+
+        try:
+            super().handle_request(request)
+        except RequestCancelled:
+            self.logger.info(
+                f"Request {request['id']} stopped at a checkpoint"
+            )
+            self.newest_ids[request["command"]] = 0
+            self.simple_id_response(request["id"])
+        finally:
+            self.stopped_ids.discard(request["id"])
+        # Requests may read spilled files back into memory
+        self.workspace.enforce_memory_budget()
+
+    def checkpoint(self, request: Request) -> bool:
+        """Used as should_stop by long running server functions. Raises RequestCancelled once a newer request of the
+        same command or a CANCEL for it arrives so the server is free for the next keystroke within milliseconds and
+        returns True once the request's deadline passes so the function sends back what it has so far"""
+        now: float = perf_counter()
+        if now - self.last_stop_check >= STOP_CHECK_INTERVAL:
+            self.last_stop_check = now
+            for message in self.requests_queue.peek_all():  # type: ignore
+                if message["type"] != "request":
+                    continue
+                if message["command"] == request["command"] or (
+                    message["command"] == CANCEL
+                    and message["cancelled_command"] == request["command"]  # type: ignore
+                ):
+                    self.stopped_ids.add(request["id"])
+
+        if request["id"] in self.stopped_ids:
+            raise RequestCancelled
+
+        if "deadline" in request and time() >= request["deadline"]:  # type: ignore
+            self.response_fields[request["id"]]["partial"] = True
+            return True
+        return False
+
+    def is_partial(self, request: Request) -> bool:
+        """Whether the request ran out of time and its result is incomplete"""
+        return self.response_fields.get(request["id"], {}).get(
+            "partial", False
+        )
+
+    def is_degraded(self, request: Request) -> bool:
+        """Whether the request ran out of time or used a cheaper strategy than usual"""
+        return (
+            self.is_partial(request)
+            or self.response_fields.get(request["id"], {}).get("mode", "full")
+            != "full"
+        )
+
+    def report_mode(self, request: Request, mode: str) -> None:
+        """Tells clients with work budgets which strategy the request used"""
+        if self.work_budgets is not None:
+            self.response_fields.setdefault(request["id"], {})["mode"] = mode
+
+    def cancel(self, command: str) -> None:
+        """Cancels the waiting request or stream of command (running ones are stopped by checkpoint())"""
+        self.newest_requests[command] = None
+        if (
+            self.highlight_stream is not None
+            and self.highlight_stream.request["command"] == command
+        ):
+            self.cancel_highlight_stream()
+        if command == ADD_DIRECTORY:
+            for scan in self.directory_scans:
+                scan.cancel()
+                self.simple_id_response(scan.request["id"])
+            self.directory_scans.clear()
+
+    def notify(self, request: Request, result: Any) -> None:
+        """Sends an intermediate result (such as progress) for a request that is still running"""
+        notification: Response = {
+            "id": request["id"],
+            "type": "notification",
+            "cancelled": False,
+            "command": request["command"],
+            "result": result,
+        }
+        self.response_queue.put(notification)
+
+    def start_highlight_stream(self, request: Request) -> None:
+        """Sends the viewport's highlights right away and leaves the rest of the file for run_tasks()"""
+        file: str = request["file"]  # type: ignore
+        language: str = request["language"]  # type: ignore
+        stream = HighlightStream(
+            request,
+            file,
+            self.files[file],
+            language,
+            request["text_range"],  # type: ignore
+        )
+
+        file_highlights: list[Token] | None = self.workspace.find_derived(
+            file, f"highlight:{language}"
+        )
+        if file_highlights is not None:
+            self.notify(
+                request,
+                only_tokens_in_text_range(file_highlights, stream.viewport),
+            )
+            self.send_stream_response(
+                request, stream.outside_viewport(file_highlights)
+            )
+            return
+
+        if self.cancelled_highlight_stream is not None:
+            stream.adopt_chunks(self.cancelled_highlight_stream)
+            self.cancelled_highlight_stream = None
+        self.notify(request, stream.viewport_tokens() + stream.reused_tokens())
+        self.highlight_stream = stream
+        if stream.finished():
+            self.finish_highlight_stream([])
+
+    def continue_highlight_stream(self) -> None:
+        """Highlights and sends the next chunk of the current stream"""
+        stream: HighlightStream = self.highlight_stream  # type: ignore
+        if self.files.get(stream.file) != stream.full_text:
+            # The client will ask again for the new contents
+            self.cancel_highlight_stream()
+            return
+
+        tokens: list[Token] = stream.next_chunk()
+        if stream.finished():
+            self.finish_highlight_stream(tokens)
+        else:
+            self.notify(stream.request, tokens)
+
+    def finish_highlight_stream(self, last_tokens: list[Token]) -> None:
+        stream: HighlightStream = self.highlight_stream  # type: ignore
+        self.highlight_stream = None
+        self.workspace.set_derived(
+            stream.file,
+            f"highlight:{stream.language}",
+            stream.file_highlights(),
+        )
+        self.send_stream_response(stream.request, last_tokens)
+
+    def continue_directory_scan(self) -> None:
+        """Reads files of the oldest scan for up to SCAN_STEP_SECONDS so a big directory never holds up other requests"""
+        scan: DirectoryScan = self.directory_scans[0]
+        scan.step(
+            self.workspace, self.client_id, perf_counter() + SCAN_STEP_SECONDS
+        )
+        self.workspace.enforce_memory_budget()
+
+        if scan.finished():
+            self.directory_scans.popleft()
+            self.send_stream_response(scan.request, scan.result())
+        elif perf_counter() - scan.last_progress > PROGRESS_INTERVAL:
+            self.notify(scan.request, scan.progress())
+            scan.last_progress = perf_counter()
+
+    def cancel_highlight_stream(self) -> None:
+        if self.highlight_stream is None:
+            return
+
+        self.logger.info("Cancelling highlight stream")
+        self.simple_id_response(self.highlight_stream.request["id"])
+        self.cancelled_highlight_stream = self.highlight_stream
+        self.highlight_stream = None
+
+    def send_stream_response(self, request: Request, result: Any) -> None:
+        """Ends a stream of notifications with the final response"""
+        response: Response = {
+            "id": request["id"],
+            "type": "response",
+            "cancelled": False,
+            "command": request["command"],
+            "result": result,
+        }
+        self.response_queue.put(response)
@@ -1,6 +1,13 @@
 from .autocompletions import find_autocompletions  # noqa: F401
 from .definitions import get_definition  # noqa: F401
+from .directories import (  # noqa: F401
+    find_files,
+    map_text_file,
+    read_text_file,
+)
+from .editorconfig import get_config, get_configs  # noqa: F401
 from .highlight import get_highlights  # noqa: F401
 from .links_and_hidden_chars import get_special_tokens  # noqa: F401
 from .misc import is_unicode_letter  # noqa: F401
+from .references import get_references, index_references  # noqa: F401
 from .replacements import get_replacements  # noqa: F401
@@ -1,36 +1,332 @@
-from .misc import find_words
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from heapq import heappush, heapreplace
 
+from beartype.typing import Callable, Iterable
+
+from .misc import (
+    common_suffix_length,
+    find_words,
+    first_difference,
+    never_stop,
+)
+
+WORDS_PER_CHECK: int = 1024  # Words looked at between should_stop() calls
+FUZZY_LIMIT: int = 50  # Only the best fuzzy matches are returned
+BOUNDARY_BONUS: int = 8  # Matching the start of the word or of a part of it
+CONSECUTIVE_BONUS: int = 4  # Matching right after the previous match
+BLOCK_LINES: int = 16  # Lines per block of the positional word index
+NEARBY_BLOCKS: int = 8  # Words used within this many blocks of the cursor are ranked by distance
+
+# Word -> the block of every occurrence in ascending order (4 bytes each)
+WordPositions = dict[str, array]
+
+
+def find_relevant_words(
+    word_counts: Counter[str],
+    current_word: str,
+    should_stop: Callable[[], bool] = never_stop,
+    max_candidates: int | None = None,
+) -> Counter[str]:
+    """The counts of the words in the text that current_word could be completed to"""
+    relevant_words: Counter[str] = Counter()
+    for checked, (word, count) in enumerate(word_counts.items()):
+        if checked == max_candidates or (
+            checked % WORDS_PER_CHECK == 0 and should_stop()
+        ):
+            break
+        if word != current_word and word.startswith(current_word):
+            relevant_words[word] = count
+    return relevant_words
+
+
+def block_words(lines: list[str], block: int) -> set[str]:
+    """The words of a block of the lines (where lines[0] is the first line of block 0)"""
+    start: int = block * BLOCK_LINES
+    return set(find_words("\n".join(lines[start : start + BLOCK_LINES])))
+
+
+def block_start(full_text: str, position: int, block: int) -> int:
+    """The index of the first character of the block, which the character at position is in or after"""
+    line: int = full_text.count("\n", 0, position)
+    start: int = full_text.rfind("\n", 0, position) + 1
+    for _ in range(line - block * BLOCK_LINES):
+        start = full_text.rfind("\n", 0, start - 1) + 1
+    return start
 
-def find_autocompletions(
-    full_text: str, expected_keywords: list[str], current_word: str
-) -> list[str]:
-    """Returns a list of autocompletions based on the word, text, and language keywords"""
 
-    words_in_text: list[str] = find_words(full_text)
+def block_end(full_text: str, position: int, block: int) -> int:
+    """The index right after the last line of the block, which the character at position is in or before"""
+    line: int = full_text.count("\n", 0, position)
+    end: int = position
+    for _ in range((block + 1) * BLOCK_LINES - line):
+        end = full_text.find("\n", end)
+        if end == -1:
+            return len(full_text)
+        end += 1
+    return end - 1
 
-    words_after_original_removal = [
-        word for word in words_in_text if word != current_word
-    ]
 
-    relevant_words = [
-        word
-        for word in words_after_original_removal
-        if word.startswith(current_word)
-    ]
+def word_positions(
+    full_text: str,
+    positions: WordPositions | None = None,
+    first_block: int = 0,
+    start: int = 0,
+) -> WordPositions:
+    """Indexes which blocks of BLOCK_LINES lines each word is used in (lines are split on "\n" like the cursor's).
+    Given positions that only go up to first_block, the blocks from there on (starting at index start of the text)
+    are added to them"""
+    lines: list[str] = full_text[start:].split("\n")
+    if positions is None:
+        positions = {}
+    for block in range((len(lines) - 1) // BLOCK_LINES + 1):
+        # Once per block so a word used on every line doesn't grow its postings
+        for word in block_words(lines, block):
+            postings: array | None = positions.get(word)
+            if postings is None:
+                postings = positions[word] = array("I")
+            postings.append(first_block + block)
+    return positions
 
+
+def update_word_positions(
+    old_text: str, positions: WordPositions, full_text: str
+) -> WordPositions:
+    """Turns the positions of old_text into those of full_text (changing them in place), only reindexing the blocks
+    with changed lines. When the number of lines changed every block after the first changed one moved so those are
+    reindexed too"""
+    start: int = first_difference(old_text, full_text)
+    first_block: int = old_text.count("\n", 0, start) // BLOCK_LINES
+    # The texts are the same up to here
+    region_start: int = block_start(old_text, start, first_block)
+    # and from here on
+    suffix: int = common_suffix_length(
+        old_text, full_text, min(len(old_text), len(full_text)) - start
+    )
+    end: int = max(len(full_text) - suffix, start)
+    old_end: int = max(len(old_text) - suffix, start)
+    if full_text.count("\n", start, end) != old_text.count(
+        "\n", start, old_end
+    ):
+        for word in list(positions):
+            postings: array = positions[word]
+            del postings[bisect_left(postings, first_block) :]
+            if not postings:
+                del positions[word]
+        return word_positions(full_text, positions, first_block, region_start)
+
+    # Lines after the last change didn't move so only the blocks up to it are compared
+    last_block: int = full_text.count("\n", 0, end) // BLOCK_LINES
+    old_lines: list[str] = old_text[
+        region_start : block_end(old_text, old_end, last_block)
+    ].split("\n")
+    lines: list[str] = full_text[
+        region_start : block_end(full_text, end, last_block)
+    ].split("\n")
+    for offset in range(last_block - first_block + 1):
+        block: int = first_block + offset
+        old_words: set[str] = block_words(old_lines, offset)
+        words: set[str] = block_words(lines, offset)
+        if old_words == words:
+            continue
+        for word in old_words - words:
+            postings = positions[word]
+            del postings[bisect_left(postings, block)]
+            if not postings:
+                del positions[word]
+        for word in words - old_words:
+            insort(positions.setdefault(word, array("I")), block)
+    return positions
+
+
+def nearest_blocks(
+    positions: WordPositions, words: Iterable[str], cursor_line: int
+) -> dict[str, int]:
+    """How many blocks away from the cursor's line the closest use of each word is"""
+    cursor_block: int = (cursor_line - 1) // BLOCK_LINES
+    distances: dict[str, int] = {}
+    for word in words:
+        postings: array | None = positions.get(word)
+        if not postings:
+            continue
+        index: int = bisect_left(postings, cursor_block)
+        distances[word] = min(
+            abs(postings[neighbor] - cursor_block)
+            for neighbor in (index - 1, index)
+            if 0 <= neighbor < len(postings)
+        )
+    return distances
+
+
+def rank_autocompletions(
+    relevant_words: Counter[str],
+    expected_keywords: list[str],
+    current_word: str,
+    distances: dict[str, int] | None = None,
+) -> list[str]:
+    """Ranks the relevant words by how often they are used, falling back to the language keywords if there are none. With the distances
+    of the words from the cursor (see nearest_blocks()) words used near it come first, closest first"""
     no_usable_words_in_text: bool = not relevant_words
     if no_usable_words_in_text:
-        relevant_words.extend(
-            expected_keywords * 3
+        relevant_words = Counter(
+            word
+            for word in expected_keywords * 3
+            if word.startswith(current_word)
         )  # We add a multiplier of three to boost the score of keywords
 
-    relevant_words = [
-        word for word in relevant_words if word.startswith(current_word)
-    ]
-
+    if distances is None:
+        distances = {}
     autocomplete_matches = sorted(
-        set(relevant_words),
-        key=(lambda s: (-relevant_words.count(s), len(s), s)),
+        relevant_words,
+        key=(
+            lambda s: (
+                min(distances.get(s, NEARBY_BLOCKS + 1), NEARBY_BLOCKS + 1),
+                -relevant_words[s],
+                len(s),
+                s,
+            )
+        ),
     )
 
     return autocomplete_matches
+
+
+def find_autocompletions(
+    full_text: str,
+    expected_keywords: list[str],
+    current_word: str,
+    word_counts: Counter[str] | None = None,
+    should_stop: Callable[[], bool] = never_stop,
+    max_candidates: int | None = None,
+) -> list[str]:
+    """Returns a list of autocompletions based on the word, text, and language keywords (word_counts can be given if the words in the text
+    were already counted and no more than max_candidates distinct words are looked at if it's given)"""
+
+    if word_counts is None:
+        word_counts = Counter(find_words(full_text))
+
+    return rank_autocompletions(
+        find_relevant_words(
+            word_counts, current_word, should_stop, max_candidates
+        ),
+        expected_keywords,
+        current_word,
+    )
+
+
+def char_mask(word: str) -> int:
+    """A bit for every (lowercased) character of the word so words missing any of a query's characters are rejected with one AND"""
+    mask: int = 0
+    for char in word.lower():
+        mask |= 1 << (ord(char) & 63)
+    return mask
+
+
+# Words shortest (and then alphabetically first) first and their char_mask()'s
+FuzzyIndex = tuple[list[str], list[int]]
+
+
+def fuzzy_index(words: Iterable[str]) -> FuzzyIndex:
+    """Sorts the words so that matching can stop once no longer word could make the top results"""
+    sorted_words: list[str] = sorted(words, key=lambda word: (len(word), word))
+    return (sorted_words, [char_mask(word) for word in sorted_words])
+
+
+def fuzzy_score(word: str, query: str) -> int | None:
+    """Scores query as a subsequence of word or returns None if it isn't one. Matching the start of the word or of a part of it
+    (after "_" or at a capital letter) and consecutive matches score higher while every skipped character costs a point.
+    Lowercase queries match regardless of case like fzf's smart case"""
+    compared_word: str = word if query != query.lower() else word.lower()
+    if len(compared_word) != len(word):
+        # Some characters (like "İ") lowercase to more than one so only the ones that don't are lowered to keep positions aligned
+        compared_word = "".join(
+            lowered if len(lowered := char.lower()) == 1 else char
+            for char in word
+        )
+    score: int = 0
+    previous: int = -2
+    index: int = 0
+    for char in query:
+        index = compared_word.find(char, index)
+        if index == -1:
+            return None
+
+        if (
+            index == 0
+            or word[index - 1] == "_"
+            or (word[index].isupper() and not word[index - 1].isupper())
+        ):
+            score += BOUNDARY_BONUS
+        if index == previous + 1:
+            score += CONSECUTIVE_BONUS
+        previous = index
+        index += 1
+    return score - (len(word) - len(query))
+
+
+def find_fuzzy_autocompletions(
+    word_counts: Counter[str],
+    index: FuzzyIndex,
+    expected_keywords: list[str],
+    current_word: str,
+    should_stop: Callable[[], bool] = never_stop,
+    max_candidates: int | None = None,
+    limit: int = FUZZY_LIMIT,
+) -> list[str]:
+    """Returns the best limit words current_word is a subsequence of (like fzf where gcf finds get_config) ranked by score, then by how
+    often they are used, then by length and then alphabetically. index is the fuzzy_index() of the words and keywords are only used if no word
+    matches"""
+    words, masks = index
+    query_mask: int = char_mask(current_word)
+    best_bonus: int = len(current_word) * (BOUNDARY_BONUS + CONSECUTIVE_BONUS)
+    # The best matches so far as (score, count, -position) where the position breaks ties by length and then alphabetically
+    best: list[tuple[int, int, int]] = []
+    word_total: int = (
+        len(words)
+        if max_candidates is None
+        else min(len(words), max_candidates)
+    )
+    for block_start in range(0, word_total, WORDS_PER_CHECK):
+        if should_stop():
+            break
+
+        # Most words are rejected by their mask without leaving C
+        block: range = range(
+            block_start, min(block_start + WORDS_PER_CHECK, word_total)
+        )
+        for position in [
+            position
+            for position in block
+            if masks[position] & query_mask == query_mask
+        ]:
+            word: str = words[position]
+            if (
+                len(best) == limit
+                and best_bonus - (len(word) - len(current_word)) < best[0][0]
+            ):
+                # Every word left is at least as long so none of them can score higher
+                return [
+                    words[-match[2]] for match in sorted(best, reverse=True)
+                ]
+
+            score: int | None = fuzzy_score(word, current_word)
+            if score is None or word == current_word:
+                continue
+            match: tuple[int, int, int] = (score, word_counts[word], -position)
+            if len(best) < limit:
+                heappush(best, match)
+            elif match > best[0]:
+                heapreplace(best, match)
+
+    if not best and expected_keywords:
+        keyword_counts: Counter[str] = Counter(expected_keywords * 3)
+        return find_fuzzy_autocompletions(
+            keyword_counts,
+            fuzzy_index(keyword_counts),
+            [],
+            current_word,
+            limit=limit,
+        )
+
+    return [words[-match[2]] for match in sorted(best, reverse=True)]
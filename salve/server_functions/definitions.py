@@ -5,16 +5,11 @@ from token_tools import Token
 from .misc import find_words
 
 
-def get_definition(
-    full_text: str,
-    definition_starters: list[tuple[str, str]],
-    word_to_find: str,
-) -> Token:
-    """Finds all definitions of a given word in text using language definition starters"""
-    default_pos = ((0, 0), 0, "Definition")
-    split_text: list[str] = full_text.splitlines()
-
-    regex_possibilities: list[tuple[Pattern, str]] = [
+def definition_regexes(
+    definition_starters: list[tuple[str, str]], word_to_find: str
+) -> list[tuple[Pattern, str]]:
+    """Compiles the regexes get_definition() searches for word_to_find with"""
+    return [
         (
             (compile(definition[0] + word_to_find), definition[0])
             if definition[1] == "after"
@@ -27,6 +22,22 @@ def get_definition(
         for definition in definition_starters
     ]
 
+
+def get_definition(
+    full_text: str,
+    definition_starters: list[tuple[str, str]],
+    word_to_find: str,
+    regex_possibilities: list[tuple[Pattern, str]] | None = None,
+) -> Token:
+    """Finds all definitions of a given word in text using language definition starters (regex_possibilities can be given if they were already compiled)"""
+    default_pos = ((0, 0), 0, "Definition")
+    split_text: list[str] = full_text.splitlines()
+
+    if regex_possibilities is None:
+        regex_possibilities = definition_regexes(
+            definition_starters, word_to_find
+        )
+
     matches: list[tuple[Match, str, tuple[int, int]]] = []
     for regex, definition in regex_possibilities:
         start_pos: tuple[int, int] = (1, 0)
@@ -0,0 +1,65 @@
+from fnmatch import fnmatch
+from mmap import ACCESS_READ, mmap
+from os import fstat, walk
+from pathlib import Path, PurePosixPath
+
+
+def is_excluded(relative_path: PurePosixPath, exclude: list[str]) -> bool:
+    return any(
+        fnmatch(str(relative_path), pattern)
+        or fnmatch(relative_path.name, pattern)
+        for pattern in exclude
+    )
+
+
+def find_files(
+    directory: Path, globs: list[str], exclude: list[str]
+) -> list[Path]:
+    """Returns every file under directory whose path (relative to directory) matches a glob and isn't excluded.
+    Excluded directories are never walked and the globs are fnmatch patterns so "*.py" matches at any depth"""
+    found_files: list[Path] = []
+    for root, dirs, files in walk(directory):
+        relative_root = PurePosixPath(Path(root).relative_to(directory))
+        dirs[:] = [
+            name
+            for name in sorted(dirs)
+            if not is_excluded(relative_root / name, exclude)
+        ]
+        for name in sorted(files):
+            relative_path: PurePosixPath = relative_root / name
+            if is_excluded(relative_path, exclude):
+                continue
+            if any(fnmatch(str(relative_path), glob) for glob in globs):
+                found_files.append(Path(root) / name)
+
+    return found_files
+
+
+def read_text_file(path: Path, max_file_size: int) -> str | None:
+    """Returns the file's text or None if it is oversized, binary or unreadable"""
+    try:
+        if path.stat().st_size > max_file_size:
+            return None
+        raw_contents: bytes = path.read_bytes()
+    except OSError:
+        return None
+
+    if b"\0" in raw_contents[:8192]:
+        # Text files basically never contain null bytes
+        return None
+
+    try:
+        return raw_contents.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def map_text_file(path: Path) -> str:
+    """Reads the file through a memory map so the kernel's page cache is used directly instead of an extra buffered copy.
+    Undecodable bytes are replaced rather than rejected since the editor has the file open as text"""
+    with path.open("rb") as file:
+        if not fstat(file.fileno()).st_size:
+            # Empty files can't be memory mapped
+            return ""
+        with mmap(file.fileno(), 0, access=ACCESS_READ) as mapped_file:
+            return str(mapped_file, "utf-8", "replace")
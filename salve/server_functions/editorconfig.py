@@ -0,0 +1,209 @@
+from configparser import ConfigParser
+from configparser import Error as ConfigParserError
+from dataclasses import dataclass, field
+from os import stat_result
+from pathlib import Path
+from re import Pattern, compile, error, escape
+from re import match as re_match
+from stat import S_ISREG
+
+MAX_CACHED_EDITORCONFIGS: int = 4096
+
+# Follows pyeditorconfig (https://editorconfig.org/) but parses each .editorconfig file once and compiles its
+# globs once instead of doing both for every path looked up
+
+# Stuff before the first section (root = true) goes in this one
+NO_SECTION: str = "stuff in this section is at the beginning of the file"
+# configparser has a special [DEFAULT] section that can't be disabled, only renamed
+DEFAULT_SECTION: str = (
+    "this section is not used for anything but can't be disabled"
+)
+
+
+@dataclass
+class EditorconfigSection:
+    """A section of an .editorconfig file with its glob compiled to a regex (None if the glob is invalid) and
+    the ranges its {num1..num2} parts have to match - internal API"""
+
+    directory: Path
+    pattern: Pattern[str] | None
+    config: dict[str, str]
+    ranges: list[range] = field(default_factory=list)
+
+    def matches(self, path: Path) -> bool:
+        if self.pattern is None:
+            return False
+        try:
+            relative: str = "/" + path.relative_to(self.directory).as_posix()
+        except ValueError:
+            return False
+        match = self.pattern.fullmatch(relative)
+        if match is None:
+            return False
+        return all(
+            int(integer) in integer_range
+            for integer, integer_range in zip(match.groups(), self.ranges)
+        )
+
+
+# Directory -> (mtime, size) of its .editorconfig file when parsed, its sections and whether it is a root
+cached_editorconfigs: dict[
+    Path, tuple[tuple[int, int], list[EditorconfigSection], bool]
+] = {}
+
+
+def compile_glob(glob: str) -> tuple[Pattern[str], list[range]]:
+    """Turns an .editorconfig section name into a regex and the ranges of its {num1..num2} groups"""
+    ranges: list[range] = []
+    regex: str = ""
+    while glob:
+        if glob.startswith((r"\*", r"\?", r"\[", r"\]", r"\{", r"\}")):
+            regex += escape(glob[1])
+            glob = glob[2:]
+        elif glob.startswith("**"):
+            regex += r".*"
+            glob = glob[2:]
+        elif glob.startswith("*"):
+            regex += r"[^/]*"
+            glob = glob[1:]
+        elif glob.startswith("?"):
+            regex += r"."
+            glob = glob[1:]
+        elif glob.startswith("["):
+            end: int = glob.index("]")
+            if glob.startswith("[!"):
+                regex += r"[^" + escape(glob[2:end]) + r"]"
+            else:
+                regex += r"[" + escape(glob[1:end]) + r"]"
+            glob = glob[end + 1 :]
+        elif glob.startswith("{"):
+            match = re_match(r"\{(-?[0-9]+)\.\.(-?[0-9]+)\}", glob)
+            if match is None:
+                end = glob.index("}")
+                strings: list[str] = glob[1:end].split(",")
+                regex += r"(?:" + r"|".join(map(escape, strings)) + r")"
+                glob = glob[end + 1 :]
+            else:
+                ranges.append(
+                    range(int(match.group(1)), int(match.group(2)) + 1)
+                )
+                regex += r"(-?[0-9]+)"
+                glob = glob[match.end() :]
+        else:
+            regex += escape(glob[0])
+            glob = glob[1:]
+    return compile(regex), ranges
+
+
+def parse_editorconfig(
+    directory: Path, text: str
+) -> tuple[list[EditorconfigSection], bool]:
+    """Returns the sections of an .editorconfig file (later ones take precedence) and whether it is a root"""
+    parser = ConfigParser(
+        interpolation=None,
+        default_section=DEFAULT_SECTION,
+        comment_prefixes=(";", "#"),
+        inline_comment_prefixes=(";", "#"),
+        empty_lines_in_values=False,
+        strict=False,
+    )
+    # Section names are globs that may contain [ and ]
+    parser.SECTCRE = compile(r"\[(?P<header>.*)\]")
+    try:
+        parser.read_string(f"[{NO_SECTION}]\n{text}")
+    except ConfigParserError:
+        pass  # Use whatever was parsed before the error
+
+    sections: list[EditorconfigSection] = []
+    for name, section in parser.items():
+        if name in {NO_SECTION, DEFAULT_SECTION}:
+            continue
+        # Same as editorconfig-core-c: globs without a / match in any directory
+        if name.startswith("/"):
+            glob: str = name
+        elif "/" in name:
+            glob = "/" + name
+        else:
+            glob = "**/" + name
+        try:
+            pattern, ranges = compile_glob(glob)
+        except (ValueError, error):
+            sections.append(EditorconfigSection(directory, None, {}))
+            continue
+        sections.append(
+            EditorconfigSection(
+                directory,
+                pattern,
+                # Properties and values are case insensitive (configparser lowercases the keys)
+                {key: value.lower() for key, value in section.items()},
+                ranges,
+            )
+        )
+
+    is_root: bool = parser[NO_SECTION].get("root", "false").lower() == "true"
+    return sections, is_root
+
+
+def get_editorconfig(
+    directory: Path,
+) -> tuple[list[EditorconfigSection], bool]:
+    """Returns the sections of the .editorconfig file in the directory and whether it is a root, only parsing it
+    again once it was changed (no sections when there is no such file)"""
+    editorconfig: Path = directory / ".editorconfig"
+    try:
+        file_stat: stat_result = editorconfig.stat()
+    except OSError:
+        cached_editorconfigs.pop(directory, None)
+        return [], False
+    if not S_ISREG(file_stat.st_mode):
+        cached_editorconfigs.pop(directory, None)
+        return [], False
+
+    version: tuple[int, int] = (file_stat.st_mtime_ns, file_stat.st_size)
+    cached = cached_editorconfigs.get(directory)
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+
+    try:
+        text: str = editorconfig.read_text(encoding="utf-8")
+    except OSError:
+        return [], False
+    sections, is_root = parse_editorconfig(directory, text)
+    if (
+        len(cached_editorconfigs) >= MAX_CACHED_EDITORCONFIGS
+        and directory not in cached_editorconfigs
+    ):
+        # Oldest first
+        del cached_editorconfigs[next(iter(cached_editorconfigs))]
+    cached_editorconfigs[directory] = (version, sections, is_root)
+    return sections, is_root
+
+
+def get_config(file_path: Path | str) -> dict[str, str]:
+    """Same as pyeditorconfig.get_config() but only parses an .editorconfig file again once it was changed"""
+    path = Path(file_path)
+    # Closer files come later so they take precedence
+    all_sections: list[EditorconfigSection] = []
+    for parent in path.parents:
+        sections, is_root = get_editorconfig(parent)
+        all_sections[0:0] = sections
+        if is_root:
+            break
+
+    config: dict[str, str] = {}
+    for section in all_sections:
+        if not section.matches(path):
+            continue
+        for name, value in section.config.items():
+            if value == "unset":
+                config.pop(name, None)
+            else:
+                config[name] = value
+    return config
+
+
+def get_configs(
+    file_paths: list[Path | str],
+) -> dict[str, dict[str, str]]:
+    """Returns the editorconfig data for every path given, keyed by the path as a str"""
+    return {str(file_path): get_config(file_path) for file_path in file_paths}
@@ -7,6 +7,7 @@ from pygments.token import Comment as CommentToken
 from pygments.token import String as StringToken  # noqa: F811
 from token_tools import Token
 
+from ..misc import never_stop
 from .misc import get_new_token_type
 
 useful_tokens = {
@@ -78,7 +79,11 @@ def get_pygments_comment_regexes(lexer: RegexLexer) -> _TokenTupleReturnType:
     return list(set(regexes))  # type: ignore
 
 
-def proper_docstring_tokens(lexer: RegexLexer, full_text: str) -> list[Token]:
+def proper_docstring_tokens(
+    lexer: RegexLexer,
+    full_text: str,
+    should_stop: Callable[[], bool] = never_stop,
+) -> list[Token]:
     proper_highlight_regexes: _TokenTupleReturnType = (
         get_pygments_comment_regexes(lexer)
     )
@@ -100,6 +105,9 @@ def proper_docstring_tokens(lexer: RegexLexer, full_text: str) -> list[Token]:
         simple_token_type: str = get_new_token_type(str(token_type))
 
         while match:
+            if should_stop():
+                return new_docstring_tokens
+
             span: tuple[int, int] = match.span()
             matched_str: str = current_text[span[0] : span[1]]
 
@@ -1,17 +1,24 @@
-from functools import cache
+from collections import OrderedDict
+from functools import cache, lru_cache
+from threading import Lock
 
+from beartype.typing import Callable
 from pygments import lex
 from pygments.lexer import Lexer, RegexLexer
 from pygments.lexers import get_lexer_by_name
-from token_tools import (
-    Token,
-    normal_text_range,
-    only_tokens_in_text_range,
-    overwrite_and_merge_tokens,
-)
+from token_tools import Token, normal_text_range
 
-from .docstring_highlight import _LexReturnTokens, proper_docstring_tokens
+from ..misc import never_stop
+from .docstring_highlight import proper_docstring_tokens
 from .misc import get_new_token_type
+from .overlay import overlay_tokens
+
+DOCSTRING_CACHE_SIZE: int = 8
+LINE_CACHE_SIZE: int = 20_000  # Lines whose tokens are kept for each language
+docstring_tokens_cache: OrderedDict[tuple[Lexer, str], list[Token]] = (
+    OrderedDict()
+)
+docstring_tokens_cache_lock = Lock()
 
 
 @cache
@@ -19,48 +26,165 @@ def lexer_by_name_cached(language: str) -> Lexer:
     return get_lexer_by_name(language)
 
 
-def get_highlights(
+def docstring_tokens_cached(
+    lexer: RegexLexer,
+    full_text: str,
+    should_stop: Callable[[], bool] = never_stop,
+) -> list[Token]:
+    """Highlighting a file in chunks scans the whole text for docstrings each time so complete results are kept"""
+    key: tuple[Lexer, str] = (lexer, full_text)
+    with docstring_tokens_cache_lock:
+        if key in docstring_tokens_cache:
+            docstring_tokens_cache.move_to_end(key)
+            return docstring_tokens_cache[key]
+
+    stopped: bool = False
+
+    def remember_stop() -> bool:
+        nonlocal stopped
+        stopped = stopped or should_stop()
+        return stopped
+
+    docstring_tokens: list[Token] = proper_docstring_tokens(
+        lexer, full_text, remember_stop
+    )
+    if stopped:
+        # Partial results must not be reused
+        return docstring_tokens
+
+    with docstring_tokens_cache_lock:
+        docstring_tokens_cache[key] = docstring_tokens
+        if len(docstring_tokens_cache) > DOCSTRING_CACHE_SIZE:
+            docstring_tokens_cache.popitem(last=False)
+    return docstring_tokens
+
+
+@lru_cache(LINE_CACHE_SIZE)
+def line_tokens(language: str, line: str) -> tuple[tuple[int, int, str], ...]:
+    """The (column, length, type) of every useful token in a line, already merged. Almost every line is the
+    same between requests so they are remembered by their text"""
+    lexer: Lexer = lexer_by_name_cached(language)
+    tokens: list[tuple[int, int, str]] = []
+    column: int = 0
+    for token in lex(line, lexer):
+        new_type: str = get_new_token_type(str(token[0]))
+        token_str: str = token[1]
+        token_len: int = len(token_str)
+
+        if token_str == "\n":
+            # Lexer adds the newline back as its own token
+            continue
+
+        if not token_str.strip() or new_type == "Text":
+            # If the token is empty or is plain Text we simply skip it because that's ultimately useless info
+            column += token_len
+            continue
+
+        if (
+            tokens
+            and tokens[-1][2] == new_type
+            and tokens[-1][0] + tokens[-1][1] == column
+        ):
+            # Neighbouring tokens of the same type are merged like merge_tokens() would
+            tokens[-1] = (tokens[-1][0], tokens[-1][1] + token_len, new_type)
+        else:
+            tokens.append((column, token_len, new_type))
+        column += token_len
+    return tuple(tokens)
+
+
+# Arguments of highlight_lines() for one chunk of text
+HighlightChunk = tuple[list[str], tuple[int, int], str, list[Token] | None]
+
+
+def highlight_chunks(
     full_text: str,
     language: str = "text",
     text_range: tuple[int, int] = (1, -1),
-) -> list[Token]:
-    """Gets pygments tokens from text provided in language proved and converts them to Token's"""
-
-    # Create some variables used all throughout the function
+    chunk_count: int = 1,
+    should_stop: Callable[[], bool] = never_stop,
+) -> list[HighlightChunk]:
+    """Splits highlighting the text range into chunks that can be highlighted independently (and in parallel).
+    Lines are lexed one by one so any line boundary is safe and docstrings, the only multiline tokens, are
+    found in the full text up front and handed to the chunk they fall in"""
     lexer: Lexer = lexer_by_name_cached(language)
-    new_tokens: list[Token] = []
-
     split_text, text_range = normal_text_range(full_text, text_range)
+    docstring_tokens: list[Token] | None = None
+    if isinstance(lexer, RegexLexer):
+        # Docstrings outside of the range can't change the tokens inside it and merging is slow
+        docstring_tokens = [
+            token
+            for token in docstring_tokens_cached(lexer, full_text, should_stop)
+            if text_range[0] <= token[0][0] <= text_range[1]
+        ]
+
+    chunk_lines: int = max(1, -(-len(split_text) // chunk_count))
+    chunks: list[HighlightChunk] = []
+    for offset in range(0, max(1, len(split_text)), chunk_lines):
+        chunk_range: tuple[int, int] = (
+            text_range[0] + offset,
+            min(text_range[0] + offset + chunk_lines - 1, text_range[1]),
+        )
+        chunks.append(
+            (
+                split_text[offset : offset + chunk_lines],
+                chunk_range,
+                language,
+                None
+                if docstring_tokens is None
+                else [
+                    token
+                    for token in docstring_tokens
+                    if chunk_range[0] <= token[0][0] <= chunk_range[1]
+                ],
+            )
+        )
+    return chunks
 
-    start_index: tuple[int, int] = (text_range[0], 0)
-
-    for line in split_text:
-        og_tokens: _LexReturnTokens = list(lex(line, lexer))
-        for token in og_tokens:
-            new_type: str = get_new_token_type(str(token[0]))
-            token_str: str = token[1]
-            token_len: int = len(token_str)
 
-            if token_str == "\n":
-                # Lexer adds the newline back as its own token
-                continue
+def highlight_lines(
+    split_text: list[str],
+    text_range: tuple[int, int],
+    language: str,
+    docstring_tokens: list[Token] | None,
+    should_stop: Callable[[], bool] = never_stop,
+) -> list[Token]:
+    """Highlights the lines of a text range given the docstring Token's in it (None if the lexer has no docstrings).
+    If should_stop() returns True only the lines highlighted so far are returned"""
+    new_tokens: list[Token] = []
 
-            if not token_str.strip() or new_type == "Text":
-                # If the token is empty or is plain Text we simply skip it because that's ultimately useless info
-                start_index = (start_index[0], start_index[1] + token_len)
-                continue
+    for line_number, line in enumerate(split_text, text_range[0]):
+        if should_stop():
+            text_range = (text_range[0], line_number - 1)
+            if docstring_tokens is not None:
+                docstring_tokens = [
+                    token
+                    for token in docstring_tokens
+                    if token[0][0] <= text_range[1]
+                ]
+            break
+
+        new_tokens.extend(
+            ((line_number, column), token_len, token_type)
+            for column, token_len, token_type in line_tokens(language, line)
+        )
 
-            # Create and append the Token that will be returned
-            new_token = (start_index, token_len, new_type)
-            new_tokens.append(new_token)
+    if not docstring_tokens:
+        # The lines' tokens are already merged and in the range
+        return new_tokens
 
-            start_index = (start_index[0], start_index[1] + token_len)
-        start_index = (start_index[0] + 1, 0)
+    # Both are in document order so the docstrings are laid over the lines in one pass
+    return overlay_tokens(new_tokens, docstring_tokens, text_range)
 
-    if isinstance(lexer, RegexLexer):
-        new_tokens = overwrite_and_merge_tokens(
-            new_tokens, proper_docstring_tokens(lexer, full_text)
-        )
 
-    new_tokens = only_tokens_in_text_range(new_tokens, text_range)
-    return new_tokens
+def get_highlights(
+    full_text: str,
+    language: str = "text",
+    text_range: tuple[int, int] = (1, -1),
+    should_stop: Callable[[], bool] = never_stop,
+) -> list[Token]:
+    """Gets pygments tokens from text provided in language proved and converts them to Token's"""
+    return highlight_lines(
+        *highlight_chunks(full_text, language, text_range, 1, should_stop)[0],
+        should_stop,
+    )
@@ -0,0 +1,144 @@
+from itertools import pairwise
+
+from token_tools import Token, merge_tokens, overwrite_tokens
+
+
+def add_merged(tokens: list[Token], token: Token) -> None:
+    """Appends the next Token in sorted order, merging it into the previous one like merge_tokens() would"""
+    if not tokens:
+        tokens.append(token)
+        return
+
+    previous: Token = tokens[-1]
+    if (
+        previous[2] == token[2]
+        and previous[0][0] == token[0][0]
+        and previous[0][1] + previous[1] == token[0][1]
+    ):
+        tokens[-1] = (previous[0], previous[1] + token[1], token[2])
+        return
+    tokens.append(token)
+
+
+def overlay_line(
+    old_tokens: list[Token], new_tokens: list[Token]
+) -> list[Token] | None:
+    """Overwrites the old Token's of one line with the new ones in a single pass over both. Returns None when
+    an old Token is split by more than one new Token or a new Token is empty, where overwrite_tokens() keeps
+    overlapping pieces that only it reproduces"""
+    pieces: list[Token] = []
+    first_new: int = 0
+    for old_token in old_tokens:
+        (line, old_start), old_length, old_type = old_token
+        old_end: int = old_start + old_length
+        # New tokens are sorted and don't overlap so their ends only grow
+        while (
+            first_new < len(new_tokens)
+            and new_tokens[first_new][0][1] + new_tokens[first_new][1]
+            <= old_start
+        ):
+            first_new += 1
+
+        overlapping: list[Token] = []
+        index: int = first_new
+        while index < len(new_tokens) and new_tokens[index][0][1] < old_end:
+            overlapping.append(new_tokens[index])
+            index += 1
+
+        if not overlapping:
+            pieces.append(old_token)
+            continue
+        if overlapping == [old_token]:
+            # The new token replaces it exactly
+            continue
+        if len(overlapping) > 1:
+            return None
+
+        new_start: int = overlapping[0][0][1]
+        new_end: int = new_start + overlapping[0][1]
+        if old_start < new_start:
+            pieces.append(((line, old_start), new_start - old_start, old_type))
+        if old_end > new_end:
+            pieces.append(((line, new_end), old_end - new_end, old_type))
+
+    # Both lists are sorted so a merge of the two gives what sorted(set()) would
+    output: list[Token] = []
+    piece_index: int = 0
+    for new_token in new_tokens:
+        while piece_index < len(pieces) and pieces[piece_index] <= new_token:
+            add_merged(output, pieces[piece_index])
+            piece_index += 1
+        add_merged(output, new_token)
+    for piece in pieces[piece_index:]:
+        add_merged(output, piece)
+    return output
+
+
+def overlay_tokens(
+    old_tokens: list[Token],
+    new_tokens: list[Token],
+    text_range: tuple[int, int],
+) -> list[Token]:
+    """Same output as only_tokens_in_text_range(overwrite_and_merge_tokens(old_tokens, new_tokens), text_range) when
+    the old Token's are sorted, merged and don't overlap (like the lexed lines of highlight_lines()). Lines without
+    new Token's are passed through as they are so the cost is linear in the number of Token's"""
+    if not new_tokens:
+        return [
+            token
+            for token in merge_tokens(sorted(set(old_tokens)))
+            if text_range[0] <= token[0][0] <= text_range[1]
+        ]
+
+    # Docstring tokens are few so normalizing them the way overwrite_and_merge_tokens() does is cheap
+    new_tokens = sorted(set(merge_tokens(new_tokens)))
+    new_lines: dict[int, list[Token]] = {}
+    for new_token in new_tokens:
+        if text_range[0] <= new_token[0][0] <= text_range[1]:
+            new_lines.setdefault(new_token[0][0], []).append(new_token)
+
+    # Lines with only new tokens are put in between the old lines as they are passed
+    new_line_numbers: list[int] = sorted(new_lines)
+    new_line_index: int = 0
+    output: list[Token] = []
+    old_index: int = 0
+    while old_index < len(old_tokens):
+        line: int = old_tokens[old_index][0][0]
+        line_end: int = old_index + 1
+        while (
+            line_end < len(old_tokens) and old_tokens[line_end][0][0] == line
+        ):
+            line_end += 1
+        line_tokens: list[Token] = old_tokens[old_index:line_end]
+        old_index = line_end
+
+        if not text_range[0] <= line <= text_range[1]:
+            continue
+        while (
+            new_line_index < len(new_line_numbers)
+            and new_line_numbers[new_line_index] < line
+        ):
+            output.extend(
+                merge_tokens(new_lines[new_line_numbers[new_line_index]])
+            )
+            new_line_index += 1
+        line_new_tokens: list[Token] | None = new_lines.get(line)
+        if line_new_tokens is None:
+            output.extend(line_tokens)
+            continue
+        new_line_index += 1
+
+        overlaid: list[Token] | None = None
+        if all(new_token[1] for new_token in line_new_tokens) and all(
+            first[0][1] + first[1] <= second[0][1]
+            for first, second in pairwise(line_new_tokens)
+        ):
+            overlaid = overlay_line(line_tokens, line_new_tokens)
+        if overlaid is None:
+            overlaid = merge_tokens(
+                overwrite_tokens(line_tokens, line_new_tokens)
+            )
+        output.extend(overlaid)
+
+    for line in new_line_numbers[new_line_index:]:
+        output.extend(merge_tokens(new_lines[line]))
+    return output
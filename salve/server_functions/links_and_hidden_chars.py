@@ -1,23 +1,22 @@
+from functools import lru_cache
 from re import Match, Pattern, compile
 
 from token_tools import Token
 
+LINE_CACHE_SIZE: int = 20_000  # Lines whose links and hidden chars are kept
 url_regex: Pattern = compile(r"(ftp|http|https)://[a-zA-Z0-9_-]")
 
 
-def get_urls(whole_text: str, text_range: tuple[int, int]) -> list[Token]:
-    lines: list[str] = whole_text.splitlines()
-    start_pos: tuple[int, int] = (text_range[0], 0)
-    url_toks: list[Token] = []
+@lru_cache(LINE_CACHE_SIZE)
+def line_urls(line: str) -> tuple[tuple[int, int], ...]:
+    """The (column, length) of every url in a line, remembered by the line's text"""
+    urls: list[tuple[int, int]] = []
+    column: int = 0
     while True:
-        if start_pos[0] > text_range[1]:
-            break
-        line: str = lines[start_pos[0] - text_range[0]][start_pos[1] :]
-        match_start: Match[str] | None = url_regex.search(line)
+        match_start: Match[str] | None = url_regex.search(line, column)
         if match_start is None:
-            start_pos = (start_pos[0] + 1, 0)
-            continue
-        token_start_col = match_start.span()[0]  # type: ignore
+            break
+        token_start_col: int = match_start.span()[0]
         url: str = line[token_start_col:]
 
         # Narrow down the url
@@ -31,12 +30,20 @@ def get_urls(whole_text: str, text_range: tuple[int, int]) -> list[Token]:
             url = url.rstrip(")")
         url = url.rstrip(".,?!")
 
-        url_len: int = len(url)
-        token: Token = ((start_pos[0], token_start_col), url_len, "Link")
-        url_toks.append(token)
-        start_pos = (start_pos[0], start_pos[1] + url_len + token_start_col)
+        urls.append((token_start_col, len(url)))
+        column = token_start_col + len(url)
+    return tuple(urls)
 
-    return url_toks
+
+def get_urls(whole_text: str, text_range: tuple[int, int]) -> list[Token]:
+    lines: list[str] = whole_text.splitlines()
+    return [
+        ((line_number, column), url_len, "Link")
+        for line_number, line in enumerate(
+            lines[text_range[0] - 1 : text_range[1]], text_range[0]
+        )
+        for column, url_len in line_urls(line)
+    ]
 
 
 hidden_chars: dict[str, str] = {
@@ -96,20 +103,27 @@ hidden_chars: dict[str, str] = {
 }
 
 
+@lru_cache(LINE_CACHE_SIZE)
+def line_hidden_chars(line: str) -> tuple[tuple[int, int], ...]:
+    """The (column, length) of every hidden char in a line, remembered by the line's text"""
+    return tuple(
+        (char_index, len(char))
+        for char_index, char in enumerate(line)
+        if char in hidden_chars
+    )
+
+
 def find_hidden_chars(
     whole_text: str, text_range: tuple[int, int]
 ) -> list[Token]:
     lines: list[str] = whole_text.splitlines()
-    hidden_char_indexes: list[tuple[tuple[int, int], str]] = [
-        ((line_index + text_range[0], char_index), char)
-        for line_index, line in enumerate(lines)
-        for char_index, char in enumerate(line)
-        if char in list(hidden_chars.keys())
-    ]
-    tok_list: list[Token] = [
-        (char[0], len(char[1]), "Hidden_Char") for char in hidden_char_indexes
+    return [
+        ((line_number, column), char_len, "Hidden_Char")
+        for line_number, line in enumerate(
+            lines[text_range[0] - 1 : text_range[1]], text_range[0]
+        )
+        for column, char_len in line_hidden_chars(line)
     ]
-    return tok_list
 
 
 def get_special_tokens(
@@ -1,6 +1,57 @@
-from functools import cache
+from functools import _lru_cache_wrapper, cache
+from re import Pattern, compile
 from unicodedata import category
 
+# Unicode letters, digits other than decimals and "_" (everything in \w but decimals)
+word_candidate_regex: Pattern = compile(r"[^\W\d]+")
+
+
+def never_stop() -> bool:
+    """Default should_stop for server functions: long running loops call should_stop() regularly and return
+    the partial result they have so far once it returns True (it may also raise to abort them outright)"""
+    return False
+
+
+def first_difference(text: str, other_text: str) -> int:
+    """The index of the first character where the texts differ (comparing halves keeps the work in C and only the
+    part not known to be equal is compared each time)"""
+    low, high = 0, min(len(text), len(other_text))
+    while low < high:
+        middle: int = (low + high + 1) // 2
+        if text.startswith(other_text[low:middle], low):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(text: str, other_text: str, limit: int) -> int:
+    """How many characters (at most limit) the texts end with in common, found like first_difference()"""
+    low, high = 0, min(len(text), len(other_text), limit)
+    while low < high:
+        middle: int = (low + high + 1) // 2
+        if text.endswith(
+            other_text[len(other_text) - middle : len(other_text) - low],
+            0,
+            len(text) - low,
+        ):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def cache_stats(cached_function: _lru_cache_wrapper) -> dict[str, int | float]:
+    """How well an lru_cache'd function's cache is doing"""
+    info = cached_function.cache_info()
+    lookups: int = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
+
 
 @cache
 def is_unicode_letter(char: str) -> bool:
@@ -8,12 +59,12 @@ def is_unicode_letter(char: str) -> bool:
     return char == "_" or category(char).startswith("L")
 
 
-def find_words(full_text: str) -> list[str]:
-    """Returns a list of all words in a given piece of text"""
+def split_unicode_words(text: str) -> list[str]:
+    """Returns a list of all words in a given piece of text by checking each char"""
     words_list = []
     current_word = ""
 
-    for char in full_text:
+    for char in text:
         if is_unicode_letter(char):
             current_word += char
             continue
@@ -30,3 +81,17 @@ def find_words(full_text: str) -> list[str]:
         words_list.append(current_word)
 
     return words_list
+
+
+def find_words(full_text: str) -> list[str]:
+    """Returns a list of all words in a given piece of text"""
+    words_list: list[str] = []
+    for word in word_candidate_regex.findall(full_text):
+        if word.isascii():
+            words_list.append(word)
+            continue
+
+        # \w also matches non decimal digits like "²" which aren't letters
+        words_list.extend(split_unicode_words(word))
+
+    return words_list
@@ -0,0 +1,39 @@
+from array import array
+
+from token_tools import Token
+
+from .misc import split_unicode_words, word_candidate_regex
+
+# Word -> line and column of every occurrence, flattened into pairs (4 bytes each)
+ReferenceIndex = dict[str, array]
+
+
+def index_references(full_text: str) -> ReferenceIndex:
+    """Records where every word (as find_words() splits them) is used in the text"""
+    references: ReferenceIndex = {}
+    for line_number, line in enumerate(full_text.splitlines(), 1):
+        for match in word_candidate_regex.finditer(line):
+            candidate: str = match.group()
+            words: list[str] = (
+                [candidate]
+                if candidate.isascii()
+                else split_unicode_words(candidate)
+            )
+            column: int = match.start()
+            for word in words:
+                column = line.find(word, column)
+                postings: array | None = references.get(word)
+                if postings is None:
+                    postings = references[word] = array("I")
+                postings.extend((line_number, column))
+                column += len(word)
+    return references
+
+
+def get_references(references: ReferenceIndex, word: str) -> list[Token]:
+    """Every whole word occurrence of word in the indexed text in document order"""
+    postings: array = references.get(word, array("I"))
+    return [
+        ((postings[index], postings[index + 1]), len(word), "Reference")
+        for index in range(0, len(postings), 2)
+    ]
@@ -1,37 +1,56 @@
-from difflib import get_close_matches
+from collections import Counter
+from difflib import SequenceMatcher
 
-from .misc import find_words
+from beartype.typing import Callable
+
+from .misc import find_words, never_stop
+
+CANDIDATES_PER_CHECK: int = (
+    256  # Candidates compared between should_stop() calls
+)
 
 
 def get_replacements(
-    full_text: str, expected_keywords: list[str], replaceable_word: str
+    full_text: str,
+    expected_keywords: list[str],
+    replaceable_word: str,
+    should_stop: Callable[[], bool] = never_stop,
+    word_counts: Counter[str] | None = None,
+    max_candidates: int | None = None,
 ) -> list[str]:
-    """Returns a list of possible and plausible replacements for a given word"""
+    """Returns a list of possible and plausible replacements for a given word (word_counts can be given if the words in the
+    text were already counted and no more than max_candidates distinct words are compared if it's given)"""
     # Get all words in file
-    starter_words: list[str] = find_words(full_text)
-    starter_words.extend(
-        expected_keywords * 3
-    )  # We add a multiplier of three to boost the score of keywords
-    while replaceable_word in starter_words:
-        starter_words.remove(replaceable_word)
-
-    # Get close matches
-    starters_no_duplicates = set(starter_words)
-    similar_words = get_close_matches(
-        replaceable_word,
-        starters_no_duplicates,
-        n=len(starters_no_duplicates),
-        cutoff=0.6,
-    )
+    if word_counts is None:
+        word_counts = Counter(find_words(full_text))
+    candidates: Counter[str] = word_counts.copy()
+    for keyword in expected_keywords:
+        candidates[keyword] += (
+            3  # We add a multiplier of three to boost the score of keywords
+        )
+    candidates.pop(replaceable_word, None)
+
+    # Get close matches (what difflib.get_close_matches() does but with room for should_stop())
+    matcher = SequenceMatcher()
+    matcher.set_seq2(replaceable_word)
+    similar_words: list[str] = []
+    for i, word in enumerate(candidates):
+        if i == max_candidates or (
+            i % CANDIDATES_PER_CHECK == 0 and should_stop()
+        ):
+            break
 
-    # Reintroduce duplicates
-    similar_with_duplicates = [
-        word for word in starter_words if word in similar_words
-    ]
+        matcher.set_seq1(word)
+        if (
+            matcher.real_quick_ratio() >= 0.6
+            and matcher.quick_ratio() >= 0.6
+            and matcher.ratio() >= 0.6
+        ):
+            similar_words.append(word)
 
     ranked_matches = sorted(
-        set(similar_with_duplicates),
-        key=(lambda s: (-similar_with_duplicates.count(s), len(s), s)),
+        similar_words,
+        key=(lambda s: (-candidates[s], len(s), s)),
     )
 
     return ranked_matches
@@ -0,0 +1,58 @@
+from logging import Logger
+from multiprocessing.queues import Queue as GenericQueueClass
+from queue import SimpleQueue
+from threading import Event, Thread
+from typing import Any
+
+from beartype.typing import Callable
+
+from .server import ServerStopped
+
+
+class ThreadQueue(GenericQueueClass):
+    """An in process queue that hands messages over as they are instead of pickling them - internal API"""
+
+    # NOTE: collegamento type checks for multiprocessing queues so we subclass one without ever initializing it
+    def __init__(self) -> None:
+        self.queue: SimpleQueue = SimpleQueue()
+
+    def put(self, obj: Any) -> None:  # type: ignore
+        self.queue.put(obj)
+
+    def get(self) -> Any:  # type: ignore
+        return self.queue.get()
+
+    def empty(self) -> bool:
+        return self.queue.empty()
+
+
+class ServerThread(Thread):
+    """Runs a server in a thread of the client's process, standing in for the server process collegamento expects - internal API"""
+
+    def __init__(
+        self,
+        server_type: Callable[..., Any],
+        commands: dict,
+        response_queue: ThreadQueue,
+        requests_queue: ThreadQueue,
+        logger: Logger,
+    ) -> None:
+        super().__init__(daemon=True)
+        self.server_type: Callable[..., Any] = server_type
+        self.server_args: tuple = (
+            commands,
+            response_queue,
+            requests_queue,
+            logger,
+        )
+        self.stop_event = Event()
+
+    def run(self) -> None:
+        try:
+            self.server_type(*self.server_args, stop_event=self.stop_event)
+        except ServerStopped:
+            pass
+
+    def kill(self) -> None:
+        """Stops the server before it looks at the queue again (a running request is finished first)"""
+        self.stop_event.set()
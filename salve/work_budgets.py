@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from re import Pattern, compile
+
+SAMPLE_PIECES: int = (
+    16  # Evenly spaced pieces a sampled word index is built from
+)
+# Letters at the ends of a piece may be part of a word that was cut in half
+cut_word_regex: Pattern = compile(r"^[^\W\d]+|[^\W\d]+$")
+
+
+@dataclass(frozen=True)
+class WorkBudgets:
+    """Limits on the work a single request may do on huge files (such as minified or generated code). Files over
+    a limit get a cheaper strategy and responses say which one was used in "mode". None means no limit - external API
+    """
+
+    # HIGHLIGHT: longer lines are left unlexed
+    max_line_length: int | None = None
+    # HIGHLIGHT: only the requested lines are lexed and the docstring pass is skipped on longer files,
+    # AUTOCOMPLETE and REPLACEMENTS: the words are indexed from a sample of this many characters
+    max_file_size: int | None = None
+    # AUTOCOMPLETE and REPLACEMENTS: no more distinct words than this are looked at
+    max_candidates: int | None = None
+
+    def is_large(self, full_text: str) -> bool:
+        return self.max_file_size is not None and len(full_text) > (
+            self.max_file_size
+        )
+
+    def has_long_lines(self, split_text: list[str]) -> bool:
+        return self.max_line_length is not None and any(
+            len(line) > self.max_line_length  # type: ignore
+            for line in split_text
+        )
+
+    def skip_long_lines(self, split_text: list[str]) -> list[str]:
+        """Blanks out the lines over max_line_length so every other Token keeps its position"""
+        if not self.has_long_lines(split_text):
+            return split_text
+        return [
+            "" if len(line) > self.max_line_length else line  # type: ignore
+            for line in split_text
+        ]
+
+    def is_capped(self, candidates: int) -> bool:
+        return (
+            self.max_candidates is not None
+            and candidates > self.max_candidates
+        )
+
+
+UNLIMITED: WorkBudgets = WorkBudgets()
+
+
+def sample_text(full_text: str, size: int) -> str:
+    """Evenly spaced pieces of full_text adding up to about size characters without cut off words"""
+    piece_size: int = max(1, size // SAMPLE_PIECES)
+    step: int = max(piece_size, len(full_text) // SAMPLE_PIECES)
+    return "\n".join(
+        cut_word_regex.sub("", full_text[start : start + piece_size])
+        for start in range(0, len(full_text), step)
+    )
@@ -0,0 +1,496 @@
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from os import stat_result
+from pathlib import Path
+from sys import getsizeof
+from threading import RLock
+from time import monotonic
+from typing import Any
+
+from beartype.typing import Callable
+
+from .disk_cache import DiskCache, hash_contents
+from .document_store import DocumentStore, estimate_size
+from .server_functions.directories import map_text_file
+from .server_functions.misc import find_words
+
+MAX_MEMOIZED_ENTRIES: int = (
+    256  # Results kept per file by Workspace.get_memoized()
+)
+
+
+@dataclass
+class TrackedFile:
+    """A file the server reads from disk itself instead of getting its contents from the client"""
+
+    path: Path
+    poll_interval: float
+    mtime_ns: int = -1
+    size: int = -1
+    next_poll: float = 0.0
+
+
+class Workspace:
+    """Every file known to a server, the clients using them and data derived from their contents.
+    A daemon shares one Workspace between all of its clients (each served by its own thread) so everything touching
+    its dicts holds the lock. Given a memory_budget (in bytes) the derived data
+    of the least recently used files is evicted first and then their text is spilled to disk - internal API"""
+
+    def __init__(
+        self,
+        cache_path: Path | str | None = None,
+        memory_budget: int | None = None,
+    ) -> None:
+        self.files: DocumentStore = DocumentStore()
+        self.owners: dict[str, set[int]] = {}
+        # File -> name of the derived data -> data computed from the current contents
+        self.derived: dict[str, dict[str, Any]] = {}
+        # Same keys as derived but only holding the sizes that have been estimated so far
+        self.derived_sizes: dict[str, dict[str, int]] = {}
+        # Names of derived data that get_derived() can update from the previous contents instead of rebuilding
+        self.updatable_names: set[str] = set()
+        self.lock = RLock()
+
+        self.memory_budget: int | None = memory_budget
+        # Least recently used file first
+        self.last_used: OrderedDict[str, None] = OrderedDict()
+
+        self.disk_cache: DiskCache | None = (
+            None if cache_path is None else DiskCache(cache_path)
+        )
+        # Freshly opened files normally match what is on disk and will be opened again after a restart
+        # so their derived data is worth persisting, unlike every version typed afterwards
+        self.persisted_files: set[str] = set()
+        self.tracked_files: dict[str, TrackedFile] = {}
+
+        # Word indexes of every file: word -> files using it (for REFERENCES) and word -> uses in all files
+        # (for workspace AUTOCOMPLETE). Changed files are only reindexed the next time they are looked at
+        # so typing doesn't pay for it
+        self.word_files: dict[str, set[str]] = {}
+        self.vocabulary: Counter[str] = Counter()
+        # Sorted words of the vocabulary for prefix lookups, None when words were added or removed since
+        self.sorted_vocabulary: list[str] | None = None
+        # File -> the word counts it was indexed with and roughly how many bytes they use
+        self.indexed_counts: dict[str, Counter[str]] = {}
+        self.indexed_sizes: dict[str, int] = {}
+        self.unindexed_files: set[str] = set()
+
+    def set_contents(self, file: str, contents: str, persist: bool) -> None:
+        if self.files.get(file) == contents:
+            return
+
+        outdated: dict[str, Any] = self.outdated_derived(file)
+        outdated_sizes: dict[str, int] = {
+            name: size
+            for name, size in self.derived_sizes.get(file, {}).items()
+            if name in outdated
+        }
+        self.drop_derived(file)
+        if outdated:
+            # Kept (and accounted for) like other derived data until the next get_derived() updates it
+            self.derived[file] = outdated
+            self.derived_sizes[file] = outdated_sizes
+        self.files[file] = contents
+        self.unindexed_files.add(file)
+        if persist:
+            self.persisted_files.add(file)
+        else:
+            self.persisted_files.discard(file)
+
+    def outdated_derived(self, file: str) -> dict[str, Any]:
+        """The updatable derived data of the file with the contents it was derived from, under "outdated:{name}".
+        Data that is already outdated stays as it is since the contents it came from are kept with it"""
+        file_derived: dict[str, Any] = self.derived.get(file, {})
+        outdated: dict[str, Any] = {}
+        for name in self.updatable_names:
+            if name in file_derived:
+                outdated[f"outdated:{name}"] = (
+                    self.files[file],
+                    file_derived[name],
+                )
+            elif f"outdated:{name}" in file_derived:
+                outdated[f"outdated:{name}"] = file_derived[f"outdated:{name}"]
+        return outdated
+
+    def update_file(self, file: str, contents: str, owner: int = 0) -> None:
+        with self.lock:
+            # The editor's buffer diverged from disk so its contents win from now on
+            self.tracked_files.pop(file, None)
+            self.set_contents(file, contents, file not in self.files)
+            self.owners.setdefault(file, set()).add(owner)
+            self.touch(file)
+
+    def track_file(
+        self, file: str, path: Path, poll_interval: float, owner: int = 0
+    ) -> None:
+        """Reads the file's contents from path and keeps them in sync with the disk"""
+        with self.lock:
+            self.tracked_files[file] = TrackedFile(path, poll_interval)
+            self.owners.setdefault(file, set()).add(owner)
+            self.touch(file)
+            if not self.refresh_tracked_file(file):
+                self.set_contents(file, "", False)
+
+    def refresh_tracked_file(self, file: str) -> bool:
+        """Rereads a tracked file if its mtime or size changed, returning False if it can't be read"""
+        tracked_file: TrackedFile = self.tracked_files[file]
+        try:
+            stats: stat_result = tracked_file.path.stat()
+            if (stats.st_mtime_ns, stats.st_size) == (
+                tracked_file.mtime_ns,
+                tracked_file.size,
+            ):
+                return True
+            contents: str = map_text_file(tracked_file.path)
+        except OSError:
+            # Most likely deleted or being replaced so keep the last contents we saw
+            return False
+
+        tracked_file.mtime_ns = stats.st_mtime_ns
+        tracked_file.size = stats.st_size
+        # These contents are on disk so they'll likely be opened again after a restart
+        self.set_contents(file, contents, True)
+        return True
+
+    def poll_tracked_files(self) -> None:
+        """Checks every tracked file whose poll interval has passed for changes on disk"""
+        if not self.tracked_files:
+            return
+
+        now: float = monotonic()
+        with self.lock:
+            for file, tracked_file in list(self.tracked_files.items()):
+                if now < tracked_file.next_poll:
+                    continue
+                tracked_file.next_poll = now + tracked_file.poll_interval
+                self.refresh_tracked_file(file)
+
+    def remove_file(self, file: str, owner: int = 0) -> None:
+        with self.lock:
+            owners: set[int] = self.owners.get(file, set())
+            owners.discard(owner)
+            if owners:
+                # Another client still has the file open
+                return
+
+            self.owners.pop(file, None)
+            self.files.pop(file, None)
+            self.drop_derived(file)
+            self.persisted_files.discard(file)
+            self.tracked_files.pop(file, None)
+            self.last_used.pop(file, None)
+            self.unindex_file(file)
+
+    def release_owner(self, owner: int) -> None:
+        """Drops every file reference held by a client that went away"""
+        with self.lock:
+            owned_files: list[str] = [
+                file for file, owners in self.owners.items() if owner in owners
+            ]
+            for file in owned_files:
+                self.remove_file(file, owner)
+
+    def find_derived(
+        self, file: str, name: str, touch: bool = True
+    ) -> Any | None:
+        """Returns data derived from the file's contents if it is cached in memory or on disk"""
+        with self.lock:
+            if touch:
+                self.touch(file)
+            file_derived: dict[str, Any] = self.derived.setdefault(file, {})
+            if name in file_derived:
+                return file_derived[name]
+
+            if self.disk_cache is None:
+                return None
+
+            data: Any | None = self.disk_cache.get(
+                hash_contents(self.files[file]), name
+            )
+            if data is not None:
+                self.set_derived(
+                    file, name, data, persist=False, enforce_budget=touch
+                )
+            return data
+
+    def get_derived(
+        self,
+        file: str,
+        name: str,
+        builder: Callable[[str], Any],
+        touch: bool = True,
+        updater: Callable[[str, Any, str], Any] | None = None,
+    ) -> Any:
+        """Returns data derived from the file's contents, building it with builder(contents) if it isn't cached.
+        touch=False is for work over many files: it leaves the order files were used in alone and the caller
+        enforces the memory budget once it is done. With an updater, data derived from older contents is kept
+        through edits and updater(old_contents, old_data, contents) turns it into the data of the new contents
+        (it may change old_data in place as nothing else uses it anymore)"""
+        data: Any | None = self.find_derived(file, name, touch)
+        if data is None:
+            outdated: tuple[str, Any] | None = None
+            with self.lock:
+                contents: str = self.files[file]
+                if updater is not None:
+                    self.updatable_names.add(name)
+                    # Taken so no other client updates the same data
+                    outdated = self.derived.get(file, {}).pop(
+                        f"outdated:{name}", None
+                    )
+                    self.derived_sizes.get(file, {}).pop(
+                        f"outdated:{name}", None
+                    )
+            # Built without the lock so other clients aren't held up (at worst two of them build the same data)
+            data = (
+                builder(contents)
+                if outdated is None
+                else updater(outdated[0], outdated[1], contents)  # type: ignore
+            )
+            with self.lock:
+                if self.files.get(file) == contents:
+                    self.set_derived(file, name, data, enforce_budget=touch)
+        return data
+
+    def get_memoized(
+        self,
+        file: str,
+        name: str,
+        key: Any,
+        builder: Callable[[str], Any],
+        max_entries: int = MAX_MEMOIZED_ENTRIES,
+    ) -> Any:
+        """Like get_derived() for lookups with many keys (such as the definition of each word): only the max_entries
+        most recently used results are kept and they are never persisted, so they can't pile up in memory or on disk"""
+        with self.lock:
+            self.touch(file)
+            memo: OrderedDict[Any, Any] | None = self.derived.get(
+                file, {}
+            ).get(name)
+            if memo is not None and key in memo:
+                memo.move_to_end(key)
+                return memo[key]
+
+            contents: str = self.files[file]
+        data: Any = builder(contents)
+        with self.lock:
+            if self.files.get(file) != contents:
+                return data
+            memo = self.derived.get(file, {}).get(name)
+            if memo is None:
+                memo = OrderedDict()
+            memo[key] = data
+            if len(memo) > max_entries:
+                memo.popitem(last=False)
+            # Set again so its size is estimated again
+            self.set_derived(file, name, memo, persist=False)
+        return data
+
+    def set_derived(
+        self,
+        file: str,
+        name: str,
+        data: Any,
+        persist: bool = True,
+        enforce_budget: bool = True,
+    ) -> None:
+        with self.lock:
+            self.derived.setdefault(file, {})[name] = data
+            self.derived_sizes.get(file, {}).pop(name, None)
+            if persist and (
+                self.disk_cache is not None and file in self.persisted_files
+            ):
+                self.disk_cache.put(
+                    hash_contents(self.files[file]), name, data
+                )
+
+            if enforce_budget:
+                self.enforce_memory_budget()
+
+    def drop_derived(self, file: str) -> int:
+        """Forgets everything derived from the file, returning roughly how many bytes that freed"""
+        with self.lock:
+            freed: int = self.derived_size(file)
+            self.derived.pop(file, None)
+            self.derived_sizes.pop(file, None)
+            return freed
+
+    def build_derived(
+        self, contents: str, name: str, builder: Callable[[str], Any]
+    ) -> Any:
+        """Builds derived data for contents that aren't in the Workspace yet (usually in another thread), loading it from disk if possible"""
+        if self.disk_cache is None:
+            return builder(contents)
+
+        content_hash: str = hash_contents(contents)
+        data: Any | None = self.disk_cache.get(content_hash, name)
+        if data is None:
+            data = builder(contents)
+            self.disk_cache.put(content_hash, name, data)
+        return data
+
+    def touch(self, file: str) -> None:
+        """Marks the file as the most recently used one"""
+        with self.lock:
+            self.last_used[file] = None
+            self.last_used.move_to_end(file)
+
+    def derived_size(self, file: str) -> int:
+        with self.lock:
+            sizes: dict[str, int] = self.derived_sizes.setdefault(file, {})
+            for name, data in self.derived.get(file, {}).items():
+                if name not in sizes:
+                    # Estimating walks the whole structure so it is only done once per item
+                    sizes[name] = estimate_size(data)
+            return sum(sizes.values())
+
+    def text_size(self, file: str) -> int:
+        if self.files.is_spilled(file):
+            return 0
+        return getsizeof(self.files[file])
+
+    def index_size(self, file: str) -> int:
+        """Bytes of the word counts the file is indexed with unless they are its cached word counts (counted as derived data)"""
+        with self.lock:
+            counts: Counter[str] | None = self.indexed_counts.get(file)
+            if (
+                counts is None
+                or self.derived.get(file, {}).get("words") is counts
+            ):
+                return 0
+            return self.indexed_sizes[file]
+
+    def shared_index_size(self) -> int:
+        """Bytes of the tables of the vocabulary and the word -> files index shared by every file"""
+        with self.lock:
+            return (
+                getsizeof(self.vocabulary)
+                + getsizeof(self.word_files)
+                + getsizeof(self.sorted_vocabulary or [])
+            )
+
+    def memory_used(self) -> int:
+        with self.lock:
+            return self.shared_index_size() + sum(
+                self.text_size(file)
+                + self.derived_size(file)
+                + self.index_size(file)
+                for file in self.owners
+            )
+
+    def enforce_memory_budget(self) -> None:
+        """Evicts derived data and then spills text of the least recently used files until the budget is met"""
+        if self.memory_budget is None:
+            return
+
+        with self.lock:
+            used: int = self.memory_used()
+            # The file being worked on is never evicted or it would just be rebuilt right away
+            cold_files: list[str] = list(self.last_used)[:-1]
+            for file in cold_files:
+                if used <= self.memory_budget:
+                    return
+                used -= self.drop_derived(file)
+
+            for file in cold_files:
+                if used <= self.memory_budget:
+                    return
+                if not self.files.is_spilled(file):
+                    used -= self.text_size(file)
+                    self.files.spill(file)
+
+    def memory_usage(self) -> dict[str, Any]:
+        """Per file memory accounting in bytes for the client"""
+        with self.lock:
+            files: dict[str, dict[str, Any]] = {
+                file: {
+                    "text": self.text_size(file),
+                    "derived": self.derived_size(file),
+                    "index": self.index_size(file),
+                    "spilled": self.files.is_spilled(file),
+                }
+                for file in self.owners
+            }
+            shared_index: int = self.shared_index_size()
+            return {
+                "budget": self.memory_budget,
+                "total": shared_index
+                + sum(
+                    usage["text"] + usage["derived"] + usage["index"]
+                    for usage in files.values()
+                ),
+                "shared_index": shared_index,
+                "files": files,
+            }
+
+    def word_counts(self, file: str, touch: bool = True) -> Counter[str]:
+        return self.get_derived(file, "words", count_words, touch)
+
+    def unindex_file(self, file: str) -> None:
+        self.unindexed_files.discard(file)
+        self.indexed_sizes.pop(file, None)
+        for word, count in self.indexed_counts.pop(file, Counter()).items():
+            remaining: int = self.vocabulary[word] - count
+            if remaining:
+                self.vocabulary[word] = remaining
+            else:
+                del self.vocabulary[word]
+                self.sorted_vocabulary = None
+
+            files: set[str] = self.word_files[word]
+            files.discard(file)
+            if not files:
+                del self.word_files[word]
+
+    def index_files(self, skipped_file: str | None = None) -> None:
+        """Reindexes the files that changed since they were last indexed. Indexing isn't the user working on
+        those files so they keep their place in the order files were used in"""
+        with self.lock:
+            unindexed_files: list[str] = [
+                file for file in self.unindexed_files if file != skipped_file
+            ]
+            for file in unindexed_files:
+                self.unindex_file(file)
+                word_counts: Counter[str] = self.word_counts(file, touch=False)
+                self.indexed_counts[file] = word_counts
+                self.indexed_sizes[file] = estimate_size(word_counts)
+                for word, count in word_counts.items():
+                    if word not in self.vocabulary:
+                        self.sorted_vocabulary = None
+                    self.vocabulary[word] += count
+                    self.word_files.setdefault(word, set()).add(file)
+
+            if unindexed_files:
+                self.enforce_memory_budget()
+
+    def files_using(self, word: str) -> set[str]:
+        """Every file that uses the word"""
+        with self.lock:
+            self.index_files()
+            return set(self.word_files.get(word, ()))
+
+    def workspace_words(self, file: str, prefix: str) -> Counter[str]:
+        """How often the words starting with (but not equal to) prefix are used in every file but the given one. That
+        file is left unindexed as it is the one being typed in and its words come from its own index anyway"""
+        with self.lock:
+            self.index_files(file)
+            if self.sorted_vocabulary is None:
+                self.sorted_vocabulary = sorted(self.vocabulary)
+
+            own_counts: Counter[str] = self.indexed_counts.get(file, Counter())
+            words: Counter[str] = Counter()
+            for index in range(
+                bisect_left(self.sorted_vocabulary, prefix),
+                len(self.sorted_vocabulary),
+            ):
+                word: str = self.sorted_vocabulary[index]
+                if not word.startswith(prefix):
+                    break
+                count: int = self.vocabulary[word] - own_counts[word]
+                if count and word != prefix:
+                    words[word] = count
+            return words
+
+
+def count_words(full_text: str) -> Counter[str]:
+    return Counter(find_words(full_text))
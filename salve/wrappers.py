@@ -1,57 +1,308 @@
-from collegamento import FileServer, Request
-from pyeditorconfig import get_config
-from token_tools import Token, normal_text_range
+from collections import Counter
+from functools import partial
+from pathlib import Path
+from typing import Any
 
+from collegamento import USER_FUNCTION, FileServer, Request
+from token_tools import Token, normal_text_range, only_tokens_in_text_range
+
+from .autocomplete_session import AutocompleteSession
+from .directory_scan import DirectoryScan
+from .language_profile import LanguageProfile
+from .misc import (
+    ADD_DIRECTORY,
+    AUTOCOMPLETE,
+    CANCEL,
+    DEFINITION,
+    EDITORCONFIG,
+    HIGHLIGHT,
+    LINKS_AND_CHARS,
+    MEMORY_USAGE,
+    REFERENCES,
+    REGISTER_LANGUAGE,
+    REPLACEMENTS,
+    WORK_BUDGETS,
+)
+from .server import SalveServer
 from .server_functions import (
-    find_autocompletions,
+    find_files,
+    get_config,
+    get_configs,
     get_definition,
     get_highlights,
+    get_references,
     get_replacements,
     get_special_tokens,
+    index_references,
+)
+from .server_functions.autocompletions import (
+    FuzzyIndex,
+    WordPositions,
+    find_fuzzy_autocompletions,
+    find_relevant_words,
+    fuzzy_index,
+    nearest_blocks,
+    rank_autocompletions,
+    update_word_positions,
+    word_positions,
+)
+from .server_functions.highlight.highlight import (
+    highlight_lines,
+    line_tokens,
 )
+from .server_functions.links_and_hidden_chars import (
+    line_hidden_chars,
+    line_urls,
+)
+from .server_functions.misc import cache_stats
+from .work_budgets import UNLIMITED, WorkBudgets, sample_text
+from .workspace import count_words
+
+
+def request_profile(
+    server: SalveServer, request: Request, argument: str
+) -> LanguageProfile | None:
+    """The registered profile of the request's language when the request left argument out for it"""
+    if argument in request:
+        return None
+    return server.language_profiles.get(request["language"])  # type: ignore
+
+
+def word_index(server: SalveServer, request: Request) -> Counter[str]:
+    """The word counts of the request's file, indexed from a sample of its text when it is over the size budget"""
+    budgets: WorkBudgets = server.work_budgets or UNLIMITED
+    if budgets.is_large(request["file"]):  # type: ignore
+        server.report_mode(request, "sampled")
+        size: int = budgets.max_file_size  # type: ignore
+        return server.workspace.get_derived(
+            request["file_name"],  # type: ignore
+            f"words:sample:{size}",
+            lambda full_text: count_words(sample_text(full_text, size)),
+        )
+
+    word_counts: Counter[str] = server.workspace.word_counts(
+        request["file_name"]  # type: ignore
+    )
+    server.report_mode(
+        request, "capped" if budgets.is_capped(len(word_counts)) else "full"
+    )
+    return word_counts
 
 
 def find_autocompletions_request_wrapper(
-    server: FileServer, request: Request
+    server: SalveServer, request: Request
 ) -> list[str]:
-    return find_autocompletions(
-        full_text=request["file"],  # type: ignore
-        expected_keywords=request["expected_keywords"],  # type: ignore
-        current_word=request["current_word"],  # type: ignore
+    current_word: str = request["current_word"]  # type: ignore
+    fuzzy: bool = request.get("fuzzy", False)  # type: ignore
+    profile = request_profile(server, request, "expected_keywords")
+    expected_keywords: list[str] = request.get("expected_keywords", [])  # type: ignore
+    if profile is not None:
+        # Fuzzy matches don't have to start with the word
+        expected_keywords = (
+            profile.keywords
+            if fuzzy
+            else profile.keywords_starting_with(current_word)
+        )
+
+    if fuzzy:
+        server.autocomplete_session = None
+        word_counts: Counter[str] = word_index(server, request)
+        budgets: WorkBudgets = server.work_budgets or UNLIMITED
+        # Like the word counts, the index of a huge file is built from (and cached for) a sample of it
+        index: FuzzyIndex = server.workspace.get_derived(
+            request["file_name"],  # type: ignore
+            f"fuzzy_index:sample:{budgets.max_file_size}"
+            if budgets.is_large(request["file"])  # type: ignore
+            else "fuzzy_index",
+            lambda full_text: fuzzy_index(word_counts),
+        )
+        return find_fuzzy_autocompletions(
+            word_counts,
+            index,
+            expected_keywords,
+            current_word,
+            partial(server.checkpoint, request),
+            budgets.max_candidates,
+        )
+
+    # Typing the word further can only narrow down the last request's words
+    session: AutocompleteSession | None = server.autocomplete_session
+    relevant_words: Counter[str] | None = None
+    if session is not None:
+        relevant_words = session.narrow(
+            request["file_name"],  # type: ignore
+            request["file"],  # type: ignore
+            current_word,
+        )
+    positions: WordPositions | None = None
+    if relevant_words is not None:
+        server.report_mode(request, "full")
+        positions = session.positions  # type: ignore
+    else:
+        relevant_words = find_relevant_words(
+            word_index(server, request),
+            current_word,
+            partial(server.checkpoint, request),
+            (server.work_budgets or UNLIMITED).max_candidates,
+        )
+
+    distances: dict[str, int] | None = None
+    if "cursor" in request and not (server.work_budgets or UNLIMITED).is_large(
+        request["file"]
+    ):  # type: ignore
+        if positions is None:
+            positions = server.workspace.get_derived(
+                request["file_name"],  # type: ignore
+                "word_positions",
+                word_positions,
+                updater=update_word_positions,
+            )
+        distances = nearest_blocks(
+            positions,
+            relevant_words,
+            request["cursor"][0],  # type: ignore
+        )
+
+    server.autocomplete_session = (
+        None
+        if server.is_degraded(request)
+        else AutocompleteSession(
+            request["file_name"],  # type: ignore
+            request["file"],  # type: ignore
+            current_word,
+            relevant_words,
+            positions,
+        )
+    )
+    if request.get("scope") == "workspace":
+        # Words of the other files are added to (not stored in) the session as the file's own words are narrowed
+        relevant_words = relevant_words + server.workspace.workspace_words(
+            request["file_name"],  # type: ignore
+            current_word,
+        )
+    return rank_autocompletions(
+        relevant_words, expected_keywords, current_word, distances
     )
 
 
 def get_replacements_request_wrapper(
-    server: FileServer, request: Request
+    server: SalveServer, request: Request
 ) -> list[str]:
+    profile = request_profile(server, request, "expected_keywords")
     return get_replacements(
         full_text=request["file"],  # type: ignore
-        expected_keywords=request["expected_keywords"],  # type: ignore
+        expected_keywords=(
+            profile.keywords
+            if profile is not None
+            else request.get("expected_keywords", [])
+        ),
         replaceable_word=request["current_word"],  # type: ignore
+        should_stop=partial(server.checkpoint, request),
+        word_counts=word_index(server, request),
+        max_candidates=(server.work_budgets or UNLIMITED).max_candidates,
     )
 
 
 def get_highlights_request_wrapper(
-    server: FileServer, request: Request
+    server: SalveServer, request: Request
 ) -> list[Token]:
-    return get_highlights(
-        full_text=request["file"],  # type: ignore
-        language=request["language"],  # type: ignore
-        text_range=request["text_range"],  # type: ignore
+    full_text: str = request["file"]  # type: ignore
+    language: str = request["language"]  # type: ignore
+    split_text, text_range = normal_text_range(
+        full_text, request["text_range"]
+    )  # type: ignore
+
+    # Whole file highlights are kept (and persisted) so that any range can be cut out of them later
+    highlights_name: str = f"highlight:{language}"
+    file_highlights: list[Token] | None = server.workspace.find_derived(
+        request["file_name"],  # type: ignore
+        highlights_name,
+    )
+    if file_highlights is not None:
+        server.report_mode(request, "full")
+        return only_tokens_in_text_range(file_highlights, text_range)
+
+    budgets: WorkBudgets = server.work_budgets or UNLIMITED
+    should_stop = partial(server.checkpoint, request)
+    if budgets.is_large(full_text):
+        # Only the requested lines are lexed and the docstring pass over the whole text is skipped
+        server.report_mode(request, "viewport")
+        return highlight_lines(
+            budgets.skip_long_lines(split_text),
+            text_range,
+            language,
+            None,
+            should_stop,
+        )
+
+    highlighter = (
+        get_highlights
+        if server.highlight_pool is None
+        else server.highlight_pool.highlight
+    )
+    all_lines: list[str] = full_text.splitlines()
+    if budgets.has_long_lines(all_lines):
+        # Highlights of the changed text aren't worth keeping
+        server.report_mode(request, "long_lines_skipped")
+        return highlighter(
+            "\n".join(budgets.skip_long_lines(all_lines)),
+            language,
+            text_range,
+            should_stop,
+        )
+
+    server.report_mode(request, "full")
+    if text_range[0] > 1 or len(split_text) < len(all_lines):
+        return highlighter(full_text, language, text_range, should_stop)
+
+    file_highlights = highlighter(full_text, language, (1, -1), should_stop)
+    if server.is_partial(request):
+        return file_highlights
+
+    server.workspace.set_derived(
+        request["file_name"],  # type: ignore
+        highlights_name,
+        file_highlights,
     )
+    # A server thread hands its result to the client as is so the cached list must not be the one sent
+    return list(file_highlights)
 
 
 def editorconfig_request_wrapper(server: FileServer, request: Request) -> dict:
+    if "file_paths" in request:
+        return get_configs(request["file_paths"])  # type: ignore
+
     return get_config(request["file_path"])  # type: ignore
 
 
 def get_definition_request_wrapper(
-    server: FileServer, request: Request
+    server: SalveServer, request: Request
 ) -> Token:
-    return get_definition(
-        request["file"],  # type: ignore
-        request["definition_starters"],  # type: ignore
-        request["current_word"],  # type: ignore
+    current_word: str = request["current_word"]  # type: ignore
+    profile = request_profile(server, request, "definition_starters")
+    if profile is None:
+        definition_starters: list[tuple[str, str]] = request.get(  # type: ignore
+            "definition_starters", []
+        )
+        return server.workspace.get_memoized(
+            request["file_name"],  # type: ignore
+            "definitions",
+            (current_word, repr(definition_starters)),
+            lambda full_text: get_definition(
+                full_text, definition_starters, current_word
+            ),
+        )
+
+    return server.workspace.get_memoized(
+        request["file_name"],  # type: ignore
+        "definitions",
+        (current_word, profile.starters_key),
+        lambda full_text: get_definition(
+            full_text,
+            profile.definition_starters,
+            current_word,
+            profile.definition_regexes(current_word),
+        ),
     )
 
 
@@ -64,3 +315,93 @@ def get_special_tokens_request_wrapper(
             1
         ],
     )
+
+
+def get_references_request_wrapper(
+    server: SalveServer, request: Request
+) -> dict[str, list[Token]]:
+    """Looks the word up in the indexes of the request's file or of every file the client gave the server"""
+    word: str = request["current_word"]  # type: ignore
+    files: list[str] = [request["file_name"]]  # type: ignore
+    if request.get("scope") == "workspace":
+        files = sorted(
+            file
+            for file in server.workspace.files_using(word)
+            if server.client_id in server.workspace.owners.get(file, set())
+        )
+
+    references: dict[str, list[Token]] = {}
+    for file in files:
+        if server.checkpoint(request):
+            break
+        tokens: list[Token] = get_references(
+            server.workspace.get_derived(file, "references", index_references),
+            word,
+        )
+        if tokens:
+            references[file] = tokens
+    return references
+
+
+def add_directory_request_wrapper(
+    server: SalveServer, request: Request
+) -> None:
+    """Finds every matching file in the directory. The server reads and indexes them between other requests, sending
+    progress notifications along the way and the added and skipped files once it is done"""
+    paths: list[Path] = find_files(
+        Path(request["directory"]),  # type: ignore
+        request["globs"],  # type: ignore
+        request["exclude"],  # type: ignore
+    )
+    server.directory_scans.append(
+        DirectoryScan(request, paths, pool=server.highlight_pool)
+    )
+
+
+def cancel_request_wrapper(server: SalveServer, request: Request) -> None:
+    server.cancel(request["cancelled_command"])  # type: ignore
+
+
+def register_language_request_wrapper(
+    server: SalveServer, request: Request
+) -> None:
+    server.language_profiles[request["name"]] = LanguageProfile(  # type: ignore
+        request["name"],  # type: ignore
+        request["keywords"],  # type: ignore
+        request["definition_starters"],  # type: ignore
+    )
+
+
+def work_budgets_request_wrapper(
+    server: SalveServer, request: Request
+) -> None:
+    server.work_budgets = request["budgets"]  # type: ignore
+
+
+def memory_usage_request_wrapper(
+    server: SalveServer, request: Request
+) -> dict[str, Any]:
+    usage: dict[str, Any] = server.workspace.memory_usage()
+    usage["line_caches"] = {
+        "highlight": cache_stats(line_tokens),
+        "links": cache_stats(line_urls),
+        "hidden_chars": cache_stats(line_hidden_chars),
+    }
+    usage["dropped_file_updates"] = server.dropped_file_updates
+    return usage
+
+
+COMMAND_WRAPPERS: dict[str, USER_FUNCTION] = {
+    AUTOCOMPLETE: find_autocompletions_request_wrapper,
+    REPLACEMENTS: get_replacements_request_wrapper,
+    HIGHLIGHT: get_highlights_request_wrapper,
+    EDITORCONFIG: editorconfig_request_wrapper,
+    DEFINITION: get_definition_request_wrapper,
+    LINKS_AND_CHARS: get_special_tokens_request_wrapper,
+    REFERENCES: get_references_request_wrapper,
+    ADD_DIRECTORY: add_directory_request_wrapper,
+    MEMORY_USAGE: memory_usage_request_wrapper,
+    CANCEL: cancel_request_wrapper,
+    REGISTER_LANGUAGE: register_language_request_wrapper,
+    WORK_BUDGETS: work_budgets_request_wrapper,
+}
@@ -0,0 +1,21 @@
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import pytest
+
+from salve import IPC
+
+
+@pytest.fixture
+def new_ipc() -> Iterator[Callable[..., IPC]]:
+    """Creates IPC's that are killed once the test is over, even if it failed"""
+    contexts: list[IPC] = []
+
+    def create(**kwargs: Any) -> IPC:
+        context = IPC(**kwargs)
+        contexts.append(context)
+        return context
+
+    yield create
+    for context in contexts:
+        context.kill_IPC()
@@ -0,0 +1,15 @@
+from time import sleep
+
+from salve import IPC, Response
+
+
+def get_response(
+    context: IPC, command: str, final: bool = False, attempts: int = 500
+) -> Response:
+    """Waits for the newest response of command, skipping progress notifications if final is set"""
+    for _ in range(attempts):
+        output = context.get_response(command)
+        if output is not None and (not final or output["type"] == "response"):
+            return output
+        sleep(0.01)
+    raise AssertionError(f"No response for {command}")
@@ -0,0 +1,69 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+from helpers import get_response
+
+from salve import ADD_DIRECTORY, AUTOCOMPLETE
+
+
+def test_add_directory(new_ipc):
+    with TemporaryDirectory() as directory:
+        root = Path(directory).resolve()
+        (root / "package").mkdir()
+        (root / "ignored").mkdir()
+        (root / "package" / "module.py").write_text(
+            "def sibling_function(): ..."
+        )
+        (root / "package" / "notes.txt").write_text("not a python file")
+        (root / "package" / "binary.py").write_bytes(b"\0\1\2")
+        (root / "package" / "huge.py").write_text("x = 1\n" * 1000)
+        (root / "ignored" / "other.py").write_text("ignored_function = 1")
+
+        context = new_ipc()
+        context.add_directory(
+            root, globs=["*.py"], exclude=["ignored"], max_file_size=1000
+        )
+        output = get_response(context, ADD_DIRECTORY, final=True)
+        assert output["result"] == {
+            "files": [str(root / "package" / "module.py")],
+            "skipped": [
+                str(root / "package" / "binary.py"),
+                str(root / "package" / "huge.py"),
+            ],
+        }
+
+        context.request(
+            AUTOCOMPLETE,
+            file=str(root / "package" / "module.py"),
+            expected_keywords=[],
+            current_word="sib",
+        )
+        assert get_response(context, AUTOCOMPLETE)["result"] == [
+            "sibling_function"
+        ]
+
+
+@pytest.mark.parametrize("highlight_workers", [0, 2])
+def test_add_directory_in_steps(new_ipc, highlight_workers):
+    with TemporaryDirectory() as directory:
+        root = Path(directory).resolve()
+        for index in range(2000):
+            (root / f"module{index}.py").write_text(
+                f"value{index} = {index}\n" * 20
+            )
+
+        context = new_ipc(highlight_workers=highlight_workers)
+        context.update_file("test", "typed = 1\ntyp")
+        context.add_directory(root)
+        context.request(
+            AUTOCOMPLETE, file="test", expected_keywords=[], current_word="typ"
+        )
+        # Other requests are answered while the directory is still being read
+        assert get_response(context, AUTOCOMPLETE)["result"] == ["typed"]
+        assert not context.directory_files
+
+        output = get_response(context, ADD_DIRECTORY, final=True)
+        assert output["result"]["files"] == [  # type: ignore
+            str(path) for path in sorted(root.iterdir())
+        ]
@@ -0,0 +1,46 @@
+from collections import Counter
+
+from helpers import get_response
+
+from salve import AUTOCOMPLETE
+from salve.autocomplete_session import AutocompleteSession
+
+TEXT: str = "config configure confidence cone conf\nvalue = 1\n"
+
+
+def test_narrow():
+    text: str = TEXT.replace("conf\n", "con\n")
+    session = AutocompleteSession(
+        "test",
+        text,
+        "con",
+        Counter({"config": 1, "configure": 1, "confidence": 1, "cone": 1}),
+    )
+    assert session.narrow("test", TEXT, "conf") == Counter(
+        {"config": 1, "configure": 1, "confidence": 1}
+    )
+    # Anything but the word being typed changing means starting over
+    assert session.narrow("other", TEXT, "conf") is None
+    assert session.narrow("test", text.replace("1", "12"), "con2") is None
+    assert session.narrow("test", "x" + text, "conx") is None
+
+
+def test_typing(new_ipc):
+    context = new_ipc()
+    for current_word, expected in [
+        ("co", ["cone", "config", "configure", "confidence"]),
+        ("con", ["cone", "config", "configure", "confidence"]),
+        ("conf", ["config", "configure", "confidence"]),
+        ("confi", ["config", "configure", "confidence"]),
+        ("config", ["configure"]),
+    ]:
+        context.update_file(
+            "test", TEXT.replace("conf\n", current_word + "\n")
+        )
+        context.request(
+            AUTOCOMPLETE,
+            file="test",
+            expected_keywords=[],
+            current_word=current_word,
+        )
+        assert get_response(context, AUTOCOMPLETE)["result"] == expected
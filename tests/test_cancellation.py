@@ -0,0 +1,46 @@
+from time import sleep
+
+from helpers import get_response
+
+from salve import AUTOCOMPLETE, HIGHLIGHT, REPLACEMENTS
+from salve.server_functions import get_highlights
+
+# Every line is different so none of them are highlighted from the line cache
+TEXT: str = "".join(
+    f"def function(argument_{number}: int) -> None:\n    return {number}  # Comment\n"
+    for number in range(10000)
+)
+
+
+def test_cancel_running_request(new_ipc):
+    context = new_ipc()
+    context.update_file("test", TEXT)
+    context.request(HIGHLIGHT, file="test", language="python")
+    sleep(0.5)  # Let the highlight start
+
+    context.cancel_request(HIGHLIGHT)
+    context.request(
+        AUTOCOMPLETE, file="test", expected_keywords=[], current_word="fun"
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == ["function"]
+    # Requests are answered in order so a highlight that kept running would have been answered first
+    assert context.get_response(HIGHLIGHT) is None
+
+
+def test_superseded_request(new_ipc):
+    context = new_ipc()
+    context.update_file("test", TEXT)
+    context.request(HIGHLIGHT, file="test", language="python")
+    sleep(0.5)
+
+    context.request(
+        HIGHLIGHT, file="test", language="python", text_range=(1, 2)
+    )
+    assert get_response(context, HIGHLIGHT)["result"] == get_highlights(
+        TEXT, "python", (1, 2)
+    )
+
+    context.request(
+        REPLACEMENTS, file="test", expected_keywords=[], current_word="functin"
+    )
+    assert get_response(context, REPLACEMENTS)["result"] == ["function"]
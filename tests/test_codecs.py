@@ -0,0 +1,75 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+from helpers import get_response
+
+from salve import (
+    AUTOCOMPLETE,
+    HIGHLIGHT,
+    MarshalCodec,
+    PickleCodec,
+)
+from salve.codec import CodecPipe, MessageCodec
+
+
+class RecordingCodec(PickleCodec):
+    def __init__(self) -> None:
+        self.messages: list[Any] = []
+
+    def encode(self, message: Any) -> bytes:
+        self.messages.append(message)
+        return super().encode(message)
+
+
+def test_marshal_codec(new_ipc):
+    codec = MarshalCodec()
+    message: dict = {"id": 1, "result": [((1, 0), 3, "Keyword")]}
+    assert codec.encode(message).startswith(b"m")
+    assert codec.decode(codec.encode(message)) == message
+    # Anything marshal can't handle is pickled instead
+    assert codec.decode(codec.encode({"path": Path("x")})) == {
+        "path": Path("x")
+    }
+
+    context = new_ipc(codec=codec)
+    context.update_file("test", "value = 1\nvalue\nval")
+    context.request(
+        AUTOCOMPLETE, file="test", expected_keywords=[], current_word="val"
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == ["value"]
+
+
+def test_request_fields(new_ipc):
+    codec = RecordingCodec()
+    context = new_ipc(codec=codec)
+    context.update_file("test", "value = 1\n")
+    context.request(HIGHLIGHT, file="test", language="python")
+    assert get_response(context, HIGHLIGHT)["result"] == [
+        ((1, 0), 5, "Name"),
+        ((1, 6), 1, "Operator"),
+        ((1, 8), 1, "Number"),
+    ]
+    # Only the arguments HIGHLIGHT uses are sent
+    assert set(codec.messages[-1]) == {
+        "id",
+        "type",
+        "command",
+        "file",
+        "language",
+        "text_range",
+    }
+
+
+def test_codec_pipe():
+    with pytest.raises(TypeError):
+        MessageCodec()  # type: ignore
+
+    pipe = CodecPipe(MarshalCodec())
+    assert pipe.empty()
+    # Neither the big message (more than the pipe holds) nor the ones after it block put()
+    messages: list[Any] = [{"id": 1}, "x" * 1_000_000, {"id": 2}, [3]]
+    for message in messages:
+        pipe.put(message)
+    assert [pipe.get() for _ in messages] == messages
+    assert pipe.empty()
@@ -0,0 +1,99 @@
+from random import Random
+
+from helpers import get_response
+
+from salve import AUTOCOMPLETE
+from salve.server_functions.autocompletions import (
+    nearest_blocks,
+    update_word_positions,
+    word_positions,
+)
+from salve.workspace import Workspace
+
+# "total" is used far more often but "token" is defined right above the cursor
+TEXT: str = "total = total + total\n" * 200 + "\n" * 40 + "token = 1\nto\n"
+
+
+def test_nearest_blocks():
+    positions = word_positions(TEXT)
+    # Each block of lines is only listed once per word
+    assert list(positions["total"]) == list(range(13))
+    assert list(positions["token"]) == [15]
+    assert nearest_blocks(positions, ["total", "token", "nope"], 1) == {
+        "total": 0,
+        "token": 15,
+    }
+    assert nearest_blocks(positions, ["total", "token"], 242) == {
+        "total": 3,
+        "token": 0,
+    }
+
+
+def test_update_word_positions():
+    random = Random(0)
+    text: str = "".join(f"word{index % 50} other\n" for index in range(500))
+    positions = word_positions(text)
+    for _ in range(300):
+        start: int = random.randrange(len(text))
+        end: int = start + random.randrange(40)
+        # Typing within lines, adding and removing lines
+        inserted: str = random.choice(["", "new", "word7", "\n", "a\nb\n"])
+        new_text: str = text[:start] + inserted + text[end:]
+        positions = update_word_positions(text, positions, new_text)
+        assert positions == word_positions(new_text)
+        text = new_text
+
+
+def test_positions_kept_through_edits():
+    def never_called(full_text: str) -> None:
+        raise AssertionError("The positions should have been updated")
+
+    workspace = Workspace()
+    workspace.update_file("test", TEXT)
+    workspace.get_derived(
+        "test", "word_positions", word_positions, updater=update_word_positions
+    )
+    # Several edits may come before the positions are looked at again
+    workspace.update_file("test", TEXT + "tomato")
+    workspace.update_file("test", "tomato\n" + TEXT)
+    assert workspace.get_derived(
+        "test", "word_positions", never_called, updater=update_word_positions
+    ) == word_positions("tomato\n" + TEXT)
+
+
+def test_cursor_ranking(new_ipc):
+    context = new_ipc()
+    context.update_file("test", TEXT)
+    context.request(
+        AUTOCOMPLETE, file="test", expected_keywords=[], current_word="to"
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == [
+        "total",
+        "token",
+    ]
+
+    # Near the cursor the definition beats the more common word
+    context.request(
+        AUTOCOMPLETE,
+        file="test",
+        expected_keywords=[],
+        current_word="to",
+        cursor=(242, 2),
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == [
+        "token",
+        "total",
+    ]
+
+    # Where both are used nearby the count decides again
+    context.request(
+        AUTOCOMPLETE,
+        file="test",
+        expected_keywords=[],
+        current_word="to",
+        cursor=(1, 2),
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == [
+        "total",
+        "token",
+    ]
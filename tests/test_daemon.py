@@ -0,0 +1,114 @@
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from pathlib import Path
+from stat import S_IMODE
+from sys import getswitchinterval, setswitchinterval
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import sleep
+
+import pytest
+from helpers import get_response
+
+from salve import AUTOCOMPLETE, SalveDaemon
+from salve.workspace import Workspace
+
+
+def test_daemon(new_ipc):
+    with TemporaryDirectory() as directory:
+        address = str(Path(directory) / "salve.sock")
+        daemon = SalveDaemon(address)
+        Thread(target=daemon.serve_forever, daemon=True).start()
+
+        first = new_ipc(daemon_address=address)
+        second = new_ipc(daemon_address=address)
+        first.update_file("shared", "this that\nthose")
+        first.update_file("first", "these")
+        second.update_file("shared", "this that\nthose")
+        sleep(0.2)
+        assert daemon.workspace.files == {
+            "shared": "this that\nthose",
+            "first": "these",
+        }
+
+        # The shared file stays until every client that added it is done with it
+        first.remove_file("shared")
+        sleep(0.2)
+        assert "shared" in daemon.workspace.files
+
+        second.request(
+            AUTOCOMPLETE,
+            file="shared",
+            expected_keywords=[],
+            current_word="th",
+        )
+        assert get_response(second, AUTOCOMPLETE)["result"] == [
+            "that",
+            "this",
+            "those",
+        ]
+
+        first.kill_IPC()
+        second.kill_IPC()
+        sleep(0.2)
+        assert daemon.workspace.files == {}
+        daemon.close()
+
+
+def test_daemon_authkey(new_ipc):
+    with TemporaryDirectory() as directory:
+        address = str(Path(directory) / "salve.sock")
+        daemon = SalveDaemon(address)
+        Thread(target=daemon.serve_forever, daemon=True).start()
+        assert S_IMODE(Path(address).stat().st_mode) == 0o600
+        assert S_IMODE(Path(f"{address}.key").stat().st_mode) == 0o600
+
+        # Clients without the key are refused and the daemon keeps serving the others
+        with pytest.raises(AuthenticationError):
+            Client(address, family="AF_UNIX", authkey=b"wrong key")
+        context = new_ipc(daemon_address=address)
+        context.update_file("test", "this that")
+        context.request(
+            AUTOCOMPLETE, file="test", expected_keywords=[], current_word="th"
+        )
+        assert get_response(context, AUTOCOMPLETE)["result"] == [
+            "that",
+            "this",
+        ]
+
+        context.kill_IPC()
+        daemon.close()
+        assert not Path(f"{address}.key").exists()
+
+
+def test_workspace_threads():
+    # Like a daemon's clients, threads work on the same files while memory is accounted for and evicted
+    workspace = Workspace(memory_budget=5_000)
+    errors: list[Exception] = []
+
+    def use_files(client: int) -> None:
+        try:
+            for index in range(1000):
+                file: str = f"file{index % 20}"
+                workspace.update_file(file, f"word{index} " * 50, client)
+                workspace.word_counts(file)
+                workspace.get_derived(file, f"client{client}", str.split)
+                workspace.memory_usage()
+        except Exception as error:  # noqa: BLE001
+            errors.append(error)
+
+    threads: list[Thread] = [
+        Thread(target=use_files, args=(client,)) for client in range(4)
+    ]
+    switch_interval: float = getswitchinterval()
+    # Switching threads as often as possible makes unlocked accesses collide
+    setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        setswitchinterval(switch_interval)
+    assert errors == []
+    assert workspace.memory_used() <= 5_000
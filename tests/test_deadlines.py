@@ -0,0 +1,54 @@
+from time import sleep
+
+from helpers import get_response
+
+from salve import HIGHLIGHT, REPLACEMENTS, Response
+
+# Every line is different so none of them are highlighted from the line cache
+TEXT: str = "".join(
+    f"def function(argument_{number}: int) -> None:\n    return {number}  # Comment\n"
+    for number in range(10000)
+)
+
+
+def test_partial_result(new_ipc):
+    context = new_ipc()
+    context.update_file("test", TEXT)
+
+    context.request(HIGHLIGHT, file="test", language="python", deadline_ms=200)
+    output: Response = get_response(context, HIGHLIGHT)
+    # Highlighting the whole file takes longer than the deadline
+    assert output["partial"]  # type: ignore
+    assert 0 < len(output["result"]) < 20000 * 5  # type: ignore
+
+    context.request(
+        REPLACEMENTS,
+        file="test",
+        expected_keywords=[],
+        current_word="functin",
+        deadline_ms=5000,
+    )
+    output = get_response(context, REPLACEMENTS)
+    assert not output["partial"]  # type: ignore
+    assert output["result"] == ["function"]
+
+
+def test_expired_request(new_ipc):
+    context = new_ipc()
+    context.update_file("test", "function")
+    context.request(
+        REPLACEMENTS,
+        file="test",
+        expected_keywords=[],
+        current_word="functin",
+        deadline_ms=-1,
+    )
+    sleep(1)
+    assert context.get_response(REPLACEMENTS) is None
+
+    context.request(
+        REPLACEMENTS, file="test", expected_keywords=[], current_word="functin"
+    )
+    output: Response = get_response(context, REPLACEMENTS)
+    assert output["result"] == ["function"]
+    assert "partial" not in output
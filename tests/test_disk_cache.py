@@ -0,0 +1,58 @@
+from collections import Counter
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from salve.workspace import Workspace
+
+
+def never_called(full_text: str) -> None:
+    raise AssertionError("Derived data should have come from the disk cache")
+
+
+def test_disk_cache():
+    with TemporaryDirectory() as directory:
+        cache_path = Path(directory) / "cache.sqlite"
+
+        workspace = Workspace(cache_path)
+        workspace.update_file("test", "this that this")
+        assert workspace.word_counts("test") == Counter({"this": 2, "that": 1})
+        # Versions typed after opening the file aren't persisted
+        workspace.update_file("test", "this that this those")
+        workspace.word_counts("test")
+        workspace.disk_cache.close()  # type: ignore
+
+        restarted_workspace = Workspace(cache_path)
+        restarted_workspace.update_file("same", "this that this")
+        assert restarted_workspace.get_derived(
+            "same", "words", never_called
+        ) == Counter({"this": 2, "that": 1})
+
+        restarted_workspace.update_file("edited", "this that this those")
+        assert restarted_workspace.find_derived("edited", "words") is None
+        restarted_workspace.disk_cache.close()  # type: ignore
+
+
+def test_memoized():
+    with TemporaryDirectory() as directory:
+        cache_path = Path(directory) / "cache.sqlite"
+        workspace = Workspace(cache_path)
+        workspace.update_file("test", "this that")
+        for index in range(10):
+            assert (
+                workspace.get_memoized(
+                    "test", "lengths", index, len, max_entries=4
+                )
+                == 9
+            )
+        # Only the newest results are kept and nothing goes to disk
+        assert list(workspace.find_derived("test", "lengths")) == [6, 7, 8, 9]
+        assert workspace.get_memoized("test", "lengths", 9, never_called) == 9
+        workspace.disk_cache.close()  # type: ignore
+        restarted_workspace = Workspace(cache_path)
+        restarted_workspace.update_file("test", "this that")
+        assert restarted_workspace.find_derived("test", "lengths") is None
+        restarted_workspace.disk_cache.close()  # type: ignore
+
+        # Edits drop the results like any derived data
+        workspace.update_file("test", "this")
+        assert workspace.get_memoized("test", "lengths", 9, len) == 4
@@ -0,0 +1,57 @@
+from os import utime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from pyeditorconfig import get_config as uncached_get_config
+
+from salve.server_functions import get_config, get_configs
+from salve.server_functions.editorconfig import cached_editorconfigs
+
+
+def test_get_config():
+    with TemporaryDirectory() as directory:
+        root = Path(directory).resolve()
+        (root / "sub").mkdir()
+        (root / ".editorconfig").write_text(
+            "root = true\n\n[*]\nindent_size = 4\n\n[*.md]\nindent_size = unset\n"
+            "[{a,b}{1..3}.txt]\ncharset = utf-8\n[sub/[!c].py]\nTab_Width = 2\n[[x]\nbad = glob\n"
+        )
+        (root / "sub" / ".editorconfig").write_text(
+            "[*.py]\nindent_style = tab\n"
+        )
+        paths = [root / "a.py", root / "b.md", root / "sub" / "c.py"]
+
+        for path in paths + [
+            root / "a2.txt",
+            root / "b4.txt",
+            root / "sub" / "d.py",
+            root / "x",
+        ]:
+            assert get_config(path) == uncached_get_config(path)
+        for path in paths:
+            assert get_config(path) == uncached_get_config(path)
+        assert get_configs(paths) == {
+            str(root / "a.py"): {"indent_size": "4"},
+            str(root / "b.md"): {},
+            str(root / "sub" / "c.py"): {
+                "indent_size": "4",
+                "indent_style": "tab",
+            },
+        }
+
+        # Unchanged files are only parsed once, for any path
+        cached_editorconfigs[root][1][0].config["indent_size"] = "8"
+        assert get_config(root / "new.py") == {"indent_size": "8"}
+        cached_editorconfigs.pop(root)
+
+        # Changed files are reparsed
+        sub_editorconfig = root / "sub" / ".editorconfig"
+        sub_editorconfig.write_text("[*.py]\nindent_style = space\n")
+        utime(sub_editorconfig, ns=(1, 1))
+        assert get_config(root / "sub" / "c.py") == {
+            "indent_size": "4",
+            "indent_style": "space",
+        }
+
+        sub_editorconfig.unlink()
+        assert get_config(root / "sub" / "c.py") == {"indent_size": "4"}
@@ -0,0 +1,69 @@
+from collections import Counter
+
+from helpers import get_response
+
+from salve import AUTOCOMPLETE
+from salve.server_functions.autocompletions import (
+    find_fuzzy_autocompletions,
+    fuzzy_index,
+)
+
+WORDS: Counter[str] = Counter(
+    [
+        "get_config",
+        "getConfigFile",
+        "configure",
+        "go_config_file",
+        "gcf",
+        "xyz",
+        "get_config",
+    ]
+)
+
+
+def test_find_fuzzy_autocompletions():
+    index = fuzzy_index(WORDS)
+    assert find_fuzzy_autocompletions(WORDS, index, [], "gcf") == [
+        "get_config",
+        "getConfigFile",
+        "go_config_file",
+    ]
+    # Uppercase letters make the query case sensitive
+    assert find_fuzzy_autocompletions(WORDS, index, [], "gCF") == [
+        "getConfigFile"
+    ]
+    assert find_fuzzy_autocompletions(WORDS, index, [], "gcf", limit=1) == [
+        "get_config"
+    ]
+    assert find_fuzzy_autocompletions(WORDS, index, ["raise"], "rse") == [
+        "raise"
+    ]
+
+
+def test_fuzzy_unicode_words():
+    # "İ" lowercases to two characters, which used to shift every position after it
+    words: Counter[str] = Counter(["İx", "İstanbul_x", "xİy"])
+    index = fuzzy_index(words)
+    assert find_fuzzy_autocompletions(words, index, [], "x") == [
+        "xİy",
+        "İx",
+        "İstanbul_x",
+    ]
+    assert find_fuzzy_autocompletions(words, index, [], "sx") == ["İstanbul_x"]
+
+
+def test_fuzzy_request(new_ipc):
+    context = new_ipc()
+    context.update_file("test", " ".join(WORDS.elements()))
+    context.request(
+        AUTOCOMPLETE,
+        file="test",
+        expected_keywords=[],
+        current_word="gcfg",
+        fuzzy=True,
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == [
+        "get_config",
+        "getConfigFile",
+        "go_config_file",
+    ]
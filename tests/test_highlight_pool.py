@@ -0,0 +1,43 @@
+import salve.highlight_pool
+from salve.highlight_pool import HighlightPool, ThreadHighlightPool
+from salve.server_functions import get_highlights
+
+TEXT: str = (
+    '"""Module docstring"""\n'
+    + "def function(argument: int) -> None:\n    return 1  # Comment\n" * 1100
+)
+
+
+def test_highlight_pool():
+    pool = HighlightPool(2)
+    assert pool.highlight(TEXT, "python") == get_highlights(TEXT, "python")
+    assert pool.highlight(TEXT, "python", (5, 2105)) == get_highlights(
+        TEXT, "python", (5, 2105)
+    )
+    pool.close()
+
+
+def test_stale_results():
+    pool = HighlightPool(2)
+    # Left by a server that crashed (a different pid) before it took them
+    pool.results.put(((0, 0), 0, ["stale"]))
+    pool.results.put(((0, 0), 1, ["stale"]))
+    assert pool.highlight(TEXT, "python") == get_highlights(TEXT, "python")
+    pool.close()
+
+
+def test_dead_worker(monkeypatch):
+    monkeypatch.setattr(salve.highlight_pool, "RESULT_TIMEOUT", 0.5)
+    pool = HighlightPool(1)
+    pool.close()
+    pool.processes[0].join()
+    # The chunks nobody answers are highlighted by the caller
+    assert pool.highlight(TEXT, "python") == get_highlights(TEXT, "python")
+    assert pool.stalled
+    pool.close()
+
+
+def test_thread_highlight_pool():
+    pool = ThreadHighlightPool(2)
+    assert pool.highlight(TEXT, "python") == get_highlights(TEXT, "python")
+    pool.close()
@@ -62,6 +62,7 @@ def test_IPC():
         "type": "response",
         "cancelled": False,
         "command": AUTOCOMPLETE,
+        "version": 1,
         "result": ["test", "this"],
     }
 
@@ -74,6 +75,7 @@ def test_IPC():
         "type": "response",
         "cancelled": False,
         "command": REPLACEMENTS,
+        "version": 1,
         "result": ["this"],
     }
 
@@ -87,6 +89,7 @@ def test_IPC():
         "type": "response",
         "cancelled": False,
         "command": HIGHLIGHT,
+        "version": 1,
         "result": [
             ((1, 0), 4, "Keyword"),
             ((1, 5), 4, "Name"),
@@ -128,6 +131,7 @@ def test_IPC():
             "type": "response",
             "cancelled": False,
             "command": HIGHLIGHT,
+            "version": 1,
             "result": [
                 ((1, 0), 4, "Keyword"),
                 ((1, 5), 4, "Name"),
@@ -176,6 +180,7 @@ def test_IPC():
         "type": "response",
         "cancelled": False,
         "command": LINKS_AND_CHARS,
+        "version": 1,
         "result": [((18, 2), 22, "Link"), ((5, 7), 1, "Hidden_Char")],
     }
     if platform == "win32":
@@ -184,6 +189,7 @@ def test_IPC():
             "type": "response",
             "cancelled": False,
             "command": LINKS_AND_CHARS,
+            "version": 1,
             "result": [((18, 2), 22, "Link")],
         }
     assert links_and_hidden_chars_result == expected_output
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from helpers import get_response
+
+from salve import AUTOCOMPLETE, DEFINITION, REPLACEMENTS
+
+PYTHON_REGEXES: list[tuple[str, str]] = [
+    (r"def ", "after"),
+    (r"import .*,? ", "after"),
+    (r"from ", "after"),
+    (r"class ", "after"),
+    (r":?.*=.*", "before"),
+]
+
+
+def test_registered_language(new_ipc):
+    context = new_ipc()
+    context.update_file("test", Path("tests/testing_file2.py").read_text())
+    context.register_language(
+        "python",
+        keywords=["while", "with", "yield", "with"],
+        definition_starters=PYTHON_REGEXES,
+    )
+
+    context.request(
+        AUTOCOMPLETE, file="test", current_word="wi", language="python"
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == ["with"]
+
+    context.request(
+        REPLACEMENTS, file="test", current_word="yeild", language="python"
+    )
+    assert get_response(context, REPLACEMENTS)["result"] == ["yield"]
+
+    context.request(
+        DEFINITION, file="test", current_word="test", language="python"
+    )
+    assert get_response(context, DEFINITION)["result"] == (
+        (11, 6),
+        4,
+        "Definition",
+    )
+
+    # Arguments given with the request still win
+    context.request(
+        AUTOCOMPLETE,
+        file="test",
+        current_word="wi",
+        language="python",
+        expected_keywords=["wizard"],
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == ["wizard"]
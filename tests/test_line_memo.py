@@ -0,0 +1,30 @@
+from salve.server_functions import get_highlights, get_special_tokens
+from salve.server_functions.highlight.highlight import line_tokens
+
+TEXT: str = "".join(
+    f"memo_variable_{number} = {number}  # https://example.com/{number}\n"
+    for number in range(100)
+)
+
+
+def test_line_memo():
+    tokens = get_highlights(TEXT, "python")
+    misses: int = line_tokens.cache_info().misses
+
+    edited_text: str = TEXT.replace("memo_variable_50 ", "memo_value_50 ")
+    edited_tokens = get_highlights(edited_text, "python")
+    # Only the edited line is lexed again
+    assert line_tokens.cache_info().misses == misses + 1
+    assert edited_tokens[:150] == tokens[:150]
+    assert edited_tokens == get_highlights(edited_text, "python")
+
+
+def test_special_tokens_range():
+    assert get_special_tokens(TEXT, (3, 4)) == [
+        ((3, 23), 21, "Link"),
+        ((4, 23), 21, "Link"),
+    ]
+    assert get_special_tokens("http://a.b http://c.d", (1, 1)) == [
+        ((1, 0), 10, "Link"),
+        ((1, 11), 10, "Link"),
+    ]
@@ -0,0 +1,40 @@
+from time import sleep
+
+from salve import MEMORY_USAGE
+from salve.workspace import Workspace
+
+
+def test_memory_budget():
+    workspace = Workspace(memory_budget=15_000)
+    for i, word in enumerate(["alpha", "beta", "gamma", "delta"]):
+        workspace.update_file(f"file{i}", f"{word} " * 1000)
+        workspace.word_counts(f"file{i}")
+    assert workspace.memory_used() <= 15_000
+
+    usage = workspace.memory_usage()
+    # The least recently used files lose their derived data first and then their text
+    assert usage["files"]["file0"] == {
+        "text": 0,
+        "derived": 0,
+        "index": 0,
+        "spilled": True,
+    }
+    assert usage["files"]["file3"]["derived"] > 0
+    assert not usage["files"]["file3"]["spilled"]
+
+    # Spilled files are read back transparently
+    assert workspace.files["file0"] == "alpha " * 1000
+    assert workspace.word_counts("file0")["alpha"] == 1000
+
+
+def test_request_memory_usage(new_ipc):
+    context = new_ipc()
+    context.update_file("test", "this that this")
+    context.request_memory_usage()
+    sleep(1)
+
+    output = context.get_response(MEMORY_USAGE)
+    assert output is not None
+    assert output["result"]["budget"] is None  # type: ignore
+    assert output["result"]["files"]["test"]["text"] > 0  # type: ignore
+    assert not output["result"]["files"]["test"]["spilled"]  # type: ignore
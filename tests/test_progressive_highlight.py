@@ -0,0 +1,54 @@
+from time import sleep
+
+from salve import HIGHLIGHT
+from salve.server_functions import get_highlights
+
+TEXT: str = "".join(
+    f"def function(argument_{number}: int) -> None:\n    return {number}  # Comment\n"
+    for number in range(300)
+)
+
+
+def test_progressive_highlight(new_ipc):
+    context = new_ipc()
+    context.update_file("test", TEXT)
+    context.request(
+        HIGHLIGHT,
+        file="test",
+        language="python",
+        text_range=(300, 350),
+        progressive=True,
+    )
+
+    responses = []
+    for _ in range(1000):
+        output = context.get_response(HIGHLIGHT)
+        if output is not None:
+            responses.append(output)
+            if output["type"] == "response":
+                break
+        sleep(0.01)
+
+    # The viewport comes first and the rest of the file follows in chunks (chunks that arrive
+    # before the viewport was picked up are combined with it)
+    assert responses[0]["type"] == "notification"
+    assert responses[0]["result"][0][0][0] == 300  # type: ignore
+    assert {token[0][0] for token in responses[0]["result"]} >= set(  # type: ignore
+        range(300, 351)
+    )
+    assert responses[-1]["type"] == "response"
+    tokens = [token for output in responses for token in output["result"]]  # type: ignore
+    assert sorted(tokens) == get_highlights(TEXT, "python")
+
+    # Once the whole file was streamed it is answered from the cache
+    context.request(
+        HIGHLIGHT,
+        file="test",
+        language="python",
+        text_range=(1, 10),
+        progressive=True,
+    )
+    sleep(1)
+    output = context.get_response(HIGHLIGHT)
+    assert output is not None and output["type"] == "response"
+    assert sorted(output["result"]) == get_highlights(TEXT, "python")  # type: ignore
@@ -0,0 +1,71 @@
+from time import sleep
+
+import pytest
+from helpers import get_response
+
+from salve import (
+    HIGHLIGHT,
+    MEMORY_USAGE,
+    REJECT_NEWEST,
+    REPLACEMENTS,
+    QueueLimit,
+    Response,
+)
+
+# Every line is different so none of them are highlighted from the line cache
+TEXT: str = "".join(
+    f"def stalling(argument_{number}: int) -> None:\n    return {number}  # Comment\n"
+    for number in range(3000)
+)
+
+
+def test_queue_limit_policy():
+    with pytest.raises(ValueError):
+        QueueLimit(policy="drop_everything")
+
+
+def test_queue_limits(new_ipc):
+    context = new_ipc(
+        queue_limits={
+            HIGHLIGHT: QueueLimit(),
+            REPLACEMENTS: QueueLimit(max_pending=0, policy=REJECT_NEWEST),
+        }
+    )
+    context.update_file("test", TEXT)
+    context.update_file("small", "value = 1\n")
+    # Stalls the server for a while
+    context.request(HIGHLIGHT, file="test", language="python")
+    sleep(0.2)
+
+    # The newest request waits in the client for the one in flight, older ones are dropped
+    for version in range(1, 6):
+        context.update_file("small", f"value = {version}\n")
+        context.request(HIGHLIGHT, file="small", language="python")
+    assert context.dropped_requests[HIGHLIGHT] == 4
+    assert len(context.pending_requests[HIGHLIGHT]) == 1
+
+    context.request(
+        REPLACEMENTS, file="small", expected_keywords=[], current_word="valeu"
+    )
+    context.request(
+        REPLACEMENTS, file="small", expected_keywords=[], current_word="valeu"
+    )
+    assert context.dropped_requests[REPLACEMENTS] == 1
+
+    # Once the server is free the waiting request is sent right away and the stale response is dropped
+    output: Response = get_response(
+        context, HIGHLIGHT, final=True, attempts=3000
+    )
+    assert output["result"] == [
+        ((1, 0), 5, "Name"),
+        ((1, 6), 1, "Operator"),
+        ((1, 8), 1, "Number"),
+    ]
+    assert output["version"] == 6  # type: ignore
+
+    # Only the newest of the updates sent during the stall was applied
+    context.request_memory_usage()
+    usage: Response = get_response(
+        context, MEMORY_USAGE, final=True, attempts=3000
+    )
+    assert usage["result"]["dropped_file_updates"] == 4  # type: ignore
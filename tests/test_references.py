@@ -0,0 +1,46 @@
+from helpers import get_response
+
+from salve import REFERENCES
+from salve.server_functions import get_references, index_references
+
+
+def test_get_references():
+    references = index_references("value = values + value\nπvalue value²\n")
+    assert get_references(references, "value") == [
+        ((1, 0), 5, "Reference"),
+        ((1, 17), 5, "Reference"),
+        ((2, 7), 5, "Reference"),
+    ]
+    assert get_references(references, "πvalue") == [((2, 0), 6, "Reference")]
+    assert get_references(references, "missing") == []
+
+
+def test_references(new_ipc):
+    context = new_ipc()
+    context.update_file("first", "value = 1\nprint(value)\n")
+    context.update_file("second", "from first import value\n")
+    context.update_file("third", "other = 2\n")
+
+    context.request(REFERENCES, file="first", current_word="value")
+    assert get_response(context, REFERENCES)["result"] == {
+        "first": [((1, 0), 5, "Reference"), ((2, 6), 5, "Reference")]
+    }
+
+    context.request(
+        REFERENCES, file="first", current_word="value", scope="workspace"
+    )
+    assert get_response(context, REFERENCES)["result"] == {
+        "first": [((1, 0), 5, "Reference"), ((2, 6), 5, "Reference")],
+        "second": [((1, 18), 5, "Reference")],
+    }
+
+    # Changed and removed files are reindexed before the next lookup
+    context.update_file("third", "other = value\n")
+    context.remove_file("second")
+    context.request(
+        REFERENCES, file="first", current_word="value", scope="workspace"
+    )
+    assert get_response(context, REFERENCES)["result"] == {
+        "first": [((1, 0), 5, "Reference"), ((2, 6), 5, "Reference")],
+        "third": [((1, 8), 5, "Reference")],
+    }
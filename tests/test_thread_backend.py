@@ -0,0 +1,54 @@
+import pytest
+from helpers import get_response
+
+from salve import AUTOCOMPLETE, HIGHLIGHT, IPC, Response
+
+TEXT: str = "value = 1\nvalue\nval"
+
+
+def get_responses(context: IPC) -> dict[str, Response]:
+    context.update_file("test", TEXT)
+    context.request(
+        AUTOCOMPLETE, file="test", expected_keywords=[], current_word="val"
+    )
+    context.request(HIGHLIGHT, file="test", language="python")
+    return {
+        command: get_response(context, command)
+        for command in (AUTOCOMPLETE, HIGHLIGHT)
+    }
+
+
+def test_thread_backend(new_ipc):
+    process_context = new_ipc()
+    process_responses = get_responses(process_context)
+    process_context.kill_IPC()
+
+    context = new_ipc(backend="thread", highlight_workers=2)
+    thread_responses = get_responses(context)
+    for command, response in thread_responses.items():
+        assert response.keys() == process_responses[command].keys()
+        assert response["result"] == process_responses[command]["result"]
+    assert thread_responses[AUTOCOMPLETE]["result"] == ["value"]
+
+    server_thread = context.main_server
+    context.kill_IPC()
+    server_thread.join(1)
+    assert not server_thread.is_alive()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="fiber"):
+        IPC(backend="fiber")
+
+
+def test_thread_results_are_copies(new_ipc):
+    context = new_ipc(backend="thread")
+    context.update_file("test", TEXT)
+    context.request(HIGHLIGHT, file="test", language="python")
+    first_result = get_response(context, HIGHLIGHT)["result"]
+    expected_result = list(first_result)  # type: ignore
+    first_result.clear()  # type: ignore
+
+    # The second request is served from the cached whole file highlights
+    context.request(HIGHLIGHT, file="test", language="python")
+    assert get_response(context, HIGHLIGHT)["result"] == expected_result
@@ -0,0 +1,74 @@
+from random import Random
+
+from token_tools import (
+    Token,
+    merge_tokens,
+    only_tokens_in_text_range,
+    overwrite_and_merge_tokens,
+)
+
+from salve.server_functions.highlight.overlay import overlay_tokens
+
+TOKEN_TYPES: list[str] = ["String", "Keyword", "Name", "Comment"]
+
+
+def random_line_tokens(line: int, random: Random) -> list[Token]:
+    """Sorted, merged and non overlapping like a lexed line"""
+    tokens: list[Token] = []
+    column: int = random.randint(0, 3)
+    for _ in range(random.randint(0, 6)):
+        length: int = random.randint(1, 8)
+        tokens.append(((line, column), length, random.choice(TOKEN_TYPES)))
+        column += length + random.choice([0, 0, 1, 2])
+    return merge_tokens(tokens)
+
+
+def test_overlay_matches_token_tools():
+    for seed in range(500):
+        random = Random(seed)
+        line_count: int = random.randint(1, 8)
+        old_tokens: list[Token] = [
+            token
+            for line in range(1, line_count + 1)
+            for token in random_line_tokens(line, random)
+        ]
+        # Unsorted, overlapping and sometimes empty or past the last line
+        new_tokens: list[Token] = [
+            (
+                (random.randint(1, line_count + 1), random.randint(0, 30)),
+                random.randint(0 if random.random() < 0.1 else 1, 12),
+                random.choice(TOKEN_TYPES),
+            )
+            for _ in range(random.randint(1, 6))
+        ]
+        start: int = random.randint(1, line_count + 1)
+        text_range: tuple[int, int] = (
+            start,
+            random.randint(start, line_count + 2),
+        )
+
+        assert overlay_tokens(
+            old_tokens, new_tokens, text_range
+        ) == only_tokens_in_text_range(
+            overwrite_and_merge_tokens(old_tokens, new_tokens), text_range
+        ), seed
+
+
+def test_overlay_docstring():
+    old_tokens: list[Token] = [
+        ((1, 0), 3, "Keyword"),
+        ((1, 4), 4, "Name"),
+        ((2, 4), 3, "String"),
+        ((2, 7), 5, "Name"),
+        ((3, 4), 3, "String"),
+    ]
+    # A docstring token covering part of an old token splits it
+    assert overlay_tokens(
+        old_tokens, [((2, 4), 6, "String"), ((3, 4), 3, "String")], (1, 3)
+    ) == [
+        ((1, 0), 3, "Keyword"),
+        ((1, 4), 4, "Name"),
+        ((2, 4), 6, "String"),
+        ((2, 10), 2, "Name"),
+        ((3, 4), 3, "String"),
+    ]
@@ -0,0 +1,40 @@
+from os import utime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import sleep
+
+from helpers import get_response
+
+from salve import AUTOCOMPLETE, IPC
+
+
+def autocomplete(context: IPC, current_word: str) -> list[str]:
+    context.request(
+        AUTOCOMPLETE,
+        file="tracked",
+        expected_keywords=[],
+        current_word=current_word,
+    )
+    return get_response(context, AUTOCOMPLETE)["result"]  # type: ignore
+
+
+def test_track_file(new_ipc):
+    with TemporaryDirectory() as directory:
+        path = Path(directory) / "module.py"
+        path.write_text("def first_function(): ...")
+
+        context = new_ipc()
+        context.track_file("tracked", path, poll_interval=0.05)
+        assert autocomplete(context, "fir") == ["first_function"]
+
+        path.write_text("def second_function(): ...")
+        # Make sure the change is visible even on coarse mtime filesystems
+        utime(path, (0, 0))
+        sleep(0.5)
+        assert autocomplete(context, "sec") == ["second_function"]
+
+        # Once the buffer diverges the client's contents win over the disk
+        context.update_file("tracked", "def third_function(): ...")
+        path.write_text("def fourth_function(): ...")
+        sleep(0.5)
+        assert autocomplete(context, "thi") == ["third_function"]
@@ -0,0 +1,77 @@
+from os import environ
+from pathlib import Path
+from subprocess import run
+from sys import executable
+
+from collegamento import SimpleClient
+from helpers import get_response
+
+from salve import AUTOCOMPLETE, IPC, TYPE_CHECKING_ENV_VAR, Response
+
+# Keywords should be a list but a tuple works just as well without type checking
+CLIENT_SCRIPT: str = """
+from time import sleep
+
+from salve import AUTOCOMPLETE, IPC, RUNTIME_TYPE_CHECKING
+
+context = IPC()
+context.update_file("test", "value = 1\\nval")
+try:
+    context.request(
+        AUTOCOMPLETE,
+        file="test",
+        expected_keywords=("valuable",),
+        current_word="val",
+    )
+except Exception:
+    print("rejected")
+else:
+    for _ in range(500):
+        if (output := context.get_response(AUTOCOMPLETE)) is not None:
+            print(output["result"])
+            break
+        sleep(0.01)
+context.kill_IPC()
+"""
+
+
+def request_with_tuple_keywords(context: IPC) -> Response:
+    context.update_file("test", "value = 1\nval")
+    # IPC.request() is type checked in this process so the request is sent as is
+    SimpleClient.request(
+        context,
+        {
+            "command": AUTOCOMPLETE,
+            "file": "test",
+            "expected_keywords": ("valuable",),
+            "current_word": "val",
+        },
+    )
+    return get_response(context, AUTOCOMPLETE)
+
+
+def test_server_without_type_checking(new_ipc):
+    context = new_ipc(type_checking=False)
+    assert request_with_tuple_keywords(context)["result"] == ["value"]
+    assert context.main_server.is_alive()
+
+    # Normal requests still round trip
+    context.request(
+        AUTOCOMPLETE, file="test", expected_keywords=[], current_word="val"
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == ["value"]
+
+
+def test_type_checking_env_var():
+    outputs: dict[str, str] = {}
+    for setting in ("0", "1"):
+        outputs[setting] = run(
+            [executable, "-c", CLIENT_SCRIPT],
+            env=environ | {TYPE_CHECKING_ENV_VAR: setting},
+            cwd=Path(__file__).parent.parent,
+            capture_output=True,
+            check=True,
+            text=True,
+            timeout=60,
+        ).stdout.strip()
+    assert outputs == {"0": "['value']", "1": "rejected"}
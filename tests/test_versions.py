@@ -0,0 +1,34 @@
+from time import sleep
+
+from helpers import get_response
+
+from salve import AUTOCOMPLETE, HIGHLIGHT, Response
+
+
+def test_response_versions(new_ipc):
+    context = new_ipc()
+    context.update_file("test", "alpha")
+    context.update_file("test", "alpha beta")
+    context.request(
+        AUTOCOMPLETE, file="test", expected_keywords=[], current_word="b"
+    )
+    output: Response = get_response(context, AUTOCOMPLETE)
+    assert output["version"] == 2  # type: ignore
+    assert output["result"] == ["beta"]
+
+
+def test_drop_stale_responses(new_ipc):
+    context = new_ipc(drop_stale_responses=True)
+    text: str = "def function(argument: int) -> None:\n    return 1\n" * 2000
+    context.update_file("test", text)
+    context.request(HIGHLIGHT, file="test", language="python")
+    sleep(0.1)  # Let the highlight start before the buffer changes
+    context.update_file("test", "")
+    sleep(3)
+    assert context.get_response(HIGHLIGHT) is None
+
+    # The dropped response freed the command for a new request
+    context.request(HIGHLIGHT, file="test", language="python")
+    output: Response = get_response(context, HIGHLIGHT)
+    assert output["version"] == 2  # type: ignore
+    assert output["result"] == []
@@ -0,0 +1,71 @@
+from helpers import get_response
+
+import salve.wrappers
+from salve import AUTOCOMPLETE, HIGHLIGHT, Response, WorkBudgets
+from salve.server_functions import get_highlights
+from salve.work_budgets import sample_text
+
+MINIFIED: str = "var alpha=1;" * 2000
+TEXT: str = '"""Docstring"""\ndef function(argument): pass\n' + MINIFIED
+
+
+def test_sample_text():
+    sample: str = sample_text("alpha beta gamma " * 1000, 320)
+    assert len(sample) < 400
+    assert set(sample.split()) == {"alpha", "beta", "gamma"}
+
+
+def test_work_budgets(new_ipc):
+    context = new_ipc(
+        work_budgets=WorkBudgets(
+            max_line_length=1000, max_file_size=10_000, max_candidates=100
+        )
+    )
+    context.update_file("test", TEXT)
+    context.request(
+        HIGHLIGHT, file="test", language="python", text_range=(2, 2)
+    )
+    output: Response = get_response(context, HIGHLIGHT)
+    assert output["mode"] == "viewport"  # type: ignore
+    assert output["result"] == get_highlights(TEXT, "python", (2, 2))
+
+    context.request(
+        AUTOCOMPLETE, file="test", expected_keywords=[], current_word="al"
+    )
+    output = get_response(context, AUTOCOMPLETE)
+    assert output["mode"] == "sampled"  # type: ignore
+    assert output["result"] == ["alpha"]
+
+    context.update_file("test", TEXT[:5000])
+    context.request(HIGHLIGHT, file="test", language="python")
+    output = get_response(context, HIGHLIGHT)
+    assert output["mode"] == "long_lines_skipped"  # type: ignore
+    assert output["result"] == get_highlights(TEXT, "python", (1, 2))
+
+
+def test_capped_fuzzy_index(new_ipc, monkeypatch):
+    built: list[int] = []
+
+    def counted_fuzzy_index(word_counts):
+        built.append(len(word_counts))
+        return fuzzy_index(word_counts)
+
+    fuzzy_index = salve.wrappers.fuzzy_index
+    # The thread backend runs the wrappers in this process
+    monkeypatch.setattr(salve.wrappers, "fuzzy_index", counted_fuzzy_index)
+    context = new_ipc(
+        backend="thread", work_budgets=WorkBudgets(max_candidates=2)
+    )
+    context.update_file("test", "alpha beta gamma delta")
+    for current_word in ["a", "al", "alp"]:
+        context.request(
+            AUTOCOMPLETE,
+            file="test",
+            expected_keywords=[],
+            current_word=current_word,
+            fuzzy=True,
+        )
+        output: Response = get_response(context, AUTOCOMPLETE)
+        assert output["mode"] == "capped"  # type: ignore
+    # The index of a capped file is built once and reused for every keystroke
+    assert built == [4]
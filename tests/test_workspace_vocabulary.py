@@ -0,0 +1,81 @@
+from helpers import get_response
+
+from salve import AUTOCOMPLETE
+from salve.workspace import Workspace
+
+
+def test_workspace_words():
+    workspace = Workspace()
+    workspace.update_file("first", "config configure config")
+    workspace.update_file("second", "config confidence")
+    assert workspace.workspace_words("second", "con") == {
+        "config": 2,
+        "configure": 1,
+    }
+    assert workspace.workspace_words("third", "con") == {
+        "config": 3,
+        "configure": 1,
+        "confidence": 1,
+    }
+
+    # Only the changed file is reindexed and words nobody uses are forgotten
+    workspace.update_file("first", "configure")
+    assert workspace.workspace_words("third", "con") == {
+        "config": 1,
+        "configure": 1,
+        "confidence": 1,
+    }
+    workspace.remove_file("second")
+    assert workspace.workspace_words("third", "con") == {"configure": 1}
+    assert "confidence" not in workspace.vocabulary
+
+
+def test_index_memory():
+    workspace = Workspace(memory_budget=30_000)
+    for i in range(10):
+        workspace.update_file(f"file{i}", f"word{i} other{i} " * 200)
+    workspace.touch("file0")
+    used_order: list[str] = list(workspace.last_used)
+
+    # Indexing every file doesn't make them look recently used
+    workspace.workspace_words("file0", "word")
+    assert list(workspace.last_used) == used_order
+
+    # The budget was enforced and indexes outliving their evicted word counts still count
+    usage = workspace.memory_usage()
+    assert usage["files"]["file1"]["derived"] == 0
+    assert usage["files"]["file1"]["index"] > 0
+    assert usage["total"] == workspace.memory_used()
+
+
+def test_workspace_autocomplete(new_ipc):
+    context = new_ipc()
+    context.update_file("sibling", "load_settings()\nload_settings()\n")
+    context.update_file("test", "loader = 1\nload")
+
+    context.request(
+        AUTOCOMPLETE, file="test", expected_keywords=[], current_word="load"
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == ["loader"]
+
+    context.request(
+        AUTOCOMPLETE,
+        file="test",
+        expected_keywords=[],
+        current_word="load",
+        scope="workspace",
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == [
+        "load_settings",
+        "loader",
+    ]
+
+    context.remove_file("sibling")
+    context.request(
+        AUTOCOMPLETE,
+        file="test",
+        expected_keywords=[],
+        current_word="load",
+        scope="workspace",
+    )
+    assert get_response(context, AUTOCOMPLETE)["result"] == ["loader"]